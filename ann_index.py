@@ -0,0 +1,153 @@
+# ann_index.py
+# FAISS indeks fabrikası: flat (kesin), fp16 / sq8 (skaler kuantize, kesin arama),
+# HNSW, IVF, IVF-PQ, PQ.
+# Birkaç PDF için flat yeterli; yüz binlerce chunk için yaklaşık (ANN) indeksler.
+# compare_indexes() ile her tipin recall@k / gecikme / boyut değerleri
+# aynı korpus üzerinde kesin flat indekse karşı ölçülür.
+
+import math
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from startup import lazy_import
+
+faiss = lazy_import("faiss")  # ilk indeks işleminde yüklenir
+
+INDEX_KINDS = ("flat", "fp16", "sq8", "hnsw", "ivf", "ivfpq", "pq")
+
+DEFAULT_PARAMS = {
+    "hnsw_m": 32,            # HNSW komşu sayısı
+    "ef_construction": 200,  # HNSW kurulum derinliği
+    "ef_search": 64,         # HNSW arama derinliği (büyük -> recall artar, yavaşlar)
+    "nlist": None,           # IVF küme sayısı; None -> 4 * sqrt(n)
+    "nprobe": 16,            # IVF'de aranan küme sayısı
+    "pq_m": 16,              # PQ alt vektör sayısı (boyutu bölmeli)
+    "pq_nbits": 8,           # alt vektör başına bit
+}
+
+def _params(params: Optional[Dict]) -> Dict:
+    return {**DEFAULT_PARAMS, **(params or {})}
+
+def _metric(metric: str):
+    return faiss.METRIC_INNER_PRODUCT if metric == "ip" else faiss.METRIC_L2
+
+def factory_string(kind: str, n: int, dim: int, params: Optional[Dict] = None) -> str:
+    """faiss.index_factory tanımı. Küçük korpusta nlist / nbits eğitim verisine göre küçültülür."""
+    p = _params(params)
+    nlist = p["nlist"] or int(4 * math.sqrt(max(n, 1)))
+    nlist = max(1, min(nlist, n))
+    pq_m = p["pq_m"]
+    while dim % pq_m:
+        pq_m -= 1
+    nbits = max(1, min(p["pq_nbits"], int(math.log2(max(n, 2)))))
+    if kind == "flat":
+        return "Flat"
+    if kind == "fp16":
+        return "SQfp16"  # vektör başına 2 bayt/boyut
+    if kind == "sq8":
+        return "SQ8"     # 1 bayt/boyut, boyut başına min/max korpustan öğrenilir
+    if kind == "hnsw":
+        return f"HNSW{p['hnsw_m']},Flat"
+    if kind == "ivf":
+        return f"IVF{nlist},Flat"
+    if kind == "ivfpq":
+        return f"IVF{nlist},PQ{pq_m}x{nbits}"
+    if kind == "pq":
+        return f"PQ{pq_m}x{nbits}"
+    raise ValueError(f"Bilinmeyen indeks tipi: {kind}")
+
+def supports_remove(kind: str) -> bool:
+    # flat kodlu indekslerde (flat, fp16, sq8) vektör silmek ucuz; diğerleri embedding'lerden yeniden kurulur
+    return kind in ("flat", "fp16", "sq8")
+
+def reconstructable(kind: str) -> bool:
+    # IDMap2 üzerinden id ile vektör geri alınabilen tipler; bunlarda ayrıca float32 kopya tutmak gerekmez
+    # (fp16/sq8 geri dönüşü yaklaşık). IVF/PQ için Python tarafında kopya saklanır.
+    return kind in ("flat", "fp16", "sq8", "hnsw")
+
+def apply_search_params(index, kind: str, params: Optional[Dict] = None):
+    p = _params(params)
+    ps = faiss.ParameterSpace()
+    if kind in ("ivf", "ivfpq"):
+        ps.set_index_parameter(index, "nprobe", p["nprobe"])
+    elif kind == "hnsw":
+        ps.set_index_parameter(index, "efSearch", p["ef_search"])
+
+def build_ann_index(kind: str, emb: np.ndarray, ids: Optional[np.ndarray] = None,
+                    metric: str = "ip", params: Optional[Dict] = None):
+    """Vektörlerden indeks kurar (gerekirse korpus üzerinde eğitir).
+    ids verilirse indeks kararlı id'lerle aranır (IVF kendi id desteğini, diğerleri IDMap2 kullanır)."""
+    p = _params(params)
+    emb = np.ascontiguousarray(emb, dtype="float32")
+    n, dim = emb.shape
+    base = faiss.index_factory(dim, factory_string(kind, n, dim, p), _metric(metric))
+    if kind == "hnsw":
+        faiss.downcast_index(base).hnsw.efConstruction = p["ef_construction"]
+    if not base.is_trained:
+        base.train(emb)
+    if ids is None:
+        index = base
+        index.add(emb)
+    elif kind in ("ivf", "ivfpq"):
+        index = base
+        index.add_with_ids(emb, ids)
+    else:
+        index = faiss.IndexIDMap2(base)
+        index.add_with_ids(emb, ids)
+    apply_search_params(index, kind, p)
+    return index
+
+def read_index(path, mmap: bool = True):
+    """(indeks, eşlendi mi). mmap=True: vektör kodları (flat / fp16 / sq8 / pq, IVF listeleri) dosyadan
+    salt okunur eşlenir; aynı snapshot'ı açan süreçler sayfa önbelleğindeki tek kopyayı paylaşır ve
+    açılışta kodlar kopyalanmaz. Eşlenmiş indeks yerinde değiştirilmez (artımlı güncelleme clone_index ile)."""
+    if mmap:
+        try:
+            return faiss.read_index(str(path), faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY), True
+        except (AttributeError, RuntimeError):
+            pass  # IO_FLAG_MMAP_IFC'siz eski faiss ya da eşlenemeyen tip: normal okuma
+    return faiss.read_index(str(path)), False
+
+def copy_index(index, mapped: bool = False):
+    """Değiştirilebilir kopya. Eşlenmiş indeksin clone_index kopyası hâlâ salt okunur dosyayı
+    gösterir (remove_ids / add yazmaya çalışıp çöker); o durumda serialize + deserialize ile belleğe alınır."""
+    if mapped:
+        return faiss.deserialize_index(faiss.serialize_index(index))
+    return faiss.clone_index(index)
+
+def index_nbytes(index) -> int:
+    return int(faiss.serialize_index(index).nbytes)
+
+def compare_indexes(emb: np.ndarray, kinds=INDEX_KINDS, k: int = 10, n_queries: int = 200,
+                    params: Optional[Dict] = None, queries: Optional[np.ndarray] = None,
+                    seed: int = 0) -> List[Dict]:
+    """Her indeks tipini kesin flat indekse karşı ölçer.
+    queries verilmezse korpustan rastgele n_queries vektör sorgu olarak kullanılır.
+    Gecikme tek tek sorgu ile ölçülür (uygulamadaki kullanım gibi)."""
+    emb = np.ascontiguousarray(emb, dtype="float32")
+    if queries is None:
+        rng = np.random.default_rng(seed)
+        queries = emb[rng.choice(len(emb), size=min(n_queries, len(emb)), replace=False)]
+    queries = np.ascontiguousarray(queries, dtype="float32")
+    k = min(k, len(emb))
+    exact = build_ann_index("flat", emb, params=params)
+    _, truth = exact.search(queries, k)
+    rows = []
+    for kind in kinds:
+        t = time.perf_counter()
+        index = build_ann_index(kind, emb, params=params)
+        build_s = time.perf_counter() - t
+        found = []
+        t = time.perf_counter()
+        for i in range(len(queries)):
+            _, I = index.search(queries[i:i + 1], k)
+            found.append(I[0])
+        ms = 1000 * (time.perf_counter() - t) / max(len(queries), 1)
+        recall = float(np.mean([len(set(f[f >= 0].tolist()) & set(g.tolist())) / k
+                                for f, g in zip(found, truth)]))
+        rows.append({"kind": kind, "factory": factory_string(kind, len(emb), emb.shape[1], params),
+                     "recall_at_k": recall, "k": k, "ms_per_query": ms, "build_s": build_s,
+                     "index_mb": index_nbytes(index) / 1e6})
+    return rows
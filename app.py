@@ -1,11 +1,10 @@
 import streamlit as st
-import requests
 import os
-import tempfile
-from PyPDF2 import PdfReader
 from sentence_transformers import SentenceTransformer
-import faiss
 import numpy as np
+from text_extract import extract_pdf_pages, EXTRACT_WORKERS
+from ann_index import build_ann_index
+from fetch import Fetcher, fetch_docs
 
 # -------------------------------
 # 1) PDF'leri GitHub'dan İndir
@@ -13,6 +12,9 @@ import numpy as np
 
 GITHUB_REPO_URL = "https://raw.githubusercontent.com/zappap/sbe-bot/main/docs"
 
+# FAISS indeks tipi: "flat", "hnsw", "ivf", "ivfpq", "pq" (bkz. ann_index.py)
+ANN_KIND = "flat"
+
 PDF_FILES = [
     "Akademik_Danismanlik_Yonergesi.pdf",
     "DENKLIK_YONETMELIGI.pdf",
@@ -23,28 +25,28 @@ PDF_FILES = [
     "yok_LISANSUSTU_EGITIM_VE_OGRETIM_YONETMELIGI.pdf"
 ]
 
-def download_pdf(file_name):
-    url = f"{GITHUB_REPO_URL}/{file_name}"
-    response = requests.get(url)
-    if response.status_code == 200:
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-        tmp.write(response.content)
-        tmp.close()
-        return tmp.name
-    return None
+def download_pdfs(file_names):
+    # paralel + koşullu indirme; değişmeyen PDF için sadece 304 (bkz. fetch.py)
+    paths = {}
+    fetcher = Fetcher()
+    results = fetch_docs(fetcher, GITHUB_REPO_URL, file_names)
+    fetcher.close()
+    for res in results:
+        if res["error"]:
+            st.warning(f"İndirme hatası: {res['name']} -> {res['error']}")
+        if res["path"]:
+            paths[res["name"]] = res["path"]
+    return paths
 
 
 # -------------------------------
 # 2) PDF'i Metne Çevir
 # -------------------------------
 
-def pdf_to_text(path):
-    text = ""
-    with open(path, "rb") as f:
-        pdf = PdfReader(f)
-        for page in pdf.pages:
-            text += page.extract_text() + "\n"
-    return text
+def pdf_to_text(path, workers=EXTRACT_WORKERS):
+    # PyPDF2 ile sayfa sayfa; workers > 1 ise sayfalar process pool'da çıkarılır
+    pages = extract_pdf_pages(path, engine="pypdf2", workers=workers, warn=st.warning)
+    return "".join(t + "\n" for t in pages)
 
 
 # -------------------------------
@@ -54,9 +56,10 @@ def pdf_to_text(path):
 @st.cache_resource
 def load_documents():
     texts = []
+    paths = download_pdfs(PDF_FILES)
 
     for pdf_file in PDF_FILES:
-        local_path = download_pdf(pdf_file)
+        local_path = paths.get(pdf_file)
         if local_path:
             content = pdf_to_text(local_path)
             texts.append((pdf_file, content))
@@ -70,10 +73,8 @@ def build_faiss_index(texts):
     corpus = [t[1] for t in texts]
 
     embeddings = model.encode(corpus, show_progress_bar=True)
-    dim = embeddings.shape[1]
 
-    index = faiss.IndexFlatL2(dim)
-    index.add(np.array(embeddings))
+    index = build_ann_index(ANN_KIND, np.array(embeddings), metric="l2")
 
     return index, model, corpus
 
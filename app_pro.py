@@ -8,32 +8,29 @@
 # - (Opsiyonel) OPENAI_API_KEY veya GEMINI_API_KEY environment/secrets olarak ekleyin
 # - streamlit run app_pro.py
 
+import startup  # açılış süreleri: ilk içe aktarılan modül (T0)
 import streamlit as st
 import os
-import tempfile
-import hashlib
-import sqlite3
-from typing import List, Tuple, Dict
-import glob
-import pathlib
-import json
+import logging
+from typing import List
 import time
 
-# PDF/DOCX parsing
-import pdfplumber
-import docx
+# retrieval motoru, audit log, metrikler ve indirme (Streamlit'ten bağımsız)
+import metrics
+from audit import AuditLog
+from fetch import Fetcher, fetch_docs
+from indexjob import IndexJobs, watch_snapshots
+from semcache import seed_in_background, SEMANTIC_SEED_QUERIES, SEMANTIC_SEED_DAYS
+from docstore import (DocStore, list_docs_from_local, LOCAL_DOCS_PATH, DEFAULT_SIM_THRESHOLD,
+                      DEFAULT_TOP_K, RETRIEVAL_MODES, RETRIEVAL_MODE, INDEX_KINDS, cite_label, source_label, judge,
+                      score_kind, INDEX_CACHE_DIR)
 
-# embeddings & faiss
-from sentence_transformers import SentenceTransformer
-import numpy as np
-import faiss
+# LLM (opsiyonel) - OpenAI uyumlu chat API, akışlı + önbellekli (llm.py)
+from llm import Summarizer, SummaryCache
 
-# LLM (opsiyonel) - OpenAI (varsa)
-try:
-    import openai
-    OPENAI_AVAILABLE = True
-except Exception:
-    OPENAI_AVAILABLE = False
+startup.mark("app imports")
+
+log = logging.getLogger(__name__)
 
 # -----------------------------
 # CONFIG
@@ -43,241 +40,94 @@ st.set_page_config(page_title="SBE Chatbot Pro", layout="wide")
 # If you deploy to Streamlit Cloud, set this to the raw GitHub docs URL or leave empty to use local ./docs
 GITHUB_RAW_DOCS_BASE = ""  # e.g. "https://raw.githubusercontent.com/USERNAME/REPO/main/docs"
 
-# If local, the app will read ./docs/*.pdf, .docx, .txt
-LOCAL_DOCS_PATH = "./docs"
-
-# Embedding model - multilingual / Turkish performance iyi
-EMBED_MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"  # iyi Türkçe desteği
-CHUNK_SIZE = 900             # karakter
-CHUNK_OVERLAP = 200
-EMBED_DIM = 384  # uygun model için otomatik ayarlanacak
-DEFAULT_SIM_THRESHOLD = 0.63
+# Yerel doküman klasörü, model, chunk ve indeks ayarları docstore.py içinde (LOCAL_DOCS_PATH vb.)
 
-# Audit DB
+# Audit DB (yazma, batch ve retention ayarları audit.py içinde)
 DB_PATH = "sbe_chatbot_audit.db"
 
-# -----------------------------
-# UTIL: text extraction (pdf/docx/txt)
-# -----------------------------
-def extract_text_from_pdf(path: str) -> str:
-    texts = []
-    try:
-        with pdfplumber.open(path) as pdf:
-            for p in pdf.pages:
-                t = p.extract_text()
-                if t:
-                    texts.append(t)
-    except Exception as e:
-        st.warning(f"PDF okuma hatası ({path}): {e}")
-    return "\n".join(texts)
-
-def extract_text_from_docx(path: str) -> str:
-    try:
-        doc = docx.Document(path)
-        return "\n".join([p.text for p in doc.paragraphs])
-    except Exception:
-        return ""
-
-def extract_text_generic(path: str) -> str:
-    p = path.lower()
-    if p.endswith(".pdf"):
-        return extract_text_from_pdf(path)
-    elif p.endswith(".docx") or p.endswith(".doc"):
-        return extract_text_from_docx(path)
-    elif p.endswith(".txt"):
-        try:
-            with open(path, "r", encoding="utf-8", errors="ignore") as f:
-                return f.read()
-        except Exception:
-            return ""
-    else:
-        return ""
-
-# -----------------------------
-# UTIL: chunking (paragraf tabanlı + sliding)
-# -----------------------------
-def chunk_text_paragraphwise(text: str, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP) -> List[str]:
-    if not text:
-        return []
-    # önce paragraf olarak ayır
-    paras = [p.strip() for p in text.split("\n") if p.strip()]
-    chunks = []
-    cur = ""
-    for p in paras:
-        if len(cur) + len(p) + 1 <= size:
-            cur = cur + "\n" + p if cur else p
-        else:
-            chunks.append(cur)
-            # overlap için son kısmı taşı (son overlap karakter)
-            carry = cur[-overlap:] if overlap < len(cur) else cur
-            cur = carry + "\n" + p
-    if cur:
-        chunks.append(cur)
-    # temizlik
-    chunks = [c.strip() for c in chunks if c.strip()]
-    return chunks
-
-def mkid(s: str) -> str:
-    return hashlib.sha1(s.encode("utf-8")).hexdigest()
-
-# -----------------------------
-# DocStore: passages + embeddings + faiss
-# -----------------------------
-class DocStore:
-    def __init__(self, model_name=EMBED_MODEL_NAME):
-        self.model_name = model_name
-        self.model = SentenceTransformer(model_name)
-        # dynamic embed dim
-        self.embed_dim = self.model.get_sentence_embedding_dimension()
-        self.passages = []  # dicts: {id, text, source, chunk_index}
-        self.embeddings = None
-        self.index = None
-
-    def clear(self):
-        self.passages = []
-        self.embeddings = None
-        self.index = None
-
-    def add_document(self, file_path: str, file_name: str):
-        txt = extract_text_generic(file_path)
-        if not txt.strip():
-            return 0
-        chunks = chunk_text_paragraphwise(txt)
-        added = 0
-        for i, ch in enumerate(chunks):
-            pid = mkid(file_name + f"__{i}")
-            self.passages.append({"id": pid, "text": ch, "source": file_name, "chunk_index": i})
-            added += 1
-        return added
-
-    def build_index(self):
-        if not self.passages:
-            self.embeddings = None
-            self.index = None
-            return
-        texts = [p["text"] for p in self.passages]
-        emb = self.model.encode(texts, convert_to_numpy=True, show_progress_bar=True)
-        emb = emb.astype("float32")
-        # normalize for cosine via inner product
-        faiss.normalize_L2(emb)
-        self.embeddings = emb
-        dim = emb.shape[1]
-        # IndexFlatIP for cosine similarity after normalization
-        index = faiss.IndexFlatIP(dim)
-        index.add(emb)
-        self.index = index
-
-    def query(self, q: str, top_k=5):
-        if self.index is None or len(self.passages)==0:
-            return []
-        q_emb = self.model.encode([q], convert_to_numpy=True).astype("float32")
-        faiss.normalize_L2(q_emb)
-        D, I = self.index.search(q_emb, top_k)
-        scores = D[0].tolist()
-        idxs = I[0].tolist()
-        results = []
-        for sc, idx in zip(scores, idxs):
-            if idx < 0 or idx >= len(self.passages):
-                continue
-            results.append((float(sc), self.passages[idx]))
-        return results
-
-# -----------------------------
-# Audit DB helpers (sqlite)
-# -----------------------------
-def init_db(path=DB_PATH):
-    conn = sqlite3.connect(path, check_same_thread=False)
-    c = conn.cursor()
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS queries (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            ts REAL,
-            query TEXT,
-            result TEXT, -- 'FOUND' or 'NOT_FOUND'
-            best_score REAL,
-            top_passages TEXT
-        )
-    """)
-    conn.commit()
-    return conn
-
-def log_query(conn, query, result, best_score, top_passages):
-    c = conn.cursor()
-    c.execute("INSERT INTO queries (ts, query, result, best_score, top_passages) VALUES (?, ?, ?, ?, ?)",
-              (time.time(), query, result, best_score, json.dumps(top_passages, ensure_ascii=False)))
-    conn.commit()
+# Pasaj skorunun gösterilen adı (docstore.score_kind); sadece cosine benzerlik eşiğiyle karşılaştırılır
+SCORE_NAMES = {"cosine": "benzerlik", "bm25": "BM25 skoru (en iyiye oranla)", "article": "madde eşleşmesi"}
 
 # -----------------------------
 # Load docs from local ./docs or GitHub raw (if configured)
 # -----------------------------
-def list_docs_from_local(path=LOCAL_DOCS_PATH):
-    p = pathlib.Path(path)
-    if not p.exists():
-        return []
-    # accept pdf/docx/txt
-    files = sorted([str(x) for x in p.iterdir() if x.suffix.lower() in {".pdf", ".docx", ".doc", ".txt"}])
-    return files
+# İndirilenler .fetch_cache altında içerik adresli saklanır; tekrar yüklemede koşullu istek (304)
+@st.cache_resource
+def get_fetcher() -> Fetcher:
+    return Fetcher()
 
 def download_github_docs(filenames: List[str], base_raw_url: str):
-    import requests
     saved = []
-    for fn in filenames:
-        url = base_raw_url.rstrip("/") + "/" + fn
-        try:
-            r = requests.get(url, timeout=20)
-            if r.status_code == 200:
-                tmp = tempfile.NamedTemporaryFile(delete=False, suffix=pathlib.Path(fn).suffix)
-                tmp.write(r.content)
-                tmp.close()
-                saved.append((fn, tmp.name))
-        except Exception as e:
-            st.warning(f"İndirme hatası: {fn} -> {e}")
+    results = fetch_docs(get_fetcher(), base_raw_url, filenames)
+    for res in results:
+        if res["status"] == "error":
+            st.warning(f"İndirme hatası: {res['name']} -> {res['error']}")
+            continue
+        if res["status"] == "stale":
+            st.warning(f"İndirme hatası: {res['name']} -> {res['error']} (önbellekteki son kopya kullanılıyor)")
+        saved.append((res["name"], res["path"]))
+    n_new = sum(r["status"] == "downloaded" for r in results)
+    n_same = sum(r["status"] == "not_modified" for r in results)
+    st.sidebar.caption(f"İndirme: {n_new} yeni/değişen, {n_same} değişmemiş (304)")
     return saved
 
-# -----------------------------
-# LLM summarization helper (OpenAI) - STRICT: only use provided passages
-# -----------------------------
-def llm_summarize_openai(passages: List[Dict], query: str, max_tokens=300):
-    if not OPENAI_AVAILABLE:
-        return None
-    # Compose strict prompt
-    combined = "\n\n---\n\n".join([f"[SOURCE: {p['source']} - chunk {p['chunk_index']}]\n{p['text']}" for p in passages])
-    system = ("Sen bir mevzuat/hukuk asistanısın. Aşağıdaki **sadece** verilen pasajlardan özet çıkaracaksın. "
-              "Yeni bilgi ekleme, genelleme yaparken bile sadece bu pasajlarda açıkça geçenlerden hareket et. "
-              "Eğer pasajlarda sorunun kesin cevabı yoksa 'VERI YETERSIZ' yaz. "
-              "Cevabı Türkçe ver. Kısa ve net maddeler halinde yaz. Her maddenin sonunda kaynak belirt (dosya adı ve chunk).")
-    prompt = f"{system}\n\nSoru: {query}\n\nPasajlar:\n{combined}\n\nCevap:"
-    # OpenAI API call
-    key = os.getenv("OPENAI_API_KEY")
-    if not key:
-        return None
-    openai.api_key = key
-    try:
-        resp = openai.ChatCompletion.create(
-            model="gpt-4o-mini",  # Replace with available model in your account
-            messages=[{"role":"system","content":system},
-                      {"role":"user","content":f"Soru: {query}\n\nPasajlar:\n{combined}\n\nCevap:"}],
-            max_tokens=max_tokens,
-            temperature=0.0
-        )
-        text = resp['choices'][0]['message']['content'].strip()
-        return text
-    except Exception as e:
-        st.error(f"LLM özetleme hatası: {e}")
-        return None
-
 # -----------------------------
 # App state
 # -----------------------------
-if "store" not in st.session_state:
-    st.session_state.store = DocStore()
-if "docs_loaded" not in st.session_state:
-    st.session_state.docs_loaded = False
+# Model + indeks süreç başına tek: tüm oturumlar aynı DocStore'u sorgular.
+# Sayfa beklemeden açılır: model (ısınma encode'u ile) ve son snapshot arka planda yüklenir.
+@st.cache_resource
+def get_store() -> DocStore:
+    # uyarılar model / snapshot yükleme ve indeksleme thread'lerinden gelir (st.warning orada görünmez):
+    # loga yazılır, indeksleme uyarıları ayrıca iş panelinde gösterilir
+    store = DocStore(warn=log.warning, lazy_model=True)
+    # yeniden başlatmadan sonra son kaydedilen indeksle açıl
+    store.start_background_load()
+    # gece işi (indexjob.py) ya da API yeni snapshot yazarsa ona geç
+    watch_snapshots(store)
+    return store
+
+store = get_store()
+
+# Yeniden indeksleme arka planda (süreç başına tek iş); sorgular bu sırada önceki indeksten cevaplanır
+@st.cache_resource
+def get_jobs() -> IndexJobs:
+    return IndexJobs(store)
+
+jobs = get_jobs()
+
+@st.cache_resource
+def get_summary_cache() -> SummaryCache:
+    return SummaryCache()
+
+# Oturum başına sadece kullanıcı ayarları
 if "sim_threshold" not in st.session_state:
     st.session_state.sim_threshold = DEFAULT_SIM_THRESHOLD
+if "top_k" not in st.session_state:
+    st.session_state.top_k = DEFAULT_TOP_K
+if "retrieval_mode" not in st.session_state:
+    st.session_state.retrieval_mode = RETRIEVAL_MODE
+
+# Audit log süreç başına tek: paylaşılan bağlantı + arka plan yazıcı
+@st.cache_resource
+def get_audit() -> AuditLog:
+    return AuditLog(DB_PATH)
+
+audit = get_audit()
+
+# Anlamsal önbellek açılışta audit'teki sık sorularla ısıtılır (süreç başına bir kez, arka planda)
+@st.cache_resource
+def seed_semantic_cache():
+    return seed_in_background(store, lambda: audit.top_queries(SEMANTIC_SEED_QUERIES, SEMANTIC_SEED_DAYS))
 
-# init DB
-conn = init_db(DB_PATH)
+seed_semantic_cache()
+
+def log_audit(query: str, verdict, timings):
+    # audit kaydı (aşama süreleri ve arama moduyla) + "log" aşaması metriği; SBE_METRICS_FILE varsa metrik dosyası
+    t = time.perf_counter()
+    audit.log(query, verdict["result"], verdict["best_score"], verdict["passages"], timings, verdict["mode"])
+    metrics.QUERY_STAGE.observe(time.perf_counter() - t, stage="log")
+    metrics.REGISTRY.write_file(min_interval=metrics.METRICS_FILE_MIN_SEC)
 
 # -----------------------------
 # UI: Sidebar - admin
@@ -295,112 +145,270 @@ else:
     gh_url = ""
     gh_filenames = ""
 
-if st.sidebar.button("Dokümanları yükle ve indeksle"):
-    st.session_state.store.clear()
-    loaded_files = []
+if st.sidebar.button("Dokümanları yükle ve indeksle", disabled=jobs.running):
+    docs = []  # (dosya adı, lokal yol)
     if use_github and gh_url and gh_filenames.strip():
         fns = [f.strip() for f in gh_filenames.split(",") if f.strip()]
-        saved = download_github_docs(fns, gh_url)
-        for fname, localpath in saved:
-            n = st.session_state.store.add_document(localpath, fname)
-            loaded_files.append((fname, localpath, n))
+        docs = download_github_docs(fns, gh_url)
     else:
-        local_files = list_docs_from_local(LOCAL_DOCS_PATH)
-        for p in local_files:
-            fname = os.path.basename(p)
-            n = st.session_state.store.add_document(p, fname)
-            loaded_files.append((fname, p, n))
-    st.session_state.store.build_index()
-    st.session_state.docs_loaded = True
-    st.sidebar.success(f"{len(loaded_files)} dosya işlendi ve indeks oluşturuldu.")
+        docs = [(os.path.basename(p), p) for p in list_docs_from_local(LOCAL_DOCS_PATH)]
+    _, started = jobs.start(docs)
+    if not started:
+        st.sidebar.info("Bir indeksleme zaten sürüyor.")
+
+def job_panel():
+    # indeksleme işinin durumu; iş sürerken her saniye yenilenir, bitince sayfa bir kez yeniden çizilir
+    job = jobs.status()
+    if job is None:
+        return
+    with st.sidebar:
+        if job["state"] in ("queued", "running"):
+            step = f" ({job['done']}/{job['total']})" if job["total"] else (f" ({job['done']})" if job["done"] else "")
+            st.progress(job["fraction"] or 0.0, text=f"İndeksleniyor: {job['stage_label']}{step} - "
+                                                     f"{job['seconds']:.0f} sn. Sorgular mevcut indeksten cevaplanıyor.")
+            if job["cancel_requested"]:
+                st.caption("İptal ediliyor...")
+            elif st.button("İndekslemeyi iptal et"):
+                jobs.cancel()
+            st.session_state.job_seen = job["id"]
+            return
+        stats = job["stats"] or {}
+        when = time.strftime("%d.%m %H:%M", time.localtime(job["finished"])) if job["finished"] else "-"
+        if job["state"] == "done" and job["mode"] == "snapshot":
+            st.success(f"{job['files']} dosya için kayıtlı indeks yüklendi ({job['seconds']:.2f} sn, {when}).")
+        elif job["state"] == "done":
+            st.success(f"{job['files']} dosya işlendi ve indeks güncellendi ({job['seconds']:.1f} sn, {when}). "
+                       f"Yeniden kullanılan: {stats['reused']}, yeniden encode: {stats['encoded']}, "
+                       f"silinen: {stats['removed']}, yakın kopya (vektörü paylaşılan): {stats.get('duplicates', 0)}")
+        elif job["state"] == "cancelled":
+            st.info(f"İndeksleme iptal edildi ({when}); önceki indeks kullanılmaya devam ediyor.")
+        else:
+            st.error(f"İndeksleme başarısız ({when}): {job['error']}. Önceki indeks kullanılmaya devam ediyor.")
+        warnings = job.get("warnings") or []  # eski durum dosyalarında alan yok
+        if warnings:
+            with st.expander(f"Uyarılar ({len(warnings)})"):
+                for w in warnings:
+                    st.warning(w)
+        if st.session_state.get("job_seen") == job["id"]:
+            # bu oturumda izlenen iş bitti: yeni indeksle tüm sayfayı bir kez yeniden çiz
+            st.session_state.job_seen = None
+            st.rerun()
+
+st.fragment(job_panel, run_every=1.0 if jobs.running else None)()
 
 if st.sidebar.button("Indeksi temizle"):
-    st.session_state.store.clear()
-    st.session_state.docs_loaded = False
-    st.sidebar.success("Indeks temizlendi.")
+    # LATEST de silinir: snapshot izleyicisi indeksi geri yüklemez; yeniden indekslenene kadar boş kalır
+    store.clear(INDEX_CACHE_DIR)
+    st.sidebar.success("Indeks temizlendi (tüm oturumlar için). Yeniden indekslenene kadar boş kalır.")
+
+# FAISS indeks tipi (süreç geneli; değiştirmek encode gerektirmez)
+kind_choice = st.sidebar.selectbox("İndeks tipi", INDEX_KINDS, index=INDEX_KINDS.index(store.index_kind))
+if kind_choice != store.index_kind and st.sidebar.button("İndeks tipini uygula"):
+    t0 = time.time()
+    store.set_index_kind(kind_choice)
+    st.sidebar.success(f"İndeks {kind_choice} olarak yeniden kuruldu ({time.time() - t0:.1f} sn).")
+if st.sidebar.button("ANN karşılaştırması (recall@10, flat'a karşı)"):
+    with st.spinner("İndeks tipleri ölçülüyor..."):
+        rows = store.compare_index_kinds()
+    if rows:
+        st.sidebar.dataframe([{"tip": r["kind"], "faiss": r["factory"], "recall@10": round(r["recall_at_k"], 3),
+                               "ms/sorgu": round(r["ms_per_query"], 3), "kurulum sn": round(r["build_s"], 2),
+                               "MB": round(r["index_mb"], 2)} for r in rows])
+    else:
+        st.sidebar.info("Indeks yok.")
+
+if st.sidebar.button("Bellek raporu (fp16 / sq8)"):
+    rep = store.storage_report()
+    if not rep:
+        st.sidebar.info("Indeks yok.")
+    else:
+        st.sidebar.success(f"{rep['n_passages']} passage ({rep['n_vectors']} vektör), indeks {rep['index_kind']}"
+                           f"{' + float32 kopya' if rep['python_copy'] else ''}"
+                           f"{' (snapshot eşlenmiş, süreçler arası paylaşılan)' if rep['mapped'] else ''}: "
+                           f"{rep['current_mb']:.2f} MB "
+                           f"(float32 indeks + kopya: {rep['baseline_mb']:.2f} MB, tasarruf {rep['saved_mb']:.2f} MB)")
+        bpp = rep["bytes_per_passage"]
+        st.sidebar.caption(f"Passage deposu (sütunlu): {rep['passages_columnar_mb']:.2f} MB, "
+                           f"{bpp['columnar']:.0f} B/passage — dict listesi olsaydı ~{rep['passages_dicts_mb']:.2f} MB, "
+                           f"{bpp['dicts']:.0f} B/passage")
+        st.sidebar.dataframe([{"tip": r["kind"], "MB": round(r["index_mb"], 2),
+                               "top-10 uyum": round(r["recall_at_k"], 3), "ms/sorgu": round(r["ms_per_query"], 3)}
+                              for r in rep["kinds"]])
+
+if st.sidebar.button("Metrikler"):
+    summ = metrics.REGISTRY.summary()
+    if summ["histograms"]:
+        st.sidebar.dataframe([{"metrik": h["metric"].replace("sbe_", ""), "etiket": h["labels"], "adet": h["count"],
+                               "ort. ms": round(h["avg_ms"], 2), "p50 ms": round(h["p50_ms"], 2),
+                               "p95 ms": round(h["p95_ms"], 2)} for h in summ["histograms"]])
+        st.sidebar.dataframe([{"sayaç": c["metric"].replace("sbe_", ""), "etiket": c["labels"], "değer": c["value"]}
+                              for c in summ["counters"]])
+    else:
+        st.sidebar.info("Henüz ölçüm yok.")
+    st.sidebar.download_button("Prometheus metni", metrics.REGISTRY.render(), file_name="sbe_metrics.prom",
+                               mime="text/plain")
 
 # similarity threshold adjust
 st.sidebar.markdown("Benzerlik eşik ayarı (0.0 - 1.0). Eşik altındaysa 'VERI YETERSIZ' döner.")
 st.session_state.sim_threshold = st.sidebar.slider("Benzerlik eşik (cosine)", 0.4, 0.95, float(st.session_state.sim_threshold), step=0.01)
 
+st.sidebar.selectbox("Arama modu", RETRIEVAL_MODES, key="retrieval_mode",
+                     help="dense: embedding; lexical: BM25 kesinse embedding atlanır; hybrid: BM25 + cosine")
+
 # show index stats
 if st.sidebar.button("Indeks durumu"):
-    store = st.session_state.store
     if store.index is None:
         st.sidebar.info("Indeks yok.")
     else:
         st.sidebar.success(f"Passage sayısı: {len(store.passages)} - Embedding dim: {store.embed_dim}")
+        st.sidebar.caption(f"Encoder: {store.encoder}"
+                           + (f", {store.encoder_threads} thread" if store.encoder_threads else ""))
+        if store.snapshot_key:
+            st.sidebar.caption(f"Snapshot: {store.snapshot_key[:12]}")
+        if store.last_sync:
+            st.sidebar.caption(f"Son yükleme — yeniden kullanılan passage: {store.last_sync['reused']}, "
+                               f"yeniden encode edilen: {store.last_sync['encoded']}, silinen: {store.last_sync['removed']}")
+        cs = store.cache_stats()
+        emb_c, res_c = cs["embedding"], cs["result"]
+        st.sidebar.caption(f"Sorgu önbelleği (indeks v{cs['index_version']}) — "
+                           f"embedding isabet %{100 * emb_c['hit_rate']:.0f} ({emb_c['hits']}/{emb_c['hits'] + emb_c['misses']}, "
+                           f"dolu {emb_c['size']}/{emb_c['maxsize']}), "
+                           f"sonuç isabet %{100 * res_c['hit_rate']:.0f} ({res_c['hits']}/{res_c['hits'] + res_c['misses']}, "
+                           f"dolu {res_c['size']}/{res_c['maxsize']})")
+        sem = cs["semantic"]
+        if sem is not None:
+            st.sidebar.caption(f"Anlamsal önbellek — isabet %{100 * sem['hit_rate']:.0f} "
+                               f"({sem['hits']}/{sem['hits'] + sem['misses']}, dolu {sem['entries']}/{sem['maxsize']}), "
+                               f"kazanılan arama süresi {sem['saved_ms']:.0f} ms")
+        sc = get_summary_cache().stats()
+        st.sidebar.caption(f"Özet önbelleği — {sc['entries']} özet, isabet {sc['hits']}/{sc['hits'] + sc['misses']}, "
+                           f"kazanılan LLM süresi {sc['saved_ms'] / 1000:.1f} sn")
+        for m, ms in store.mode_stats().items():
+            st.sidebar.caption(f"Mod {m}: {ms['queries']} sorgu, ort. {ms['avg_ms']:.1f} ms")
+
+if st.sidebar.button("Metin önbelleği durumu"):
+    tc = store.text_cache.stats()
+    st.sidebar.info(f"Son yükleme — önbellekten sayfa: {tc['hits']}, parse edilen sayfa: {tc['misses']}\n\n"
+                    f"Önbellekte {tc['pages']} sayfa, {tc['bytes'] / 1e6:.1f} / {tc['max_bytes'] / 1e6:.0f} MB")
+if st.sidebar.button("Metin önbelleğini temizle"):
+    store.text_cache.clear()
+    st.sidebar.success("Metin önbelleği temizlendi.")
+
+if st.sidebar.button("Audit log durumu"):
+    au = audit.stats()
+    st.sidebar.info(f"{au['rows']} kayıt ({au['path']}) — bu süreçte yazılan: {au['written']}, "
+                    f"kuyrukta: {au['queued']}, düşülen: {au['dropped']}")
+
+if st.sidebar.button("Açılış süreleri"):
+    rep = startup.report()
+    st.sidebar.caption(f"Süreç başlangıcından bu yana {rep['since_start_s']:.1f} sn — "
+                       f"model {'hazır' if store.model_ready else 'yükleniyor'}")
+    st.sidebar.dataframe([{"aşama": e["stage"], "başlangıç sn": round(e["start_s"], 2),
+                           "süre sn": round(e["seconds"], 2), "thread": e["thread"]} for e in rep["stages"]])
 
 # -----------------------------
 # Main UI
 # -----------------------------
 st.title("📚 Sosyal Bilimler Enstitüsü — Mevzuat Chatbot Pro")
 st.write("Bu chatbot yalnızca `docs/` içindeki yüklü belgeler çerçevesinde cevap üretir. Halisünasyon yok — belgede destek yoksa açıkça bildirir.")
+if store.loading:
+    st.info("Model ve indeks arka planda yükleniyor — sorunuzu yazabilirsiniz; ilk sorgu yükleme bitince cevaplanır.")
+elif store.model_error is not None:
+    st.warning(f"Model yüklenemedi: {store.model_error}. İlk sorguda tekrar denenecek.")
 
 col1, col2 = st.columns([3,1])
 
 with col1:
     query = st.text_area("Soru (Türkçe önerilir):", height=120)
-    k = st.number_input("Getirilecek en fazla pasaj sayısı (top-k):", min_value=1, max_value=10, value=3)
+    k = st.number_input("Getirilecek en fazla pasaj sayısı (top-k):", min_value=1, max_value=10, key="top_k")
+    use_llm = st.checkbox("LLM ile sıkı özet ekle (sadece gösterilen pasajlar kullanılır)", key="use_llm")
     btn = st.button("Sorgula")
 with col2:
     st.markdown("### Bilgiler")
-    st.write(f"- Yüklü passage sayısı: {len(st.session_state.store.passages)}")
+    st.write(f"- Yüklü passage sayısı: {len(store.passages)}")
     st.write(f"- Benzerlik eşiği: {st.session_state.sim_threshold:.2f}")
     st.write("- Özetleme (LLM) kullanmak istiyorsanız OpenAI API anahtarını Streamlit Secrets veya env olarak ekleyin.")
 
 # If user pressed query
 if btn and query.strip():
-    store = st.session_state.store
+    if store.loading:
+        with st.spinner("Model ve indeks yükleniyor..."):
+            store.wait_loaded()
     if store.index is None or len(store.passages)==0:
         st.error("Henüz doküman yüklenmedi veya indeks oluşturulmadı. Sidebar'dan 'Dokümanları yükle ve indeksle' ile başlatın.")
     else:
-        results = store.query(query, top_k=k)
+        res = store.search(query, top_k=k, mode=st.session_state.retrieval_mode)
+        results = res["results"]
         if not results:
             st.error("Arama başarısız: indeks yok veya boş.")
         else:
             best_score = results[0][0]
-            st.write(f"En yüksek benzerlik skoru: **{best_score:.3f}**")
-            # Eğer skor eşikten düşükse RET
-            if best_score < st.session_state.sim_threshold:
+            kind = score_kind(res["mode"])
+            score_name = SCORE_NAMES[kind]
+            if kind == "cosine":
+                st.write(f"En yüksek benzerlik skoru: **{best_score:.3f}**")
+            else:
+                st.write(f"En yüksek {score_name}: **{best_score:.3f}** — benzerlik eşiği uygulanmadı "
+                         + ("(sözcüksel eşleşme kesin)" if kind == "bm25" else "(madde doğrudan bulundu)"))
+            st.caption(f"Mod: {res['mode']}{' (önbellek)' if res['cached'] else ''} — "
+                       f"{1000 * res['timings']['total']:.1f} ms"
+                       + (" — sözcüksel eşleşme kesin, embedding atlandı" if res["mode"] == "lexical" else "")
+                       + (" — madde doğrudan bulundu, embedding atlandı" if res["mode"] == "article" else ""))
+            if res["semantic"]:
+                st.caption(f"Benzer soru önbellekten: \"{res['semantic']['query']}\" "
+                           f"(benzerlik {res['semantic']['similarity']:.3f})")
+            # Eğer skor eşikten düşükse RET (karar kuralı docstore.judge'da; HTTP API ile ortak)
+            verdict = judge(results, st.session_state.sim_threshold, res["mode"])
+            top_passages = verdict["passages"]
+            if verdict["result"] == "NOT_FOUND":
                 st.warning("Yüklü belgelerde güvenilir ve doğrudan destekleyen bilgi bulunamadı. Aşağıda en ilgili pasajlar gösteriliyor, fakat cevap **VERI YETERSIZ** olarak sunulacaktır.")
-                # show passages
-                top_passages = []
-                for score, passage in results:
-                    top_passages.append({"score": score, "source": passage["source"], "chunk_index": passage["chunk_index"], "text": passage["text"][:3000]})
                 # log
-                log_query(conn, query, "NOT_FOUND", best_score, top_passages)
+                log_audit(query, verdict, res["timings"])
                 for p in top_passages:
-                    st.markdown(f"**Kaynak:** {p['source']} — chunk {p['chunk_index']} — *benzerlik: {p['score']:.3f}*")
+                    loc = ", ".join(x for x in (p['article'], p['page']) if x)
+                    st.markdown(f"**Kaynak:** {p['source']}{' (' + loc + ')' if loc else ''} — chunk {p['chunk_index']} — *{score_name}: {p['score']:.3f}*")
+                    if p['also']:
+                        st.caption("Aynı metin ayrıca: " + "; ".join(source_label(a) for a in p['also']))
                     st.text(p['text'])
                 st.error("Cevap: **VERI YETERSIZ** — Yüklü belgelerde doğrudan destek bulunamadı.")
             else:
                 # Found: göster ve opsiyonel özet
                 # Filter passages with decent score
-                selected = [passage for score, passage in results if score >= 0.25]
-                top_passages = [{"score": float(score), "source": p["source"], "chunk_index": p["chunk_index"], "text": p["text"]} for score, p in results]
                 # Log as FOUND
-                log_query(conn, query, "FOUND", best_score, top_passages)
+                log_audit(query, verdict, res["timings"])
                 st.success("Yeterli destek bulundu — aşağıdaki pasajlar kaynak olarak sunulmuştur.")
-                for score, passage in results:
-                    st.markdown(f"**Kaynak:** {passage['source']} — chunk {passage['chunk_index']} — *benzerlik: {score:.3f}*")
+                for (score, passage), shown in zip(results, top_passages):
+                    loc = cite_label(passage)
+                    st.markdown(f"**Kaynak:** {passage['source']}{' (' + loc + ')' if loc else ''} — chunk {passage['chunk_index']} — *{score_name}: {score:.3f}*")
+                    if shown['also']:
+                        st.caption("Aynı metin ayrıca: " + "; ".join(source_label(a) for a in shown['also']))
                     st.write(passage['text'][:4000])
-                # Özetleme: sadece eğer OpenAI varsa göster düğme
+                # Özetleme: API anahtarı varsa; pasajlar zaten gösterildi, özet süre bütçesini aşarsa onlarla kalınır
                 openai_key = os.getenv("OPENAI_API_KEY") or (st.secrets.get("OPENAI_API_KEY") if hasattr(st, "secrets") else None)
-                if OPENAI_AVAILABLE and openai_key:
-                    if st.button("LLM ile Sıkı Özetle (sadece gösterilen pasajlar kullanılır)"):
-                        # prepare passages for LLM
-                        summary = llm_summarize_openai([p for _,p in results], query)
-                        if summary:
-                            st.markdown("### LLM Özet (sadece gösterilen pasajlara dayanır)")
-                            st.write(summary)
-                        else:
-                            st.error("LLM özetleme başarısız.")
-                else:
-                    st.caption("LLM özetleme için OpenAI kütüphanesi veya API anahtarı bulunamadı. Opsiyonel: OPENAI_API_KEY ekleyin.")
+                summarizer = Summarizer(api_key=openai_key, cache=get_summary_cache())
+                if use_llm and summarizer.available:
+                    st.markdown("### LLM Özet (sadece gösterilen pasajlara dayanır)")
+                    # benzer sorunun sonuçları kullanıldıysa özet de onun sorusuyla istenir (özet önbelleği ortak)
+                    stream = summarizer.stream(res["semantic"]["query"] if res["semantic"] else query,
+                                               [p for _, p in results])
+                    st.write_stream(stream)
+                    if stream.status == "cached":
+                        st.caption("Özet önbellekten getirildi.")
+                    elif stream.status == "complete":
+                        st.caption(f"İlk token {stream.first_token_s:.2f} sn")
+                    elif stream.status == "timeout":
+                        st.warning(f"LLM özeti süre sınırında ({summarizer.timeout:.0f} sn) tamamlanamadı"
+                                   + (" — yukarıdaki kısmi metin eksik olabilir." if stream.text else ".")
+                                   + " Cevap için gösterilen pasajlara başvurun.")
+                    else:
+                        st.error(f"LLM özetleme başarısız: {stream.error}. Cevap için gösterilen pasajlara başvurun.")
+                elif use_llm:
+                    st.caption("LLM özetleme için API anahtarı bulunamadı. Opsiyonel: OPENAI_API_KEY ekleyin.")
 
 # -----------------------------
 # Footer: deploy / instructions
 # -----------------------------
 st.markdown("---")
 st.markdown("**Deploy notları:** 1) Local: `streamlit run app_pro.py`. 2) Streamlit Cloud: repo'ya push → Share Streamlit → set start file `app_pro.py`. 3) Eğer OpenAI kullanacaksanız, Streamlit Secrets ya da env var olarak `OPENAI_API_KEY` ekleyin.")
+
+startup.mark("first render")
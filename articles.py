@@ -0,0 +1,98 @@
+# articles.py
+# Mevzuat yapısı: "MADDE 7 –", "GEÇİCİ MADDE 1 –", "EK MADDE 2 –" başlıkları.
+# - ARTICLE_RE: satır başındaki madde başlığı (docstore.ArticleChunker madde sınırı olarak kullanır)
+# - ArticleIndex: (belge, madde) -> passage satırları. "Yatay Geçiş Yönergesi madde 7" gibi
+#   sorgular embedding hesaplanmadan doğrudan ilgili maddeye gider.
+# Belge, sorgudaki kelimelerle dosya adının (ör. Yatay_Gecis_Yonergesi.pdf) örtüşmesinden bulunur.
+
+import re
+import pathlib
+from typing import Dict, Optional
+
+import numpy as np
+
+from lexical import tokenize, tr_lower, fold
+
+ARTICLE_KINDS = ("", "Geçici", "Ek")  # article_kind değerleri -> etiket öneki
+ARTICLE_DOC_MIN_MATCH = 0.5  # dosya adı kelimelerinin en az bu oranı sorguda geçmeli
+
+# satır başı: "MADDE 7 –", "MADDE 12- (1)", "GEÇİCİ MADDE 1 -", "Ek Madde 3 –"
+# (tireyi şart koşmak, "Madde 7 kapsamında..." diye başlayan gövde satırlarını dışarıda bırakır)
+ARTICLE_RE = re.compile(r"^(?:(GEÇİCİ|GEÇICI|Geçici|EK|Ek)\s+)?(?:MADDE|Madde)\s+(\d+)\s*[-–—]")
+FIKRA_RE = re.compile(r"^\(\d+\)")  # "(2) ..." - fıkra başı
+
+# sorguda (küçük harf + aksansız): "madde 7", "geçici madde 1", "md. 7", "7. madde", "7 nci maddesi"
+_QUERY_RES = (
+    re.compile(r"\b(?:(gecici|ek)\s+)?(?:madde\w*|md\.?)\s*(\d+)\b"),
+    re.compile(r"\b(?:(gecici|ek)\s+)?(\d+)\s*(?:\.|'?\s*(?:inci|nci|unci|ncu|uncu))?\s*madde"),
+)
+
+def article_kind(prefix: Optional[str]) -> int:
+    if not prefix:
+        return 0
+    return 1 if fold(tr_lower(prefix)) == "gecici" else 2
+
+def article_label(p: Dict) -> str:
+    # atıf için madde etiketi: "Madde 7", "Geçici Madde 1"; madde dışı passage'da boş
+    no = p.get("article_no")
+    if no is None:
+        return ""
+    prefix = ARTICLE_KINDS[p.get("article_kind") or 0]
+    return f"{prefix} Madde {no}" if prefix else f"Madde {no}"
+
+def parse_article_ref(q: str) -> Optional[tuple]:
+    """Sorgudaki madde atfı: (tür, no) ya da None."""
+    text = fold(tr_lower(q))
+    for rx in _QUERY_RES:
+        m = rx.search(text)
+        if m:
+            return article_kind(m.group(1)), int(m.group(2))
+    return None
+
+def doc_tokens(source: str) -> set:
+    # dosya adı -> kelime gövdeleri ("Yatay_Gecis_Yonergesi.pdf" -> {yatay, gecis, yonerge})
+    return set(tokenize(re.sub(r"[_\-.]+", " ", pathlib.Path(source).stem)))
+
+class ArticleIndex:
+    """PassageStore'daki madde sütunlarından kurulur; IndexState ile aynı sürümde yaşar."""
+
+    def __init__(self, passages):
+        self.passages = passages
+        self.rows = {}  # (kaynak sırası, tür, no) -> satırlar (chunk sırasıyla)
+        nos = np.asarray(passages.article_no)
+        rows = np.flatnonzero(nos >= 0)
+        # sütunlar eşlenmiş olabilir: eleman eleman değil, toplu okunur
+        keys = zip(np.asarray(passages.source_ids)[rows].tolist(), np.asarray(passages.article_kind)[rows].tolist(),
+                   nos[rows].tolist())
+        for r, key in zip(rows.tolist(), keys):
+            self.rows.setdefault(key, []).append(r)
+        self._tokens = [doc_tokens(s) for s in passages.sources]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def named_source(self, q: str) -> Optional[int]:
+        """Sorguda adı geçen belge (dosya adı kelimelerinin örtüşmesi); eşitlik ya da zayıf eşleşmede None."""
+        qt = set(tokenize(q))
+        scored = sorted(((len(t & qt) / max(len(t), 1), s) for s, t in enumerate(self._tokens)), reverse=True)
+        if not scored or scored[0][0] < ARTICLE_DOC_MIN_MATCH:
+            return None
+        if len(scored) > 1 and scored[1][0] == scored[0][0]:
+            return None
+        return scored[0][1]
+
+    def lookup(self, q: str) -> Optional[Dict]:
+        """{"source", "article", "rows"} ya da None (madde atfı yok / belge belirsiz / madde bulunamadı)."""
+        ref = parse_article_ref(q)
+        if ref is None or not self.rows:
+            return None
+        kind, no = ref
+        candidates = {s for (s, k, n) in self.rows if k == kind and n == no}
+        sid = self.named_source(q)
+        if sid is None and len(candidates) == 1:
+            sid = next(iter(candidates))  # belge adı geçmiyor ama madde tek belgede var
+        if sid not in candidates:
+            return None
+        source = self.passages.sources[sid]
+        return {"source": source, "article": article_label({"article_no": no, "article_kind": kind}),
+                "rows": self.rows[(sid, kind, no)]}
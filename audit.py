@@ -0,0 +1,246 @@
+# audit.py
+# Sorgu audit log'u (sqlite) - istek yolunda disk beklemesi olmasın diye arka planda yazılır.
+# Tek paylaşılan bağlantı (WAL modu), sınırlı kuyruk, sayıya ya da süreye göre toplu commit.
+# Kapanışta kuyrukta kalanlar yazılır. Eski kayıtlar retention ayarlarına göre silinir
+# (istenirse önce arşiv dosyasına taşınır). Her kayıtta sorgunun aşama süreleri (ms, JSON) tutulur.
+
+import json
+import time
+import queue
+import atexit
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+DB_PATH = "sbe_chatbot_audit.db"
+
+AUDIT_QUEUE_MAX = 10000      # kuyruk doluysa kayıt düşülür (istek bloklanmaz)
+AUDIT_BATCH_SIZE = 64        # bu kadar kayıt birikince commit
+AUDIT_FLUSH_SEC = 1.0        # ya da en geç bu kadar saniyede bir
+AUDIT_RETENTION_DAYS = 180   # bundan eski kayıtlar silinir (None -> süre sınırı yok)
+AUDIT_MAX_ROWS = 200000      # tabloda tutulacak en fazla kayıt (None -> sınırsız)
+AUDIT_ARCHIVE_PATH = None    # verilirse silinecek kayıtlar önce bu sqlite dosyasına taşınır
+AUDIT_PRUNE_SEC = 3600       # retention kontrolü aralığı
+
+_COLUMNS = ("ts", "query", "result", "best_score", "top_passages", "timings", "mode")
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS {db}queries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts REAL,
+        query TEXT,
+        result TEXT, -- 'FOUND' or 'NOT_FOUND'
+        best_score REAL,
+        top_passages TEXT,
+        timings TEXT, -- aşama -> ms (JSON): article, lexical, encode, search, total ...
+        mode TEXT -- kullanılan arama modu; lexical / article: best_score cosine değil, eşik uygulanmadı
+    )
+"""
+
+def _migrate(conn: sqlite3.Connection, db: str = ""):
+    # eski şemaya (timings / mode sütunu yok) sonradan eklenen sütunlar
+    have = {row[1] for row in conn.execute(f"PRAGMA {db}table_info(queries)")}
+    if "timings" not in have:
+        conn.execute(f"ALTER TABLE {db}queries ADD COLUMN timings TEXT")
+    if "mode" not in have:
+        conn.execute(f"ALTER TABLE {db}queries ADD COLUMN mode TEXT")
+
+_FLUSH = object()  # kuyruk işareti: o ana kadarkiler yazılınca event set edilir
+_STOP = object()
+
+_open_logs = []
+
+class AuditLog:
+    """Arka plan yazıcılı audit log. log() sadece kuyruğa koyar; yazma ve commit
+    tek bir thread'de, tek bağlantı üzerinden yapılır."""
+
+    def __init__(self, path: str = DB_PATH, batch_size: int = AUDIT_BATCH_SIZE,
+                 flush_sec: float = AUDIT_FLUSH_SEC, queue_max: int = AUDIT_QUEUE_MAX,
+                 retention_days: Optional[float] = AUDIT_RETENTION_DAYS,
+                 max_rows: Optional[int] = AUDIT_MAX_ROWS,
+                 archive_path: Optional[str] = AUDIT_ARCHIVE_PATH, prune_sec: float = AUDIT_PRUNE_SEC):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_sec = flush_sec
+        self.retention_days = retention_days
+        self.max_rows = max_rows
+        self.archive_path = archive_path
+        self.prune_sec = prune_sec
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL: okuyucular yazıcıyı beklemez; NORMAL: her commit'te fsync yok (WAL'da güvenli)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(_SCHEMA.format(db=""))
+        _migrate(self.conn)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS queries_ts ON queries (ts)")
+        self.conn.commit()
+        self._db_lock = threading.Lock()  # bağlantı yazıcı thread ve okuma yardımcıları arasında paylaşılır
+        self._q = queue.Queue(maxsize=queue_max)
+        self.written = 0
+        self.dropped = 0
+        self._closed = False
+        self._last_prune = 0.0
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+        _open_logs.append(self)
+
+    def log(self, query: str, result: str, best_score: float, top_passages,
+            timings: Optional[Dict[str, float]] = None, mode: Optional[str] = None) -> bool:
+        """Kaydı kuyruğa koyar; kuyruk doluysa ya da log kapalıysa False döner.
+        timings: aşama -> sn (docstore.search çıktısı); ms olarak saklanır. mode: kullanılan arama modu."""
+        metrics.ANSWERS.inc(result=result)
+        if self._closed:
+            return False
+        ms = json.dumps({k: round(1000 * v, 3) for k, v in timings.items()}) if timings else None
+        row = (time.time(), query, result, float(best_score), json.dumps(top_passages, ensure_ascii=False), ms, mode)
+        try:
+            self._q.put_nowait(row)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            metrics.AUDIT_ROWS.inc(outcome="dropped")
+            return False
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """O ana kadar kuyruğa girenler diske yazılana kadar bekler."""
+        if self._closed or not self._thread.is_alive():
+            return False
+        done = threading.Event()
+        try:
+            self._q.put((_FLUSH, done), timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        """Kuyrukta kalanları yazar, thread'i durdurur ve bağlantıyı kapatır."""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._q.put((_STOP, None), timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        with self._db_lock:
+            self.conn.close()
+        if self in _open_logs:
+            _open_logs.remove(self)
+
+    # -----------------------------
+    # Yazıcı thread
+    # -----------------------------
+    def _run(self):
+        batch, waiters = [], []
+        deadline = None
+        stop = False
+        while not stop:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._q.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is not None:
+                if isinstance(item, tuple) and item[0] is _FLUSH:
+                    waiters.append(item[1])
+                elif isinstance(item, tuple) and item[0] is _STOP:
+                    stop = True
+                else:
+                    batch.append(item)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_sec
+                    if len(batch) < self.batch_size:
+                        continue
+            elif deadline is not None and time.monotonic() < deadline:
+                continue
+            if batch:
+                self._write(batch)
+                batch = []
+            deadline = None
+            for ev in waiters:
+                ev.set()
+            waiters = []
+            if time.time() - self._last_prune >= self.prune_sec:
+                self._last_prune = time.time()
+                self.prune()
+
+    def _write(self, batch):
+        t = time.perf_counter()
+        try:
+            with self._db_lock:
+                self.conn.executemany(
+                    f"INSERT INTO queries ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})", batch)
+                self.conn.commit()
+            self.written += len(batch)
+            metrics.AUDIT_WRITE.observe(time.perf_counter() - t)
+            metrics.AUDIT_ROWS.inc(len(batch), outcome="written")
+        except sqlite3.Error as e:
+            # audit hatası sorguyu düşürmemeli; kayıtlar kaybedilir ama uygulama çalışmaya devam eder
+            self.dropped += len(batch)
+            metrics.AUDIT_ROWS.inc(len(batch), outcome="dropped")
+            log.warning(f"Audit log yazılamadı ({len(batch)} kayıt): {e}")
+
+    # -----------------------------
+    # Retention / rotasyon
+    # -----------------------------
+    def prune(self) -> int:
+        """Retention dışındaki kayıtları siler (archive_path varsa önce oraya kopyalar).
+        Silinen kayıt sayısını döner."""
+        conds = []
+        if self.retention_days is not None:
+            conds.append(f"ts < {time.time() - self.retention_days * 86400:.3f}")
+        if self.max_rows is not None:
+            # en yeni max_rows kayıt kalır
+            conds.append(f"id <= (SELECT COALESCE(MAX(id), 0) FROM queries) - {int(self.max_rows)}")
+        if not conds:
+            return 0
+        where = " OR ".join(conds)
+        try:
+            with self._db_lock:
+                if self.archive_path:
+                    self.conn.execute("ATTACH DATABASE ? AS arch", (self.archive_path,))
+                    try:
+                        self.conn.execute(_SCHEMA.format(db="arch."))
+                        _migrate(self.conn, "arch.")
+                        cols = ", ".join(_COLUMNS)
+                        self.conn.execute(f"INSERT INTO arch.queries ({cols}) SELECT {cols} FROM queries WHERE {where}")
+                        n = self.conn.execute(f"DELETE FROM queries WHERE {where}").rowcount
+                        self.conn.commit()
+                    finally:
+                        self.conn.execute("DETACH DATABASE arch")
+                else:
+                    n = self.conn.execute(f"DELETE FROM queries WHERE {where}").rowcount
+                    self.conn.commit()
+            return n
+        except sqlite3.Error as e:
+            log.warning(f"Audit retention uygulanamadı: {e}")
+            return 0
+
+    def top_queries(self, limit: int = 200, days: Optional[float] = 30) -> List[str]:
+        """Son `days` günde cevap bulunan (FOUND) en sık sorular; anlamsal önbelleği ısıtmak için."""
+        since = 0.0 if days is None else time.time() - days * 86400
+        try:
+            with self._db_lock:
+                rows = self.conn.execute("SELECT query FROM queries WHERE result='FOUND' AND ts >= ? GROUP BY query "
+                                         "ORDER BY COUNT(*) DESC, MAX(ts) DESC LIMIT ?", (since, int(limit))).fetchall()
+        except sqlite3.Error as e:
+            log.warning(f"Audit sık sorular okunamadı: {e}")
+            return []
+        return [r[0] for r in rows if r[0]]
+
+    def stats(self) -> Dict:
+        with self._db_lock:
+            rows = self.conn.execute("SELECT COUNT(*) FROM queries").fetchone()[0]
+        return {"rows": rows, "written": self.written, "dropped": self.dropped,
+                "queued": self._q.qsize(), "path": self.path}
+
+@atexit.register
+def close_all():
+    # süreç kapanırken kuyruğu boşalt
+    for a in list(_open_logs):
+        a.close()
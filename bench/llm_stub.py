@@ -0,0 +1,90 @@
+# llm_stub.py
+# OpenAI chat completions API'sini taklit eden yerel sunucu (çevrimdışı deneme için).
+# Gelen pasajların kaynaklarından deterministik bir "özet" üretip SSE ile token token gönderir.
+#
+#   python bench/llm_stub.py --port 8808 --token-delay 0.05 --first-token-delay 0.5
+#   OPENAI_BASE_URL=http://127.0.0.1:8808/v1 OPENAI_API_KEY=stub streamlit run app_pro.py
+#
+# --first-token-delay büyük verilirse uygulamanın süre bütçesi / geri dönüş yolu denenebilir.
+
+import re
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_SOURCE_RE = re.compile(r"\[SOURCE: ([^\]]+)\]")
+
+def fake_answer(messages) -> str:
+    user = messages[-1]["content"] if messages else ""
+    sources = list(dict.fromkeys(_SOURCE_RE.findall(user)))
+    if not sources:
+        return "VERI YETERSIZ"
+    return "\n".join(f"- Pasajda ilgili hüküm yer almaktadır. ({s})" for s in sources)
+
+def make_handler(token_delay: float, first_token_delay: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # chunked yanıt için
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send_chunk(self, data: bytes):
+            self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def do_POST(self):
+            self.close_connection = True  # her istek ayrı bağlantı; keep-alive gerekmez
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            text = fake_answer(body.get("messages", []))
+            model = body.get("model", "stub")
+            if not body.get("stream"):
+                time.sleep(first_token_delay)
+                data = json.dumps({"object": "chat.completion", "model": model,
+                                   "choices": [{"index": 0, "finish_reason": "stop",
+                                                "message": {"role": "assistant", "content": text}}]}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            time.sleep(first_token_delay)
+            try:
+                for tok in re.findall(r"\S+\s*", text):
+                    ev = {"object": "chat.completion.chunk", "model": model,
+                          "choices": [{"index": 0, "delta": {"content": tok}, "finish_reason": None}]}
+                    self._send_chunk(f"data: {json.dumps(ev, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    time.sleep(token_delay)
+                self._send_chunk(b"data: [DONE]\n\n")
+                self._send_chunk(b"")
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # istemci zaman aşımıyla bağlantıyı kapattı
+    return Handler
+
+def serve(port: int = 8808, token_delay: float = 0.02, first_token_delay: float = 0.0,
+          background: bool = False) -> ThreadingHTTPServer:
+    """Sunucuyu başlatır; background=True ise thread'de çalıştırıp sunucuyu döner (shutdown() ile durdurulur)."""
+    httpd = ThreadingHTTPServer(("127.0.0.1", port), make_handler(token_delay, first_token_delay))
+    if background:
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    else:
+        httpd.serve_forever()
+    return httpd
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Yerel OpenAI chat API taklidi")
+    ap.add_argument("--port", type=int, default=8808)
+    ap.add_argument("--token-delay", type=float, default=0.02, help="tokenlar arası bekleme (sn)")
+    ap.add_argument("--first-token-delay", type=float, default=0.0, help="ilk token öncesi bekleme (sn)")
+    args = ap.parse_args()
+    print(f"stub: http://127.0.0.1:{args.port}/v1")
+    serve(args.port, args.token_delay, args.first_token_delay)
@@ -0,0 +1,222 @@
+# benchmark.py
+# Arayüzsüz retrieval ölçümü: docs/ klasöründen DocStore kurar, altın soru dosyasını
+# (bench/golden_tr.jsonl) tekrar sorar ve sonucu makine-okunur JSON olarak yazar.
+#
+#   python benchmark.py                       # taze kurulum, sonuç stdout'a
+#   python benchmark.py --mode hybrid --k 5 --out sonuc.json
+#   python benchmark.py --cache-dir ./.index_cache   # mevcut snapshot'ı kullan
+#   python benchmark.py --text-cache ./.index_cache/page_text.sqlite   # sayfa metni önbelleğini kullan
+#
+# Altın dosya satırı: {"id", "question", "source", "contains", ["chunk_index"], ["answerable"]}
+#  - source: beklenen belge adı, contains: beklenen passage'da geçen kısa metin
+#  - answerable=false: belgelerde cevabı olmayan soru (eşik altında kalması beklenir)
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import tempfile
+import platform
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from docstore import (DocStore, list_docs_from_local, LOCAL_DOCS_PATH, EMBED_MODEL_NAME,
+                      CHUNK_SIZE, CHUNK_OVERLAP, CHUNKING_MODES, CHUNKING, DEDUP, DEFAULT_SIM_THRESHOLD, DEFAULT_TOP_K,
+                      RETRIEVAL_MODES, RETRIEVAL_MODE, INDEX_KIND, INGEST_STAGES, TEXT_CACHE_MAX_MB, judge)
+from ann_index import INDEX_KINDS
+from text_extract import PageTextCache
+from encoders import ENCODER_BACKENDS, ENCODER_BACKEND, ENCODER_THREADS
+import startup
+from lexical import tr_lower
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench", "golden_tr.jsonl")
+QUERY_STAGES = ("article", "lexical", "encode", "search", "total")
+
+_WS_RE = re.compile(r"\s+")
+
+def _norm(text: str) -> str:
+    # PDF'ten gelen satır sonları / çift boşluklar eşleşmeyi bozmasın
+    return _WS_RE.sub(" ", tr_lower(text)).strip()
+
+def load_golden(path: str) -> List[Dict]:
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            item = json.loads(line)
+            if "question" not in item:
+                raise ValueError(f"{path}:{n}: 'question' alanı yok")
+            item.setdefault("id", f"q{n}")
+            item.setdefault("answerable", bool(item.get("source")))
+            items.append(item)
+    return items
+
+def is_relevant(passage: Dict, item: Dict) -> bool:
+    if not item["answerable"]:
+        return False
+    if item.get("source") and passage["source"] != item["source"]:
+        return False
+    if "chunk_index" in item and passage["chunk_index"] != item["chunk_index"]:
+        return False
+    if item.get("contains") and _norm(item["contains"]) not in _norm(passage["text"]):
+        return False
+    return True
+
+def _pct(values: List[float], q: float) -> Optional[float]:
+    return float(np.percentile(values, q)) if values else None
+
+def run_benchmark(store: DocStore, items: List[Dict], k: int, threshold: float, mode: str) -> Dict:
+    """Her soruyu soğuk önbellekle sorar; recall@k, MRR, FOUND/NOT_FOUND ve aşama süreleri."""
+    rows = []
+    stage_ms = {s: [] for s in QUERY_STAGES}
+    for item in items:
+        # aynı (ya da benzer) soru tekrar edilirse önbellekten gelmesin: gecikme her soru için soğuk ölçülür
+        store.query_emb_cache.clear()
+        store.result_cache.clear()
+        if store.semantic_cache is not None:
+            store.semantic_cache.clear()
+        res = store.search(item["question"], top_k=k, mode=mode)
+        results = res["results"]
+        rank = next((i + 1 for i, (_, p) in enumerate(results) if is_relevant(p, item)), None)
+        best = results[0][0] if results else 0.0
+        found = judge(results, threshold, res["mode"])["result"] == "FOUND"
+        for s, sec in res["timings"].items():
+            stage_ms.setdefault(s, []).append(1000 * sec)
+        rows.append({
+            "id": item["id"],
+            "question": item["question"],
+            "answerable": item["answerable"],
+            "expected_source": item.get("source"),
+            "rank": rank,
+            "best_score": round(float(best), 4),
+            "verdict": "FOUND" if found else "NOT_FOUND",
+            "mode": res["mode"],
+            "top": [{"source": p["source"], "chunk_index": p["chunk_index"], "page_start": p.get("page_start"),
+                     "page_end": p.get("page_end"), "score": round(float(sc), 4)}
+                    for sc, p in results],
+            "timings_ms": {s: round(1000 * sec, 3) for s, sec in res["timings"].items()},
+        })
+
+    answerable = [r for r in rows if r["answerable"]]
+    unanswerable = [r for r in rows if not r["answerable"]]
+    hits = [r for r in answerable if r["rank"] is not None]
+    summary = {
+        "questions": len(rows),
+        "answerable": len(answerable),
+        "unanswerable": len(unanswerable),
+        f"recall_at_{k}": len(hits) / len(answerable) if answerable else None,
+        "mrr": sum(1.0 / r["rank"] for r in hits) / len(answerable) if answerable else None,
+        "found": sum(r["verdict"] == "FOUND" for r in rows),
+        "not_found": sum(r["verdict"] == "NOT_FOUND" for r in rows),
+        # eşik kararı: cevabı olan soru FOUND, olmayan NOT_FOUND olmalı
+        "found_answerable": sum(r["verdict"] == "FOUND" for r in answerable),
+        "not_found_unanswerable": sum(r["verdict"] == "NOT_FOUND" for r in unanswerable),
+        # FOUND denip yanlış passage gösterilen sorular (eşik gevşek ya da retrieval hatalı)
+        "found_wrong_passage": sum(r["verdict"] == "FOUND" and r["rank"] is None for r in rows),
+        "query_ms": {s: {"mean": float(np.mean(v)), "p50": _pct(v, 50), "p95": _pct(v, 95)}
+                     for s, v in stage_ms.items() if v},
+    }
+    return {"summary": summary, "questions": rows}
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="SBE chatbot retrieval benchmark (recall@k, MRR, eşik kararı, süreler)")
+    ap.add_argument("--docs", default=LOCAL_DOCS_PATH, help="belge klasörü")
+    ap.add_argument("--golden", default=GOLDEN_PATH, help="altın soru dosyası (jsonl)")
+    ap.add_argument("--k", type=int, default=DEFAULT_TOP_K, help="top-k")
+    ap.add_argument("--threshold", type=float, default=DEFAULT_SIM_THRESHOLD, help="FOUND / NOT_FOUND eşiği")
+    ap.add_argument("--mode", choices=RETRIEVAL_MODES, default=RETRIEVAL_MODE)
+    ap.add_argument("--index-kind", choices=INDEX_KINDS, default=INDEX_KIND)
+    ap.add_argument("--chunking", choices=CHUNKING_MODES, default=CHUNKING)
+    ap.add_argument("--no-dedup", dest="dedup", action="store_false", default=DEDUP,
+                    help="yakın kopya passage'ları da ayrı encode et (karşılaştırma için)")
+    ap.add_argument("--model", default=EMBED_MODEL_NAME)
+    ap.add_argument("--encoder", choices=ENCODER_BACKENDS, default=ENCODER_BACKEND)
+    ap.add_argument("--encoder-threads", type=int, default=ENCODER_THREADS)
+    ap.add_argument("--cache-dir", default=None,
+                    help="snapshot klasörü; verilmezse geçici klasörde sıfırdan kurulur (encode süresi ölçülsün diye)")
+    ap.add_argument("--text-cache", default=None,
+                    help="sayfa metni önbelleği (sqlite); verilmezse geçici klasörde boş açılır "
+                         "(stages_s.extract önbellek isabetini değil PDF okumayı ölçsün diye)")
+    ap.add_argument("--out", default=None, help="JSON çıktı dosyası (verilmezse stdout)")
+    args = ap.parse_args(argv)
+
+    docs = [(os.path.basename(p), p) for p in list_docs_from_local(args.docs)]
+    if not docs:
+        print(f"Belge bulunamadı: {args.docs}", file=sys.stderr)
+        return 2
+    items = load_golden(args.golden)
+
+    t = time.perf_counter()
+    store = DocStore(model_name=args.model, index_kind=args.index_kind, encoder=args.encoder,
+                     encoder_threads=args.encoder_threads, chunking=args.chunking,
+                     dedup=args.dedup)
+    model_load_s = time.perf_counter() - t
+
+    tmp = None
+    cache_dir = args.cache_dir
+    if cache_dir is None or args.text_cache is None:
+        tmp = tempfile.TemporaryDirectory(prefix="sbe_bench_")
+    if cache_dir is None:
+        cache_dir = tmp.name
+    # DocStore çalışma klasöründeki ./.index_cache/page_text.sqlite'ı açar; ölçüm ona yazmasın / ondan okumasın
+    text_cache = args.text_cache or os.path.join(tmp.name, "page_text.sqlite")
+    store.text_cache.conn.close()
+    store.text_cache = PageTextCache(text_cache, max_bytes=TEXT_CACHE_MAX_MB << 20)
+    try:
+        t = time.perf_counter()
+        how, stats = store.reload(docs, cache_dir=cache_dir)
+        ingest_s = time.perf_counter() - t
+        timings = (stats or {}).get("timings") or {}
+        ingest = {
+            "how": how,
+            "files": len(docs),
+            "passages": len(store.passages),
+            "vectors": int(store.index.ntotal) if store.index is not None else 0,
+            "duplicates": (stats or {}).get("duplicates", 0),
+            "reused": (stats or {}).get("reused", 0),
+            "encoded": (stats or {}).get("encoded", 0),
+            "total_s": ingest_s,
+            # snapshot'tan yüklendiyse aşamalar ilk kurulumun süreleridir
+            "stages_s": {s: timings.get(s, 0.0) for s in INGEST_STAGES},
+            "text_cache": store.text_cache.stats(),
+        }
+        report = run_benchmark(store, items, args.k, args.threshold, args.mode)
+    finally:
+        store.text_cache.conn.close()
+        if tmp is not None:
+            tmp.cleanup()
+
+    out = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "docs": args.docs, "golden": args.golden, "model": args.model,
+            "encoder": args.encoder, "encoder_threads": args.encoder_threads,
+            "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP, "chunking": args.chunking,
+            "dedup": store.dedup_threshold, "k": args.k, "threshold": args.threshold, "mode": args.mode,
+            "index_kind": args.index_kind, "index_params": store.index_params, "text_cache": args.text_cache,
+            "python": platform.python_version(),
+        },
+        "model_load_s": model_load_s,
+        # içe aktarma / model yükleme / ısınma aşamaları (açılış süresi gerilemeleri için)
+        "startup_s": startup.stage_seconds(),
+        "ingest": ingest,
+        **report,
+    }
+    text = json.dumps(out, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+        s = report["summary"]
+        print(f"recall@{args.k}={s[f'recall_at_{args.k}']}  MRR={s['mrr']}  "
+              f"FOUND={s['found']}  NOT_FOUND={s['not_found']}  -> {args.out}", file=sys.stderr)
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+# dedup.py
+# Neredeyse aynı passage'ların tespiti (MinHash + LSH). YÖK ve DEÜ lisansüstü yönetmelikleri
+# gibi büyük ölçüde aynı metni taşıyan belgelerde her kopya ayrı vektör olarak saklanmasın,
+# top-k aynı fıkranın kopyalarıyla dolmasın diye: grup başına tek temsilci encode edilir,
+# diğer kopyalar temsilcinin vektörünü kullanır ve atıf olarak gösterilir.
+# LSH adayları kelime shingle kümelerinin gerçek Jaccard benzerliğiyle doğrulanır.
+
+import re
+import zlib
+from typing import Dict
+
+import numpy as np
+
+from articles import ARTICLE_RE
+from lexical import tr_lower, fold
+
+DEDUP_THRESHOLD = 0.9  # kelime shingle Jaccard; altındaki farklar (ör. "doktora" / "sanatta yeterlik") korunur
+SHINGLE_WORDS = 5
+MINHASH_PERM = 64
+LSH_BANDS = 16         # 16 bant x 4 satır: J=0.9 çiftleri neredeyse her zaman aday olur
+
+_PRIME = 4294967311    # 2^32'den büyük asal; (a * x + b) uint64'te taşmaz (a, b < 2^31)
+_rng = np.random.default_rng(20240611)
+_A = _rng.integers(1, 1 << 31, MINHASH_PERM, dtype="uint64")
+_B = _rng.integers(0, 1 << 31, MINHASH_PERM, dtype="uint64")
+_WORD_RE = re.compile(r"\w+")
+
+def shingles(text: str) -> np.ndarray:
+    """Kelime shingle'larının (crc32) sıralı tekil dizisi. Madde başlığındaki numara
+    ("MADDE 21 –") atılır: aynı hüküm iki yönetmelikte farklı numarayla geçebilir."""
+    lines = (ARTICLE_RE.sub("", ln.strip()) for ln in text.split("\n"))
+    words = _WORD_RE.findall(fold(tr_lower(" ".join(lines))))
+    if not words:
+        return np.zeros(0, dtype="uint64")
+    k = min(SHINGLE_WORDS, len(words))
+    grams = {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+    return np.unique(np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype="uint64", count=len(grams)))
+
+def minhash(sh: np.ndarray) -> np.ndarray:
+    return ((_A[:, None] * sh[None, :] + _B[:, None]) % _PRIME).min(axis=1)
+
+def jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    inter = len(np.intersect1d(a, b, assume_unique=True))
+    return inter / (len(a) + len(b) - inter) if inter else 0.0
+
+class Deduper:
+    """Akış halinde gruplama: her passage daha önce görülen temsilcilerle karşılaştırılır;
+    eşik üstünde benzeri varsa onun anahtarı, yoksa kendi anahtarı döner (yeni temsilci olur)."""
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, bands: int = LSH_BANDS):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = MINHASH_PERM // bands
+        self._buckets = {}   # (bant, imza parçası) -> temsilci anahtarları
+        self._sets = {}      # temsilci anahtarı -> shingle dizisi
+        self.seen = 0
+        self.duplicates = 0
+
+    def _keys(self, sig: np.ndarray):
+        return [(b, sig[b * self.rows:(b + 1) * self.rows].tobytes()) for b in range(self.bands)]
+
+    def add(self, key, text: str):
+        # bilinen bir temsilciyi kaydeder (ör. önceki indeksten gelen, vektörü hazır passage)
+        sh = shingles(text)
+        if len(sh):
+            self._register(key, sh, self._keys(minhash(sh)))
+
+    def _register(self, key, sh, bkeys):
+        self._sets[key] = sh
+        for bk in bkeys:
+            self._buckets.setdefault(bk, []).append(key)
+
+    def canonical(self, key, text: str):
+        """text'in temsilcisinin anahtarı: kendisi ya da eşik üstündeki en benzer temsilci."""
+        self.seen += 1
+        sh = shingles(text)
+        if not len(sh):
+            return key
+        bkeys = self._keys(minhash(sh))
+        best, best_j = None, self.threshold
+        checked = set()
+        for bk in bkeys:
+            for cand in self._buckets.get(bk, ()):
+                if cand in checked:
+                    continue
+                checked.add(cand)
+                j = jaccard(sh, self._sets[cand])
+                if j >= best_j:
+                    best, best_j = cand, j
+        if best is not None:
+            self.duplicates += 1
+            return best
+        self._register(key, sh, bkeys)
+        return key
+
+    def stats(self) -> Dict:
+        return {"seen": self.seen, "duplicates": self.duplicates, "representatives": len(self._sets)}
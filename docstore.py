@@ -0,0 +1,1307 @@
+# docstore.py
+# SBE Chatbot retrieval motoru: metin çıkarma, chunking, embedding + FAISS indeks,
+# BM25, sorgu önbellekleri ve indeks snapshot'ları.
+# Streamlit'e bağımlı değildir; app_pro.py, benchmark.py vb. buradan kullanır.
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import pathlib
+import tempfile
+import threading
+import itertools
+from collections import OrderedDict
+from typing import Iterator, List, Optional, Tuple, Dict, Callable
+
+import numpy as np
+
+# PDF/DOCX parsing (pdfplumber / PyPDF2 text_extract içinde, docx ilk .docx dosyasında yüklenir)
+from text_extract import iter_pdf_pages, EXTRACT_WORKERS, PageTextCache
+from lexical import BM25Index
+from passage_store import PassageStore, PassageStoreBuilder, dict_list_nbytes, faiss_id, mkid
+from articles import ARTICLE_RE, FIKRA_RE, ArticleIndex, article_kind, article_label
+from dedup import Deduper, DEDUP_THRESHOLD
+from semcache import SemanticCache, SEMANTIC_CACHE
+from ann_index import (INDEX_KINDS, build_ann_index, supports_remove, reconstructable,
+                       apply_search_params, compare_indexes, index_nbytes, read_index, copy_index)
+import startup
+import metrics
+from encoders import load_encoder, ENCODER_BACKEND, ENCODER_THREADS
+
+# embeddings & faiss: ilk kullanımda içe aktarılır (torch ile birlikte açılışın en pahalı kısmı)
+faiss = startup.lazy_import("faiss")
+docx = startup.lazy_import("docx")
+
+log = logging.getLogger(__name__)
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+# If local, the app will read ./docs/*.pdf, .docx, .txt
+LOCAL_DOCS_PATH = "./docs"
+
+# Embedding model - multilingual / Turkish performance iyi
+EMBED_MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"  # iyi Türkçe desteği
+CHUNK_SIZE = 900             # karakter
+CHUNK_OVERLAP = 200
+# Chunking: "article" -> mevzuat maddesi başına bir passage (bkz. ArticleChunker), madde
+# içermeyen metin paragraf tabanlı; "paragraph" -> her yerde paragraf tabanlı + sliding
+CHUNKING_MODES = ("article", "paragraph")
+CHUNKING = "article"
+ARTICLE_MAX_CHARS = 2 * CHUNK_SIZE  # bundan uzun madde fıkra sınırlarından bölünür
+ARTICLE_TITLE_LINES = 3             # madde başlığından önce maddeye katılabilecek başlık satırı ("Amaç")
+ARTICLE_TITLE_MAX_CHARS = 80
+# "Yatay Geçiş Yönergesi madde 7" gibi sorgular önce madde indeksinde aranır (embedding yok)
+ARTICLE_LOOKUP = True
+# Yakın kopya passage'lar (bkz. dedup.py) tek vektörle temsil edilir; diğer kaynaklar atıf olarak kalır
+DEDUP = True
+EMBED_DIM = 384  # uygun model için otomatik ayarlanacak
+DEFAULT_SIM_THRESHOLD = 0.63
+DEFAULT_TOP_K = 3
+NOT_FOUND_ANSWER = "VERI YETERSIZ"  # en iyi skor eşiğin altındaysa verilen cevap
+NOT_FOUND_TEXT_CHARS = 3000         # NOT_FOUND kayıtlarında pasaj metni bu kadar kısaltılır
+
+# Sorgu önbellekleri (indeks değişince otomatik boşalır)
+QUERY_EMB_CACHE_SIZE = 512    # sorgu metni -> embedding
+RESULT_CACHE_SIZE = 1024      # (sorgu, top_k, mod, indeks sürümü) -> sonuçlar
+# Farklı söylenmiş aynı sorular: embedding'i yakın geçmiş sorgunun sonuçları (bkz. semcache.py)
+
+# Arama modu: "dense" (sadece embedding), "lexical" (BM25 kesinse embedding atlanır,
+# değilse dense), "hybrid" (BM25 + cosine birleşik sıralama)
+RETRIEVAL_MODES = ("dense", "lexical", "hybrid")
+RETRIEVAL_MODE = "dense"
+LEXICAL_MIN_SCORE = 6.0   # BM25 kısa yolu için en iyi passage'ın alt skoru
+LEXICAL_MARGIN = 1.3      # en iyi / ikinci en iyi BM25 skoru oranı
+HYBRID_ALPHA = 0.7        # birleşik sıralamada cosine ağırlığı (1 - alpha: BM25)
+HYBRID_POOL = 4           # her kaynaktan top_k * HYBRID_POOL aday
+# Bu modların skoru cosine değildir (lexical: en iyi BM25'e oran, article: madde eşleşmesi = 1.0);
+# benzerlik eşiği uygulanmaz, kesin sözcüksel / madde eşleşmesi kanıt sayılır. Arayüz, API ve audit
+# kaydı bunu mod ve skor türüyle açıkça belirtir.
+SCORE_KINDS = {"lexical": "bm25", "article": "article"}  # diğer modlar: "cosine"
+
+# FAISS indeks tipi: "flat" (kesin), "fp16" / "sq8" (sıkıştırılmış, kesin arama),
+# "hnsw", "ivf", "ivfpq", "pq" (bkz. ann_index.py)
+INDEX_KIND = "flat"
+INDEX_PARAMS = {}  # ör. {"nprobe": 32} veya {"ef_search": 128}; boş -> ann_index.DEFAULT_PARAMS
+# False: vektörler sadece FAISS indeksinde durur (flat/fp16/sq8/hnsw); ayrı float32 kopya tutulmaz.
+# IVF/PQ tiplerinde yeniden kurulum için kopya her durumda tutulur.
+KEEP_EMBEDDINGS_COPY = False
+
+# Index snapshot cache (passages + embeddings + faiss index diske yazılır)
+INDEX_CACHE_DIR = "./.index_cache"
+SNAPSHOT_VERSION = 6
+SNAPSHOT_KEEP = 3  # diskte tutulacak en fazla snapshot sayısı
+# Snapshot'lar salt okunur eşlenerek açılır (FAISS kodları, embedding kopyası, passage'lar, BM25):
+# aynı makinedeki süreçler (Streamlit kopyaları, server.py --processes) sayfa önbelleğindeki
+# tek kopyayı paylaşır; açılışta bir şey deserialize edilmez. Yeniden indeksleyen süreç de
+# kaydettiği snapshot'ı eşlenmiş olarak yeniden açar. "0": her süreç belleğe kopyalar.
+INDEX_MMAP = os.getenv("SBE_INDEX_MMAP", "1") != "0"
+# build/sync sırasında süresi ölçülen aşamalar (last_sync["timings"])
+INGEST_STAGES = ("extract", "chunk", "encode", "index")
+
+# Encode'a gönderilen passage grubu (belge okunurken dolan her grup hemen encode edilir)
+ENCODE_BATCH = 256
+
+# Yeni indeks devreye alınmadan önce: encode edilen vektörlerden örneklem kendi passage'ını
+# ilk VALIDATE_K sonuçta bulmalı (ANN tipleri için pay bırakılır)
+VALIDATE_PROBES = 16
+VALIDATE_K = 10
+VALIDATE_MIN_HIT = 0.8
+
+# Sayfa metni önbelleği (model/chunk ayarı değişince PDF'ler tekrar parse edilmesin)
+TEXT_CACHE_PATH = os.path.join(INDEX_CACHE_DIR, "page_text.sqlite")
+TEXT_CACHE_MAX_MB = 256
+
+# Model yüklendikten sonra ilk gerçek sorgu ısınma maliyetini ödemesin diye bir kez encode edilir
+WARMUP_TEXT = "lisansüstü eğitim yönetmeliği"
+
+# -----------------------------
+# UTIL: text extraction (pdf/docx/txt)
+# -----------------------------
+def extract_text_from_pdf(path: str, workers=EXTRACT_WORKERS, text_cache=None, warn: Callable = log.warning) -> str:
+    # sayfa sayfa çıkarım; workers > 1 ise process pool (SBE_EXTRACT_WORKERS)
+    pages = iter_pdf_pages(path, engine="pdfplumber", workers=workers, warn=warn, cache=text_cache)
+    return "\n".join(t for _, t in pages if t)
+
+def extract_text_from_docx(path: str) -> str:
+    try:
+        doc = docx.Document(path)
+        return "\n".join([p.text for p in doc.paragraphs])
+    except Exception:
+        return ""
+
+def iter_text_pages(path: str, text_cache=None, warn: Callable = log.warning) -> Iterator[Tuple[Optional[int], str]]:
+    """(sayfa no, metin) üretir. PDF sayfa sayfa akar (sayfa no 1'den başlar);
+    sayfası olmayan biçimlerde (docx/txt) tek parça ve sayfa no None."""
+    p = path.lower()
+    if p.endswith(".pdf"):
+        for i, text in iter_pdf_pages(path, engine="pdfplumber", workers=EXTRACT_WORKERS, warn=warn, cache=text_cache):
+            yield i + 1, text
+    elif p.endswith(".docx") or p.endswith(".doc"):
+        yield None, extract_text_from_docx(path)
+    elif p.endswith(".txt"):
+        try:
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                yield None, f.read()
+        except Exception:
+            return
+
+def extract_text_generic(path: str, text_cache=None, warn: Callable = log.warning) -> str:
+    return "\n".join(t for _, t in iter_text_pages(path, text_cache, warn) if t)
+
+# -----------------------------
+# UTIL: chunking (paragraf tabanlı + sliding)
+# -----------------------------
+class StreamChunker:
+    """Paragraf tabanlı + sliding chunk'lama, akış halinde: metin sayfa sayfa verilir,
+    tamamlanan chunk'lar hemen döner; bellekte sadece yarım kalan chunk tutulur.
+    Her chunk için sayfa aralığı ve belge metnindeki karakter aralığı kaydedilir
+    (belge metni = boş olmayan sayfaların "\n" ile birleşimi; chunk içinde paragraflar
+    tek "\n" ile birleştiği için aralıktaki boşluklar chunk metninden farklı olabilir)."""
+
+    def __init__(self, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+        self.size = size
+        self.overlap = overlap
+        self.cur = ""
+        self.segs = []  # cur içindeki parçalar: (cur'daki konum, belgedeki konum, uzunluk, sayfa)
+        self.pos = 0    # sıradaki sayfanın belge metnindeki başlangıcı
+        self.started = False
+
+    def feed(self, text: str, page: Optional[int] = None) -> List[Dict]:
+        if not text:
+            return []
+        if self.started:
+            self.pos += 1  # sayfalar arası "\n"
+        self.started = True
+        out = []
+        off = self.pos
+        for line in text.split("\n"):
+            p = line.strip()
+            if p:
+                out.extend(self._add(p, off + len(line) - len(line.lstrip()), page))
+            off += len(line) + 1
+        self.pos += len(text)
+        return out
+
+    def finish(self) -> List[Dict]:
+        out = [self._emit()] if self.cur.strip() else []
+        self.cur, self.segs = "", []
+        return out
+
+    def _add(self, p: str, start: int, page) -> List[Dict]:
+        if len(self.cur) + len(p) + 1 <= self.size:
+            if self.cur:
+                self.cur += "\n"
+            self.segs.append((len(self.cur), start, len(p), page))
+            self.cur += p
+            return []
+        out = [self._emit()] if self.cur.strip() else []
+        # overlap için son kısmı taşı (son overlap karakter)
+        cut = len(self.cur) - self.overlap if self.overlap < len(self.cur) else 0
+        segs = []
+        for cp, ds, ln, pg in self.segs:
+            if cp + ln <= cut:
+                continue
+            if cp < cut:
+                ds, ln, cp = ds + cut - cp, ln - (cut - cp), cut
+            segs.append((cp - cut, ds, ln, pg))
+        carry = self.cur[cut:]
+        segs.append((len(carry) + 1, start, len(p), page))
+        self.cur, self.segs = carry + "\n" + p, segs
+        return out
+
+    def _emit(self) -> Dict:
+        text = self.cur.strip()
+        lead = len(self.cur) - len(self.cur.lstrip())
+        first = next(sg for sg in self.segs if sg[0] + sg[2] > lead)
+        last = self.segs[-1]
+        return {"text": text, "page_start": first[3], "page_end": last[3],
+                "char_start": first[1] + max(0, lead - first[0]), "char_end": last[1] + last[2]}
+
+class ArticleChunker:
+    """Mevzuat yapısına göre chunk'lama (StreamChunker ile aynı feed/finish arayüzü):
+    her madde tek passage; ARTICLE_MAX_CHARS'ı aşan madde fıkra, gerekirse satır sınırlarından bölünür.
+    Maddeden hemen önceki kısa başlık satırları ("Amaç", "İKİNCİ BÖLÜM") o maddeye katılır.
+    İlk maddeden önceki metin ve hiç madde içermeyen belgeler StreamChunker ile chunk'lanır."""
+
+    def __init__(self, max_chars=ARTICLE_MAX_CHARS, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+        self.max_chars = max_chars
+        self.stream = StreamChunker(size, overlap)  # ilk maddeden önceki metin
+        self.article = None  # aktif madde: (tür, no)
+        self.lines = []      # aktif maddenin satırları: (metin, belgedeki konum, sayfa)
+        self.titles = []     # sıradaki maddenin başlığı olabilecek satırlar
+        self.pos = 0
+        self.started = False
+
+    def feed(self, text: str, page: Optional[int] = None) -> List[Dict]:
+        if not text:
+            return []
+        if self.started:
+            self.pos += 1  # sayfalar arası "\n"
+        self.started = True
+        out = []
+        off = self.pos
+        for line in text.split("\n"):
+            p = line.strip()
+            if p:
+                out.extend(self._line((p, off + len(line) - len(line.lstrip()), page)))
+            off += len(line) + 1
+        self.pos += len(text)
+        return out
+
+    def finish(self) -> List[Dict]:
+        out = []
+        for ln in self.titles:
+            out.extend(self._push(ln))
+        self.titles = []
+        out.extend(self._close())
+        self.article, self.lines = None, []
+        return out
+
+    def _line(self, ln) -> List[Dict]:
+        m = ARTICLE_RE.match(ln[0])
+        if m:
+            out = self._close()
+            self.article = (article_kind(m.group(1)), int(m.group(2)))
+            self.lines, self.titles = self.titles + [ln], []
+            return out
+        p = ln[0]
+        if len(p) <= ARTICLE_TITLE_MAX_CHARS and p[0].isupper() and not p.endswith((".", ",", ";", ":")):
+            self.titles.append(ln)
+            return self._push(self.titles.pop(0)) if len(self.titles) > ARTICLE_TITLE_LINES else []
+        out = []
+        for t in self.titles + [ln]:
+            out.extend(self._push(t))
+        self.titles = []
+        return out
+
+    def _push(self, ln) -> List[Dict]:
+        if self.article is None:
+            return self.stream._add(*ln)
+        self.lines.append(ln)
+        return []
+
+    def _close(self) -> List[Dict]:
+        # aktif maddeyi (ya da ilk maddeden önceki metni) chunk'lara çevirir
+        if self.article is None:
+            return self.stream.finish()
+        parts, cur, n = [], [], 0
+        groups = []
+        for ln in self.lines:
+            if not groups or FIKRA_RE.match(ln[0]):
+                groups.append([])
+            groups[-1].append(ln)
+        for g in groups:
+            glen = sum(len(t) + 1 for t, _, _ in g)
+            # fıkra sığmıyorsa satır satır
+            for unit in ([g] if glen <= self.max_chars else [[ln] for ln in g]):
+                ulen = sum(len(t) + 1 for t, _, _ in unit)
+                if cur and n + ulen > self.max_chars:
+                    parts.append(cur)
+                    cur, n = [], 0
+                cur.extend(unit)
+                n += ulen
+        if cur:
+            parts.append(cur)
+        kind, no = self.article
+        self.lines = []
+        return [{"text": "\n".join(t for t, _, _ in part), "page_start": part[0][2], "page_end": part[-1][2],
+                 "char_start": part[0][1], "char_end": part[-1][1] + len(part[-1][0]),
+                 "article_no": no, "article_kind": kind} for part in parts]
+
+def make_chunker(chunking: str = CHUNKING):
+    if chunking not in CHUNKING_MODES:
+        raise ValueError(f"Bilinmeyen chunking: {chunking} ({', '.join(CHUNKING_MODES)})")
+    return ArticleChunker() if chunking == "article" else StreamChunker()
+
+def chunk_text_paragraphwise(text: str, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP) -> List[str]:
+    if not text:
+        return []
+    chunker = StreamChunker(size, overlap)
+    return [c["text"] for c in chunker.feed(text) + chunker.finish()]
+
+def page_label(p: Dict) -> str:
+    # atıf için sayfa etiketi: "s. 3", "s. 3-4"; sayfası olmayan belgede (ya da eski snapshot'ta) boş
+    a, b = p.get("page_start"), p.get("page_end")
+    if a is None:
+        return ""
+    return f"s. {a}" if a == b else f"s. {a}-{b}"
+
+def cite_label(p: Dict) -> str:
+    # madde + sayfa: "Madde 7, s. 3"; ikisi de yoksa boş
+    return ", ".join(x for x in (article_label(p), page_label(p)) if x)
+
+def source_label(c: Dict) -> str:
+    # judge() çıktısındaki atıf: "dosya.pdf (Madde 7, s. 3)"
+    loc = ", ".join(x for x in (c.get("article"), c.get("page")) if x)
+    return f"{c['source']} ({loc})" if loc else c["source"]
+
+def score_kind(mode: Optional[str]) -> str:
+    return SCORE_KINDS.get(mode, "cosine")
+
+def judge(results: List[Tuple[float, Dict]], threshold: float = DEFAULT_SIM_THRESHOLD,
+          mode: Optional[str] = None) -> Dict:
+    """Eşik kararı (arayüz ve HTTP API aynı kuralı kullanır): en iyi cosine skoru eşiğin altındaysa NOT_FOUND.
+    mode: search() çıktısındaki kullanılan mod; skoru cosine olmayan modlarda (SCORE_KINDS) eşik uygulanmaz.
+    {"result": "FOUND" | "NOT_FOUND", "best_score", "mode", "score_kind", "threshold_applied", "passages"} döner;
+    passages audit log'a yazılan biçimdedir."""
+    best = float(results[0][0]) if results else 0.0
+    kind = score_kind(mode)
+    applied = kind == "cosine"
+    found = bool(results) and (best >= threshold or not applied)
+    passages = [{"score": float(score), "source": p["source"], "chunk_index": p["chunk_index"],
+                 "page": page_label(p), "article": article_label(p), "text": p["text"] if found else p["text"][:NOT_FOUND_TEXT_CHARS],
+                 # aynı metnin yakın kopyaları (dedup); vektörleri bu passage'ınki
+                 "also": [{"source": d["source"], "chunk_index": d["chunk_index"], "page": page_label(d),
+                           "article": article_label(d)} for d in getattr(p, "duplicates", ())]}
+                for score, p in results]
+    return {"result": "FOUND" if found else "NOT_FOUND", "best_score": best, "mode": mode, "score_kind": kind,
+            "threshold_applied": applied, "passages": passages}
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def corpus_key(docs: List[Tuple[str, str]], model_name=EMBED_MODEL_NAME,
+               size=CHUNK_SIZE, overlap=CHUNK_OVERLAP, chunking=CHUNKING,
+               dedup=DEDUP_THRESHOLD if DEDUP else None) -> str:
+    """(dosya adı, yol) listesinden snapshot anahtarı üretir.
+    Doküman içerikleri + model + chunk ayarları değişirse anahtar da değişir."""
+    h = hashlib.sha256()
+    h.update(json.dumps({"v": SNAPSHOT_VERSION, "model": model_name,
+                         "chunk_size": size, "chunk_overlap": overlap, "chunking": chunking,
+                         "dedup": dedup}).encode("utf-8"))
+    for fname, path in sorted(docs):
+        h.update(fname.encode("utf-8"))
+        h.update(file_sha256(path).encode("ascii"))
+    return h.hexdigest()
+
+# -----------------------------
+# UTIL: query caches
+# -----------------------------
+def normalize_query(q: str) -> str:
+    # sadece boşluk normalizasyonu; büyük/küçük harf modele göre anlam taşıyabilir
+    return " ".join(q.split())
+
+class LRUCache:
+    """Thread-safe, boyut sınırlı LRU; hit/miss sayar."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits,
+                    "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+# -----------------------------
+# DocStore: passages + embeddings + faiss
+# -----------------------------
+class IndexValidationError(Exception):
+    """Yeni indeks kontrolden geçemedi; aktif sürüm yerinde kalır."""
+
+def _no_progress(stage: str, done: int = 0, total: Optional[int] = None):
+    pass
+
+class IndexState:
+    """Tek bir indeks sürümü. Oluşturulduktan sonra değiştirilmez;
+    sorgular tek bir referansı okur, yeniden yükleme yeni bir IndexState ile yer değiştirir."""
+
+    def __init__(self, passages: Optional[PassageStore] = None, embeddings=None, index=None, files=None,
+                 key=None, last_sync=None, lexical=None, mapped: bool = False):
+        # sütunlu depo; satırlar {id, text, source, chunk_index, page_start, page_end, char_start, char_end,
+        # article_no, article_kind} görünümü; indekste sadece temsilci satırların vektörü var (canon_fids)
+        self.passages = passages if passages is not None else PassageStore.empty()
+        self.embeddings = embeddings  # float32 kopya veya None (vektörler sadece indekste)
+        self.index = index
+        self.files = files or {}  # file_name -> {sha256, start, end}  (passages içindeki aralık)
+        self.key = key  # snapshot anahtarı
+        self.last_sync = last_sync  # {"reused", "encoded", "removed", "timings"}
+        self.version = 0  # DocStore devreye alırken atar; sonuç önbelleği anahtarında kullanılır
+        self.mapped = mapped  # indeks snapshot dosyasından eşlenmiş (süreçler arası paylaşılan)
+        # BM25 ters indeksi; embedding'lerle aynı sürümde kurulur (snapshot'tan açılıyorsa hazır gelir)
+        if lexical is None and len(self.passages):
+            lexical = BM25Index(list(self.passages.texts()))
+        self.lexical = lexical
+        # (belge, madde) -> satırlar; madde sütunlarından kurulur
+        self.articles = ArticleIndex(self.passages) if len(self.passages) else None
+        # yakın kopyası olan passage var mı (BM25 sonuçları temsilcilere katlanır)
+        self.has_duplicates = len(self.passages.representatives()) < len(self.passages)
+
+class DocStore:
+    def __init__(self, model_name=EMBED_MODEL_NAME, index_kind=INDEX_KIND, index_params=None,
+                 warn: Callable = log.warning, lazy_model: bool = False,
+                 encoder: str = ENCODER_BACKEND, encoder_threads: int = ENCODER_THREADS,
+                 chunking: str = CHUNKING, dedup: bool = DEDUP):
+        """lazy_model=True: model yüklenmez; ilk kullanımda ya da start_background_load() ile yüklenir.
+        encoder: "torch" | "onnx" | "onnx-int8" (encoders.py). chunking: "article" | "paragraph".
+        dedup: yakın kopya passage'lar için tek vektör (dedup.py)."""
+        self.model_name = model_name
+        self.chunking = chunking
+        self.dedup = dedup
+        self.encoder = encoder
+        self.encoder_threads = encoder_threads
+        # kullanıcıya gösterilecek uyarılar; arka plan thread'lerinden de çağrılır (st.warning orada çalışmaz).
+        # reload / sync_documents çağrı başına ayrı warn alabilir (ör. IndexJob uyarıları işe kaydeder)
+        self.warn = warn
+        self.index_kind = index_kind
+        self.index_params = dict(INDEX_PARAMS if index_params is None else index_params)
+        self._model = None
+        self._embed_dim = None
+        self._model_lock = threading.Lock()
+        self.model_error = None  # arka planda yükleme hatası (ilk kullanımda tekrar denenir)
+        self._loaders = []  # start_background_load thread'leri
+        self._state = IndexState()
+        self._versions = itertools.count(1)
+        self.query_emb_cache = LRUCache(QUERY_EMB_CACHE_SIZE)
+        self.result_cache = LRUCache(RESULT_CACHE_SIZE)
+        # indeks değişince boşaltılmaz: girdiler sürüm taşır, ilk kaçırmada yenilenir
+        self.semantic_cache = SemanticCache() if SEMANTIC_CACHE else None
+        self._mode_stats = {}  # kullanılan mod -> [sorgu sayısı, toplam süre sn]
+        self._stats_lock = threading.Lock()
+        self.text_cache = PageTextCache(TEXT_CACHE_PATH, max_bytes=TEXT_CACHE_MAX_MB << 20)
+        # add_document ile eklenip henüz build_index görmemiş passage'lar
+        self._staged = []
+        self._staged_files = {}
+        # son build/sync'in aşama süreleri (sn): extract, chunk, encode, index
+        self._ingest_t = dict.fromkeys(INGEST_STAGES, 0.0)
+        # yeniden yüklemeleri sıraya koyar; sorgular kilit almaz
+        self._lock = threading.RLock()
+        if not lazy_model:
+            self._load_model()
+
+    # -----------------------------
+    # Model: ilk kullanımda ya da arka planda yüklenir
+    # -----------------------------
+    def _load_model(self):
+        with self._model_lock:
+            if self._model is not None:
+                return self._model
+            with startup.timed("model load"):
+                model = load_encoder(self.model_name, self.encoder, self.encoder_threads)
+            with startup.timed("warm-up encode"):
+                model.encode([WARMUP_TEXT], convert_to_numpy=True, show_progress_bar=False)
+            self._embed_dim = model.get_sentence_embedding_dimension()
+            self._model = model
+            self.model_error = None
+            return model
+
+    @property
+    def model(self):
+        # yükleme sürüyorsa (arka plan thread'i) bitmesini bekler
+        return self._model if self._model is not None else self._load_model()
+
+    @property
+    def encoder_id(self) -> str:
+        # snapshot anahtarında model kimliği; farklı arka uçların vektörleri birbirine karıştırılmaz
+        return self.model_name if self.encoder == "torch" else f"{self.model_name}@{self.encoder}"
+
+    @property
+    def dedup_threshold(self) -> Optional[float]:
+        # snapshot anahtarı ve meta'da; kapalıysa None
+        return DEDUP_THRESHOLD if self.dedup else None
+
+    @property
+    def model_ready(self) -> bool:
+        return self._model is not None
+
+    @property
+    def embed_dim(self) -> int:
+        # dynamic embed dim
+        if self._embed_dim is None:
+            self._load_model()
+        return self._embed_dim
+
+    def start_background_load(self, load_snapshot: bool = True, cache_dir=INDEX_CACHE_DIR) -> List[threading.Thread]:
+        """Modeli (ısınma encode'u ile) ve istenirse son snapshot'ı arka planda yükler; arayüz beklemeden açılır."""
+        def load_model():
+            try:
+                self._load_model()
+            except Exception as e:
+                self.model_error = e
+                log.warning(f"Model yüklenemedi: {e}")
+
+        def load_index():
+            # kilit: bu sırada başlatılan bir yeniden yükleme, eski snapshot'ın sonradan devreye girmesini görmesin
+            with self._lock, startup.timed("snapshot load"):
+                if self.index is None:
+                    self.load_latest_snapshot(cache_dir)
+
+        threads = [threading.Thread(target=load_model, name="model-load", daemon=True)]
+        if load_snapshot:
+            threads.append(threading.Thread(target=load_index, name="snapshot-load", daemon=True))
+        for t in threads:
+            t.start()
+        self._loaders = threads
+        return threads
+
+    @property
+    def loading(self) -> bool:
+        return any(t.is_alive() for t in self._loaders)
+
+    def wait_loaded(self, timeout: Optional[float] = None) -> bool:
+        """Arka plan yüklemesi bitene kadar bekler; süre dolarsa False."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for t in self._loaders:
+            t.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        return not self.loading
+
+    # okuma kolaylığı: aktif sürümün alanları
+    @property
+    def passages(self):
+        return self._state.passages
+
+    @property
+    def embeddings(self):
+        return self._state.embeddings
+
+    @property
+    def index(self):
+        return self._state.index
+
+    @property
+    def files(self):
+        return self._state.files
+
+    @property
+    def snapshot_key(self):
+        return self._state.key
+
+    @property
+    def last_sync(self):
+        return self._state.last_sync
+
+    @property
+    def index_mapped(self) -> bool:
+        return self._state.mapped
+
+    def _take_timings(self) -> Dict:
+        # biriken aşama sürelerini döner ve sayaçları sıfırlar
+        t, self._ingest_t = self._ingest_t, dict.fromkeys(INGEST_STAGES, 0.0)
+        return t
+
+    def _record_ingest(self, stats: Dict):
+        # senkron / build sonu: aşama süreleri ve passage sayıları metriklere
+        metrics.observe_stages(metrics.INGEST_STAGE, stats.get("timings") or {})
+        for kind in ("encoded", "reused", "duplicates"):
+            metrics.INGEST_PASSAGES.inc(stats.get(kind, 0), kind=kind)
+
+    def _swap(self, state: IndexState):
+        # yeni indeks sürümü devreye girer; önceki sürüme ait sorgu önbellekleri boşaltılır
+        state.version = next(self._versions)
+        self._state = state
+        metrics.INDEX_SIZE.set(len(state.passages), kind="passages")
+        metrics.INDEX_SIZE.set(state.index.ntotal if state.index is not None else 0, kind="vectors")
+        self.query_emb_cache.clear()
+        self.result_cache.clear()
+
+    def mode_stats(self) -> Dict:
+        # kullanılan moda göre ortalama sorgu gecikmesi (dense ile sözcüksel kısa yol karşılaştırması)
+        with self._stats_lock:
+            return {m: {"queries": n, "avg_ms": 1000 * t / n} for m, (n, t) in self._mode_stats.items()}
+
+    def cache_stats(self) -> Dict:
+        return {"embedding": self.query_emb_cache.stats(), "result": self.result_cache.stats(),
+                "semantic": self.semantic_cache.stats() if self.semantic_cache is not None else None,
+                "index_version": self._state.version}
+
+    def clear(self, cache_dir: Optional[str] = None):
+        """İndeksi boşaltır. cache_dir verilirse LATEST de silinir: snapshot izleyicisi (watch_snapshots)
+        temizlenen indeksi geri yüklemez, sonraki açılışlar da boş başlar (snapshot'lar diskte kalır)."""
+        with self._lock:
+            self._staged = []
+            self._staged_files = {}
+            if cache_dir is not None:
+                try:
+                    (pathlib.Path(cache_dir) / "LATEST").unlink()
+                except FileNotFoundError:
+                    pass
+            self._swap(IndexState())
+
+    def _iter_chunks(self, file_path: str, file_name: str, warn: Optional[Callable] = None) -> Iterator[Dict]:
+        """Dosyayı sayfa sayfa okuyup chunk'lar; passage'lar oluştukça üretilir (belge metni bütün halde tutulmaz)."""
+        chunker = make_chunker(self.chunking)
+        pages = iter_text_pages(file_path, text_cache=self.text_cache, warn=warn or self.warn)
+        i = 0
+        while True:
+            t = time.perf_counter()
+            item = next(pages, None)
+            self._ingest_t["extract"] += time.perf_counter() - t
+            t = time.perf_counter()
+            chunks = chunker.finish() if item is None else chunker.feed(item[1], item[0])
+            self._ingest_t["chunk"] += time.perf_counter() - t
+            for ch in chunks:
+                yield {"id": mkid(file_name + f"__{i}"), "source": file_name, "chunk_index": i, **ch}
+                i += 1
+            if item is None:
+                return
+
+    def _chunk_file(self, file_path: str, file_name: str) -> List[Dict]:
+        return list(self._iter_chunks(file_path, file_name))
+
+    def add_document(self, file_path: str, file_name: str):
+        new = self._chunk_file(file_path, file_name)
+        with self._lock:
+            start = len(self._staged)
+            self._staged.extend(new)
+            self._staged_files[file_name] = {"sha256": file_sha256(file_path), "start": start, "end": len(self._staged)}
+        return len(new)
+
+    def _encode(self, texts: List[str], progress=True) -> np.ndarray:
+        t = time.perf_counter()
+        emb = self.model.encode(texts, convert_to_numpy=True, show_progress_bar=progress)
+        emb = emb.astype("float32")
+        # normalize for cosine via inner product
+        faiss.normalize_L2(emb)
+        self._ingest_t["encode"] += time.perf_counter() - t
+        return emb
+
+    def _keep_copy(self) -> bool:
+        return KEEP_EMBEDDINGS_COPY or not reconstructable(self.index_kind)
+
+    def _vectors(self, state: IndexState, rows) -> np.ndarray:
+        """Satırların normalize vektörleri: Python kopyası varsa oradan, yoksa FAISS indeksinden
+        (temsilcinin id'si ile; yakın kopyalar temsilcinin vektörünü paylaşır)."""
+        rows = list(rows)
+        if state.embeddings is not None:
+            return state.embeddings[rows]
+        if not rows:
+            return np.zeros((0, self.embed_dim), dtype="float32")
+        ids = np.ascontiguousarray(state.passages.canon_fids[rows], dtype="int64")
+        return state.index.reconstruct_batch(ids)
+
+    def _fid_vectors(self, state: IndexState, fids: np.ndarray) -> np.ndarray:
+        # temsilci fid'lerinin vektörleri (state içinde var olmaları gerekir)
+        if state.embeddings is not None:
+            return state.embeddings[state.passages.rows_for_fids(fids)]
+        return state.index.reconstruct_batch(np.ascontiguousarray(fids, dtype="int64"))
+
+    def _row_vectors(self, passages: PassageStore, fresh_ids: np.ndarray, fresh_emb: np.ndarray,
+                     base: Optional[IndexState] = None) -> np.ndarray:
+        """Yeni sürümün satır başına vektör matrisi: temsilcisi bu turda encode edilenler fresh_emb'den,
+        diğerleri tabandaki (değişmeyen) temsilciden."""
+        canon = np.asarray(passages.canon_fids)
+        out = np.empty((len(passages), fresh_emb.shape[1] if len(fresh_emb) else self.embed_dim), dtype="float32")
+        pos = {f: i for i, f in enumerate(fresh_ids.tolist())}
+        is_new = np.array([c in pos for c in canon.tolist()], dtype=bool)
+        if is_new.any():
+            out[is_new] = fresh_emb[[pos[c] for c in canon[is_new].tolist()]]
+        if (~is_new).any():
+            out[~is_new] = self._fid_vectors(base, canon[~is_new])
+        return out
+
+    def _build_ann(self, emb: np.ndarray, passages: PassageStore):
+        # normalize edilmiş vektörlerde inner product = cosine; kararlı faiss id'leri ile.
+        # emb satır başına; indekse sadece temsilciler girer
+        t = time.perf_counter()
+        reps = passages.representatives()
+        ids = np.ascontiguousarray(passages.fids[reps], dtype="int64")
+        index = build_ann_index(self.index_kind, emb[reps], ids, metric="ip", params=self.index_params)
+        self._ingest_t["index"] += time.perf_counter() - t
+        return index
+
+    def _validate(self, index, passages: PassageStore, fresh_ids: np.ndarray, fresh_emb: np.ndarray,
+                  expect_passages: bool = True) -> int:
+        """Devreye almadan önce yeni sürümün kontrolü; sorun varsa IndexValidationError.
+        Vektör sayısı temsilci sayısını tutmalı, yeni vektörler sonlu olmalı ve örneklem
+        kendi passage'ını bulmalı. Denenen örnek sayısını döner."""
+        if not len(passages):
+            if expect_passages:
+                raise IndexValidationError("Dokümanlardan hiç passage çıkarılamadı")
+            return 0
+        n_reps = len(passages.representatives())
+        if index is None or index.ntotal != n_reps:
+            raise IndexValidationError(f"İndeksteki vektör sayısı {getattr(index, 'ntotal', 0)}, beklenen {n_reps}")
+        if len(fresh_emb) and not np.isfinite(fresh_emb).all():
+            raise IndexValidationError("Encode edilen vektörlerde NaN/inf var")
+        n = min(VALIDATE_PROBES, len(fresh_ids))
+        if not n:
+            return 0
+        pick = np.unique(np.linspace(0, len(fresh_ids) - 1, n).astype(int))
+        _, I = index.search(np.ascontiguousarray(fresh_emb[pick]), min(VALIDATE_K, index.ntotal))
+        hit = float(np.mean([fid in row for fid, row in zip(fresh_ids[pick].tolist(), I.tolist())]))
+        if hit < VALIDATE_MIN_HIT:
+            raise IndexValidationError(f"Örneklem passage'ların sadece %{100 * hit:.0f}'i kendi vektörüyle bulundu")
+        return len(pick)
+
+    def build_index(self):
+        """add_document ile eklenenlerin tamamını encode edip yeni indeksi devreye alır."""
+        with self._lock:
+            passages, files = self._staged, self._staged_files
+            self._staged, self._staged_files = [], {}
+            if not passages:
+                self._take_timings()
+                self._swap(IndexState())
+                return
+            dd = Deduper() if self.dedup else None
+            for p in passages:
+                fid = faiss_id(p["id"])
+                p["canon_fid"] = dd.canonical(fid, p["text"]) if dd else fid
+            reps = [p for p in passages if p["canon_fid"] == faiss_id(p["id"])]
+            fresh_emb = self._encode([p["text"] for p in reps])
+            fresh_ids = np.array([p["canon_fid"] for p in reps], dtype="int64")
+            passages = PassageStore.from_passages(passages)
+            emb = self._row_vectors(passages, fresh_ids, fresh_emb)
+            index = self._build_ann(emb, passages)
+            probes = self._validate(index, passages, fresh_ids, fresh_emb)
+            stats = {"reused": 0, "encoded": len(reps), "removed": 0, "duplicates": len(passages) - len(reps),
+                     "validated": probes, "timings": self._take_timings()}
+            self._record_ingest(stats)
+            self._swap(IndexState(passages, emb if self._keep_copy() else None, index, files, last_sync=stats))
+
+    def sync_documents(self, docs: List[Tuple[str, str]], progress: Callable = _no_progress,
+                       warn: Optional[Callable] = None) -> Dict:
+        """Mevcut indeksi verilen (dosya adı, yol) listesine eşitler.
+        Sadece yeni/değişen dosyalar encode edilir; silinen dosyaların vektörleri indeksten düşülür.
+        Yakın kopya passage'lar (dedup) encode edilmez, temsilcinin vektörünü kullanır.
+        Aktif indekse dokunulmaz: değişiklikler kopyada yapılır, yeni sürüm kontrol edilir (_validate)
+        ve en sonda yer değiştirilir.
+        progress(aşama, yapılan, toplam) her dosya / encode grubu / aşama başında çağrılır; istisna
+        fırlatırsa (ör. iptal) senkron yarıda kalır ve aktif sürüm değişmez. Yer değiştirmeden sonra çağrılmaz.
+        warn: sayfa okuma uyarıları için (varsayılan self.warn)."""
+        with self._lock:
+            self._take_timings()  # add_document'tan kalan süreler bu senkrona ait değil
+            cur = self._state
+            have_base = cur.index is not None
+            builder = PassageStoreBuilder()  # yeni sürümün passage'ları (sütunlu)
+            files = {}
+            fresh_ids = []   # yeniden encode edilen passage'ların faiss id'leri
+            fresh_embs = []  # fresh için ENCODE_BATCH'lik gruplar halinde hesaplanan embedding'ler
+            pending = []     # henüz encode edilmemiş metinler
+            drop_ids = []    # indeksten çıkarılacak faiss id'leri
+            reused = 0
+            seen = set()
+
+            def encode(fid, text):
+                fresh_ids.append(fid)
+                pending.append(text)
+                if len(pending) >= ENCODE_BATCH:
+                    fresh_embs.append(self._encode(pending, progress=False))
+                    pending.clear()
+                    progress("encode", len(fresh_ids), None)
+
+            plan = []
+            for i, (fname, path) in enumerate(docs):
+                progress("hash", i, len(docs))
+                seen.add(fname)
+                sha = file_sha256(path)
+                old = cur.files.get(fname)
+                plan.append((fname, path, sha, old, have_base and old and old["sha256"] == sha))
+            # değişmeyen dosyaların passage'ları; temsilcileri dedup'a önceden kaydedilir ki
+            # yeni belgelerdeki kopyaları vektörü hazır olan passage'a bağlansın
+            kept = set()
+            dd = Deduper() if self.dedup else None
+            for _, _, _, old, same in plan:
+                if same:
+                    fids = cur.passages.fids[old["start"]:old["end"]].tolist()
+                    kept.update(fids)
+                    if dd is not None:
+                        canon = cur.passages.canon_fids[old["start"]:old["end"]].tolist()
+                        for r, (f, c) in enumerate(zip(fids, canon), old["start"]):
+                            if f == c:
+                                dd.add(f, cur.passages.text(r))
+            orphans = []  # (yeni satır, eski satır): temsilcisi bu senkronda düşen kopyalar
+            for i, (fname, path, sha, old, same) in enumerate(plan):
+                progress("files", i, len(plan))
+                start = builder.n
+                if same:
+                    builder.add_rows(cur.passages, old["start"], old["end"])
+                    reused += old["end"] - old["start"]
+                    canon = cur.passages.canon_fids[old["start"]:old["end"]].tolist()
+                    fids = cur.passages.fids[old["start"]:old["end"]].tolist()
+                    orphans += [(start + i, old["start"] + i) for i, (f, c) in enumerate(zip(fids, canon))
+                                if f != c and c not in kept]
+                else:
+                    if old and have_base:
+                        drop_ids.extend(cur.passages.fids[old["start"]:old["end"]].tolist())
+                    # chunk'lar sayfalar okundukça gelir; batch dolunca encode edilir
+                    for p in self._iter_chunks(path, fname, warn):
+                        fid = faiss_id(p["id"])
+                        canon = dd.canonical(fid, p["text"]) if dd is not None else fid
+                        builder.add({**p, "canon_fid": canon})
+                        if canon == fid:
+                            encode(fid, p["text"])
+                files[fname] = {"sha256": sha, "start": start, "end": builder.n}
+            if have_base:
+                for fname, old in cur.files.items():
+                    if fname not in seen:
+                        drop_ids.extend(cur.passages.fids[old["start"]:old["end"]].tolist())
+            relinked = {}
+            for row, old_row in orphans:
+                fid = int(cur.passages.fids[old_row])
+                text = cur.passages.text(old_row)
+                relinked[row] = dd.canonical(fid, text) if dd is not None else fid
+                if relinked[row] == fid:
+                    encode(fid, text)
+
+            if pending:
+                progress("encode", len(fresh_ids) - len(pending), None)
+                fresh_embs.append(self._encode(pending, progress=False))
+            progress("index", 0, 1)
+            fresh_emb = np.vstack(fresh_embs) if fresh_embs else np.zeros((0, self.embed_dim), dtype="float32")
+            fresh_ids = np.array(fresh_ids, dtype="int64")
+            passages = builder.build()
+            for row, canon in relinked.items():
+                passages.canon_fids[row] = canon
+
+            stats = {"reused": reused, "encoded": len(fresh_ids), "removed": len(drop_ids),
+                     "duplicates": int(len(passages) - len(passages.representatives()))}
+            if not len(passages):
+                self._validate(None, passages, fresh_ids, fresh_emb, expect_passages=bool(docs))
+                stats["timings"] = self._take_timings()
+                self._record_ingest(stats)
+                self._swap(IndexState(last_sync=stats))
+                return stats
+            incremental = have_base and supports_remove(self.index_kind)
+            keep = self._keep_copy()
+            emb = None
+            if keep or not incremental:
+                # tam matris sadece kopya tutulacaksa ya da indeks baştan kurulacaksa gerekir
+                emb = self._row_vectors(passages, fresh_ids, fresh_emb, cur)
+            if incremental:
+                # aktif indeks başka oturumlarda aranıyor olabilir -> kopya üzerinde çalış
+                t = time.perf_counter()
+                index = copy_index(cur.index, cur.mapped)
+                if drop_ids:
+                    index.remove_ids(np.array(drop_ids, dtype="int64"))
+                if len(fresh_ids):
+                    index.add_with_ids(fresh_emb, fresh_ids)
+                self._ingest_t["index"] += time.perf_counter() - t
+            else:
+                # ANN indeksleri (HNSW/IVF/PQ) saklı embedding'lerden yeniden kurulur; encode tekrarlanmaz
+                index = self._build_ann(emb, passages)
+            progress("validate", 0, 1)
+            stats["validated"] = self._validate(index, passages, fresh_ids, fresh_emb)
+            stats["timings"] = self._take_timings()
+            self._record_ingest(stats)
+            self._swap(IndexState(passages, emb if keep else None, index, files, last_sync=stats))
+            return stats
+
+    def reload(self, docs: List[Tuple[str, str]], cache_dir=INDEX_CACHE_DIR,
+               progress: Callable = _no_progress, warn: Optional[Callable] = None) -> Tuple[str, Dict]:
+        """Snapshot varsa onu yükler, yoksa artımlı günceller ve snapshot kaydeder.
+        ("snapshot" | "synced", istatistik) döner. progress, warn: bkz. sync_documents; snapshot okuma / yazma
+        "snapshot" aşaması olarak bildirilir."""
+        key = corpus_key(docs, self.encoder_id, chunking=self.chunking, dedup=self.dedup_threshold)
+        with self._lock:
+            self.text_cache.reset_stats()  # hit/miss sayaçları son yükleme içindir
+            if self.snapshot_key != key and (pathlib.Path(cache_dir) / key / "meta.json").exists():
+                progress("snapshot", 0, 1)
+            if self.snapshot_key == key or self.load_snapshot(key, cache_dir, warn=warn):
+                # LATEST bu sürümü göstersin (temizlemeden sonra ya da eski bir snapshot'a dönüldüyse)
+                if read_latest(cache_dir) != key:
+                    write_latest(key, cache_dir)
+                return "snapshot", self.last_sync
+            # artımlı: önceki indeksi taban al, sadece değişen dosyaları encode et
+            if self.index is None:
+                self.load_latest_snapshot(cache_dir, warn)
+            stats = self.sync_documents(docs, progress, warn)
+            progress("snapshot", 0, 2 if INDEX_MMAP else 1)
+            if self.save_snapshot(key, cache_dir) and INDEX_MMAP:
+                # yeni sürümün bellekteki özel kopyası yerine diğer süreçlerle paylaşılan eşlenmiş kopya
+                progress("snapshot", 1, 2)
+                self.load_snapshot(key, cache_dir, last_sync=stats, warn=warn)
+            return "synced", stats
+
+    def embed_query(self, q: str) -> np.ndarray:
+        key = normalize_query(q)
+        q_emb = self.query_emb_cache.get(key)
+        metrics.CACHE_REQUESTS.inc(cache="embedding", outcome="miss" if q_emb is None else "hit")
+        if q_emb is None:
+            q_emb = self.model.encode([key], convert_to_numpy=True).astype("float32")
+            faiss.normalize_L2(q_emb)
+            self.query_emb_cache.put(key, q_emb)
+        return q_emb
+
+    def _lexical_decisive(self, lex) -> bool:
+        rows, scores, coverage = lex
+        if not len(rows) or coverage < 1.0 or scores[0] < LEXICAL_MIN_SCORE:
+            return False
+        return len(scores) == 1 or scores[0] >= LEXICAL_MARGIN * scores[1]
+
+    def _canonical_lex(self, state: IndexState, lex):
+        # BM25 satırlarını temsilcilerine çevirir; aynı gruptan sadece en iyi skorlu kalır
+        rows, scores, coverage = lex
+        canon = state.passages.rows_for_fids(state.passages.canon_fids[rows])
+        seen, keep = set(), []
+        for i, r in enumerate(canon.tolist()):
+            if r >= 0 and r not in seen:
+                seen.add(r)
+                keep.append(i)
+        return canon[keep].astype("int32"), scores[keep], coverage
+
+    def _fuse(self, state: IndexState, q_emb: np.ndarray, dense: List[Tuple[float, int]], lex, top_k: int):
+        # aday kümesi: dense + BM25; BM25 adaylarının cosine'i saklı embedding'lerden hesaplanır.
+        # Sıralama birleşik skorla, raporlanan skor yine cosine (eşik anlamı değişmez).
+        cos = {row: sc for sc, row in dense}
+        rows, scores, _ = lex
+        top_lex = float(scores[0]) if len(scores) else 0.0
+        bm25 = {int(r): float(s) / top_lex for r, s in zip(rows, scores)} if top_lex > 0 else {}
+        missing = [r for r in bm25 if r not in cos]
+        if missing:
+            sims = self._vectors(state, missing) @ q_emb[0]
+            cos.update({r: float(sc) for r, sc in zip(missing, sims)})
+        fused = sorted(cos, key=lambda r: HYBRID_ALPHA * cos[r] + (1 - HYBRID_ALPHA) * bm25.get(r, 0.0), reverse=True)
+        return [(cos[r], state.passages[r]) for r in fused[:top_k]]
+
+    def _lexical(self, state: IndexState, q: str, top_k: int, timings: Dict):
+        t = time.perf_counter()
+        lex = state.lexical.search(q, top_k * HYBRID_POOL)
+        if state.has_duplicates:
+            lex = self._canonical_lex(state, lex)
+        timings["lexical"] = time.perf_counter() - t
+        return lex
+
+    def _dense(self, state: IndexState, q_emb: np.ndarray, lex, top_k: int, mode: str, timings: Dict):
+        t = time.perf_counter()
+        n = top_k * HYBRID_POOL if mode == "hybrid" else top_k
+        D, I = state.index.search(q_emb, n)
+        timings["search"] = time.perf_counter() - t
+        rows = state.passages.rows_for_fids(I[0])
+        dense = [(sc, row) for sc, row in zip(D[0].tolist(), rows.tolist()) if row >= 0]
+        if mode == "hybrid" and lex is not None:
+            return self._fuse(state, q_emb, dense, lex, top_k), "hybrid"
+        return [(sc, state.passages[row]) for sc, row in dense[:top_k]], "dense"
+
+    def search(self, q: str, top_k=5, mode=None) -> Dict:
+        """{"results": [(skor, passage)], "mode": kullanılan mod, "cached": bool, "timings": {aşama: sn},
+        "semantic": None | {"query": sonuçları kullanılan önceki soru, "similarity": cosine}}"""
+        mode = mode or RETRIEVAL_MODE
+        t0 = time.perf_counter()
+        state = self._state  # tek okuma: sorgu boyunca tutarlı sürüm
+        out = {"results": [], "mode": mode, "cached": False, "timings": {}, "semantic": None}
+        if state.index is None or len(state.passages)==0:
+            return out
+        nq = normalize_query(q)
+        rkey = (nq, int(top_k), mode, state.version)
+        cached = self.result_cache.get(rkey)
+        metrics.CACHE_REQUESTS.inc(cache="result", outcome="miss" if cached is None else "hit")
+        sem = None
+        if cached is not None:
+            results, used, semantic = cached
+            out.update(results=list(results), mode=used, cached=True, semantic=semantic)
+        else:
+            timings = out["timings"]
+            lex = None
+            art = None
+            if ARTICLE_LOOKUP and state.articles is not None:
+                t = time.perf_counter()
+                art = state.articles.lookup(q)
+                timings["article"] = time.perf_counter() - t
+            if art is None and mode == "lexical" and state.lexical is not None:
+                lex = self._lexical(state, q, top_k, timings)
+            if art is not None:
+                # "<belge> madde n": maddenin passage'ları doğrudan, embedding yok (skor 1.0)
+                results = [(1.0, state.passages[r]) for r in art["rows"][:top_k]]
+                used = "article"
+            elif mode == "lexical" and lex is not None and self._lexical_decisive(lex):
+                # kısa yol: embedding yok; skor en iyi BM25'e göre oransal (en iyi = 1.0)
+                rows, scores, _ = lex
+                results = [(float(sc / scores[0]), state.passages[int(r)]) for r, sc in zip(rows[:top_k], scores[:top_k])]
+                used = "lexical"
+            else:
+                t = time.perf_counter()
+                q_emb = self.embed_query(q)
+                timings["encode"] = time.perf_counter() - t
+                sc = self.semantic_cache
+                if sc is not None:
+                    t = time.perf_counter()
+                    sem = sc.get(nq, q_emb, state.version, top_k, mode)
+                    timings["semantic"] = time.perf_counter() - t
+                if sem is not None:
+                    results, used = list(sem["results"]), sem["mode"]
+                    out.update(cached=True, semantic={"query": sem["query"], "similarity": sem["similarity"]})
+                else:
+                    t = time.perf_counter()
+                    if mode == "hybrid" and state.lexical is not None:
+                        lex = self._lexical(state, q, top_k, timings)
+                    results, used = self._dense(state, q_emb, lex, top_k, mode, timings)
+                    if sc is not None:
+                        sc.put(nq, q, q_emb, state.version, top_k, mode, results, used, time.perf_counter() - t)
+            self.result_cache.put(rkey, (tuple(results), used, out["semantic"]))
+            out.update(results=results, mode=used)
+        out["timings"]["total"] = time.perf_counter() - t0
+        used = "semantic" if sem is not None else "cache" if out["cached"] else out["mode"]
+        with self._stats_lock:
+            st_ = self._mode_stats.setdefault(used, [0, 0.0])
+            st_[0] += 1
+            st_[1] += out["timings"]["total"]
+        metrics.QUERIES.inc(mode=used)
+        metrics.observe_stages(metrics.QUERY_STAGE, out["timings"])
+        return out
+
+    def warm_semantic_cache(self, queries: List[str], top_k: int = DEFAULT_TOP_K, mode: Optional[str] = None) -> int:
+        """Anlamsal önbelleği verilen sorularla doldurur (ör. audit'teki sık sorular); eklenen soru sayısı.
+        Madde ve sözcüksel kısa yol sorguları atlanır (önbelleğe zaten girmezler); sorgu metriklerine yazılmaz."""
+        mode = mode or RETRIEVAL_MODE
+        state, sc = self._state, self.semantic_cache
+        if sc is None or state.index is None or not len(state.passages):
+            return 0
+        todo, seen = [], set()
+        for q in queries:
+            nq = normalize_query(q)
+            if not nq or nq in seen:
+                continue
+            seen.add(nq)
+            if state.articles is not None and state.articles.lookup(q) is not None:
+                continue
+            lex = None
+            if mode in ("lexical", "hybrid") and state.lexical is not None:
+                lex = self._lexical(state, q, top_k, {})
+                if mode == "lexical" and self._lexical_decisive(lex):
+                    continue
+            todo.append((q, nq, lex))
+        if not todo:
+            return 0
+        embs = self.model.encode([nq for _, nq, _ in todo], convert_to_numpy=True,
+                                 show_progress_bar=False).astype("float32")
+        faiss.normalize_L2(embs)
+        for (q, nq, lex), e in zip(todo, embs):
+            q_emb = e[None, :]
+            t = time.perf_counter()
+            results, used = self._dense(state, q_emb, lex, top_k, mode, {})
+            sc.put(nq, q, q_emb, state.version, top_k, mode, results, used, time.perf_counter() - t)
+        return len(todo)
+
+    def query(self, q: str, top_k=5, mode=None):
+        return self.search(q, top_k, mode)["results"]
+
+    # --- snapshot: passages + embeddings + faiss index diske kaydet / yükle ---
+    def save_snapshot(self, key: str, cache_dir=INDEX_CACHE_DIR):
+        state = self._state
+        if state.index is None:
+            return None
+        root = pathlib.Path(cache_dir)
+        final = root / key
+        if not final.exists():
+            root.mkdir(parents=True, exist_ok=True)
+            # önce geçici klasöre yaz, sonra rename (yarım snapshot okunmasın)
+            tmp = pathlib.Path(tempfile.mkdtemp(prefix=f".{key[:12]}-", dir=root))
+            meta = {"version": SNAPSHOT_VERSION, "model_name": self.model_name, "encoder": self.encoder,
+                    "embed_dim": self.embed_dim, "chunk_size": CHUNK_SIZE,
+                    "chunk_overlap": CHUNK_OVERLAP, "chunking": self.chunking,
+                    "dedup": self.dedup_threshold, "n_passages": len(state.passages),
+                    "index_kind": self.index_kind, "index_params": self.index_params,
+                    "files": state.files, "created": time.time()}
+            state.passages.save(tmp / "passages")
+            if state.lexical is not None:
+                state.lexical.save(tmp / "bm25")
+            if state.embeddings is not None:
+                np.save(tmp / "embeddings.npy", state.embeddings)
+            faiss.write_index(state.index, str(tmp / "index.faiss"))
+            with open(tmp / "meta.json", "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            try:
+                os.replace(tmp, final)
+            except OSError:
+                # başka bir süreç aynı anda yazmış olabilir
+                shutil.rmtree(tmp, ignore_errors=True)
+        write_latest(key, cache_dir)
+        prune_snapshots(cache_dir, keep=SNAPSHOT_KEEP, protect=key)
+        state.key = key
+        return str(final)
+
+    def load_snapshot(self, key: str, cache_dir=INDEX_CACHE_DIR, last_sync: Optional[Dict] = None,
+                      warn: Optional[Callable] = None) -> bool:
+        """Snapshot'ı açar (INDEX_MMAP: dosyalar eşlenir, kopyalanmaz) ve devreye alır; uyumsuzsa False."""
+        d = pathlib.Path(cache_dir) / key
+        if not (d / "meta.json").exists():
+            return False
+        try:
+            with open(d / "meta.json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if (meta.get("version") != SNAPSHOT_VERSION or meta.get("model_name") != self.model_name
+                    or meta.get("encoder", "torch") != self.encoder
+                    or meta.get("chunk_size") != CHUNK_SIZE or meta.get("chunk_overlap") != CHUNK_OVERLAP
+                    or meta.get("chunking") != self.chunking or meta.get("dedup") != self.dedup_threshold):
+                return False
+            # sütunlar diskten eşlenir; metinler okundukça sayfa önbelleğine gelir
+            passages = PassageStore.load(d / "passages", mmap=INDEX_MMAP)
+            emb = None
+            if (d / "embeddings.npy").exists():
+                emb = np.load(d / "embeddings.npy", mmap_mode="r" if INDEX_MMAP else None)
+            index, mapped = read_index(d / "index.faiss", mmap=INDEX_MMAP)
+            lexical = BM25Index.load(d / "bm25", mmap=INDEX_MMAP) if (d / "bm25" / "meta.json").exists() else None
+        except Exception as e:
+            (warn or self.warn)(f"Snapshot okunamadı ({key[:12]}): {e}")
+            return False
+        if index.ntotal != len(passages.representatives()) or (emb is not None and emb.shape[0] != len(passages)):
+            return False
+        if lexical is not None and lexical.n_docs != len(passages):
+            lexical = None
+        rebuild = (meta.get("index_kind", "flat") != self.index_kind
+                   or meta.get("index_params", {}) != self.index_params)
+        if rebuild or (self._keep_copy() and emb is None):
+            # satır vektörleri: kopya varsa oradan, yoksa kaydedilen indeksten
+            loaded = IndexState(passages, emb, index, lexical=lexical)
+            lexical = loaded.lexical
+            emb = self._vectors(loaded, range(len(passages)))
+        if rebuild:
+            # farklı indeks tipiyle kaydedilmiş: embedding'ler geçerli, sadece indeksi kur
+            index, mapped = self._build_ann(emb, passages), False
+        else:
+            apply_search_params(index, self.index_kind, self.index_params)
+        with self._lock:
+            self._swap(IndexState(passages, emb if self._keep_copy() else None, index, meta.get("files", {}), key,
+                                  last_sync=last_sync or {"reused": len(passages), "encoded": 0, "removed": 0},
+                                  lexical=lexical, mapped=mapped))
+        return True
+
+    def set_index_kind(self, kind: str, params=None):
+        """İndeks tipini değiştirir; mevcut embedding'lerden yeni indeks kurulup devreye alınır."""
+        with self._lock:
+            self.index_kind = kind
+            self.index_params = dict(INDEX_PARAMS if params is None else params)
+            cur = self._state
+            if cur.index is None or not len(cur.passages):
+                return
+            emb = self._vectors(cur, range(len(cur.passages)))
+            index = self._build_ann(emb, cur.passages)
+            # korpus ve snapshot aynı: anahtar korunur (izleyici aynı snapshot'ı yeniden yüklemesin), BM25 aynen
+            # kullanılır. Yeni indeks bellekte kuruldu, dosyadan eşlenmiş değil (mapped=False)
+            self._swap(IndexState(cur.passages, emb if self._keep_copy() else None, index, cur.files, cur.key,
+                                  last_sync=cur.last_sync, lexical=cur.lexical))
+
+    def compare_index_kinds(self, kinds=INDEX_KINDS, k=10, n_queries=200) -> List[Dict]:
+        """Mevcut korpus üzerinde her indeks tipinin recall@k / gecikme / boyut değerleri (kesin flat'a karşı)."""
+        state = self._state
+        if state.index is None:
+            return []
+        # yakın kopyalar aynı vektörü paylaşır; karşılaştırma temsilciler üzerinden
+        return compare_indexes(self._vectors(state, state.passages.representatives()), kinds,
+                               k=k, n_queries=n_queries, params=self.index_params)
+
+    def storage_report(self, k=10, n_queries=200) -> Dict:
+        """Passage belleği (sütunlu depo vs. dict listesi) ve
+        vektör belleği: mevcut düzen vs. eski düzen (float32 flat indeks + float32 Python kopyası),
+        ve flat / fp16 / sq8 için kesin flat'a göre top-k uyumu."""
+        state = self._state
+        if state.index is None:
+            return {}
+        n = len(state.passages)
+        current = index_nbytes(state.index) + (state.embeddings.nbytes if state.embeddings is not None else 0)
+        baseline = 2 * n * self.embed_dim * 4
+        # passage metadata: sütunlu depo vs. eski dict listesi (örneklem üzerinden tahmin)
+        sample = [dict(p) for p in state.passages[:min(n, 2000)]]
+        dicts_est = dict_list_nbytes(sample) * n / max(len(sample), 1)
+        columnar = state.passages.nbytes()
+        return {"n_passages": n, "n_vectors": int(state.index.ntotal), "index_kind": self.index_kind,
+                "mapped": state.mapped,
+                "passages_columnar_mb": columnar / 1e6, "passages_dicts_mb": dicts_est / 1e6,
+                "bytes_per_passage": {"columnar": columnar / max(n, 1), "dicts": dicts_est / max(n, 1)},
+                "python_copy": state.embeddings is not None,
+                "current_mb": current / 1e6, "baseline_mb": baseline / 1e6,
+                "saved_mb": (baseline - current) / 1e6,
+                "kinds": self.compare_index_kinds(kinds=("flat", "fp16", "sq8"), k=k, n_queries=n_queries)}
+
+    def load_latest_snapshot(self, cache_dir=INDEX_CACHE_DIR, warn: Optional[Callable] = None) -> bool:
+        # artımlı güncelleme için taban: en son kaydedilen snapshot
+        key = read_latest(cache_dir)
+        return key is not None and self.load_snapshot(key, cache_dir, warn=warn)
+
+    def refresh_from_latest(self, cache_dir=INDEX_CACHE_DIR) -> bool:
+        """LATEST başka bir süreç tarafından (ör. arayüzden yeniden indeksleme) değiştirildiyse o snapshot'a geçer."""
+        key = read_latest(cache_dir)
+        if key is None or key == self.snapshot_key:
+            return False
+        with self._lock:
+            # kilit beklenirken LATEST değişmiş / silinmiş olabilir (ör. clear)
+            key = read_latest(cache_dir)
+            if key is None or key == self.snapshot_key:
+                return False
+            return self.load_snapshot(key, cache_dir)
+
+def read_latest(cache_dir=INDEX_CACHE_DIR) -> Optional[str]:
+    try:
+        return (pathlib.Path(cache_dir) / "LATEST").read_text(encoding="utf-8").strip() or None
+    except OSError:
+        return None
+
+def write_latest(key: str, cache_dir=INDEX_CACHE_DIR):
+    # LATEST diğer süreçlerce yoklanır: yarım yazılmış anahtar okunmasın (geçici dosya + rename)
+    latest = pathlib.Path(cache_dir) / "LATEST"
+    tmp = latest.with_name(f".LATEST.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(key, encoding="utf-8")
+    os.replace(tmp, latest)
+
+def prune_snapshots(cache_dir=INDEX_CACHE_DIR, keep=3, protect=None):
+    # sadece snapshot klasörleri (meta.json'u olan); aynı kökte başka önbellek klasörü varsa dokunulmaz
+    dirs = [d for d in pathlib.Path(cache_dir).iterdir()
+            if d.is_dir() and not d.name.startswith(".") and (d / "meta.json").exists()]
+    dirs.sort(key=lambda d: d.stat().st_mtime, reverse=True)
+    for d in dirs[keep:]:
+        if d.name != protect:
+            shutil.rmtree(d, ignore_errors=True)
+
+# -----------------------------
+# Load docs from local ./docs
+# -----------------------------
+def list_docs_from_local(path=LOCAL_DOCS_PATH):
+    p = pathlib.Path(path)
+    if not p.exists():
+        return []
+    # accept pdf/docx/txt
+    files = sorted([str(x) for x in p.iterdir() if x.suffix.lower() in {".pdf", ".docx", ".doc", ".txt"}])
+    return files
+
+# -----------------------------
+# Süreç belleği (yük testi / API durumu için)
+# -----------------------------
+def process_memory() -> Dict:
+    """{"rss_mb": anlık RSS, "pss_mb": paylaşılan sayfalar süreç sayısına bölünmüş RSS (Linux),
+    "peak_rss_mb": süreç boyunca en yüksek RSS}; ölçülemeyen alan None.
+    Eşlenmiş snapshot'ı açan süreçlerde RSS paylaşılan sayfaları tam sayar, PSS bölüştürür."""
+    rss = pss = peak = None
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    pss = int(line.split()[1]) * 1024 / 1e6
+                    break
+    except (OSError, ValueError):
+        pass
+    try:
+        import resource
+        import sys
+        # ru_maxrss: Linux'ta KB, macOS'ta bayt
+        r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = r / 1e6 if sys.platform == "darwin" else r * 1024 / 1e6
+    except ImportError:
+        pass
+    return {"rss_mb": rss, "pss_mb": pss, "peak_rss_mb": peak}
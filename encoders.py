@@ -0,0 +1,236 @@
+# encoders.py
+# Embedding encoder arka uçları: "torch" (SentenceTransformer, varsayılan), "onnx" (ONNX Runtime)
+# ve "onnx-int8" (dinamik int8 kuantize ONNX). ONNX modelleri bir kez dışa aktarılıp
+# .onnx_cache altında saklanır; sonraki açılışlar doğrudan oradan yükler. Her dışa aktarılan dosya
+# ilk seferde torch çıktısıyla karşılaştırılır (parity.json); uyumsuzsa model yüklenmez.
+# Gereken paketler: pip install "sentence-transformers[onnx]"  (onnxruntime + optimum)
+#
+# Parite ve hız kontrolü (docs/ passage'ları ve altın sorular üzerinde, torch'a karşı):
+#   python encoders.py --backend onnx-int8 --threads 4
+#   python encoders.py --backend onnx --limit 500 --out parite.json
+# Cosine uyumu veya top-k örtüşmesi eşiklerin altındaysa çıkış kodu 1 olur.
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import pathlib
+import argparse
+import platform
+from typing import Dict, List
+
+import numpy as np
+
+import startup
+
+log = logging.getLogger(__name__)
+
+ENCODER_BACKENDS = ("torch", "onnx", "onnx-int8")
+ENCODER_BACKEND = os.getenv("SBE_ENCODER", "torch")
+ENCODER_THREADS = int(os.getenv("SBE_ENCODER_THREADS", "0"))  # 0 -> kütüphane varsayılanı (tüm çekirdekler)
+# snapshot klasörünün (.index_cache) dışında: prune_snapshots oradaki eski klasörleri siler
+ONNX_CACHE_DIR = "./.onnx_cache"
+
+# parite eşikleri (torch çıktısına karşı)
+PARITY_MIN_COSINE = 0.98    # passage başına cosine, en kötü %1'lik dilim
+PARITY_MIN_OVERLAP = 0.90   # sorgu başına top-k örtüşmesi ortalaması
+# dışa aktarım kontrolü: bu metinlerin her birinde cosine >= PARITY_MIN_COSINE olmalı
+EXPORT_CHECK_TEXTS = (
+    "Tez savunma sınavı ne zaman yapılır?",
+    "Yatay geçiş başvuruları hangi tarihlerde kabul edilir?",
+    "MADDE 7 – (1) Danışman, öğrencinin kayıt olduğu yarıyılın sonuna kadar atanır.",
+    "intibak",
+    "Lisansüstü programlara kayıt için ALES puanı en az 55 olmalıdır; yabancı dil şartı ayrıca aranır.",
+)
+PARITY_FILE = "parity.json"
+
+def int8_config() -> str:
+    """İşlemciye uygun dinamik kuantizasyon profili (sentence-transformers / optimum adları)."""
+    machine = platform.machine().lower()
+    if machine in ("arm64", "aarch64"):
+        return "arm64"
+    try:
+        with open("/proc/cpuinfo", "r") as f:
+            flags = f.read()
+    except OSError:
+        flags = ""
+    if "avx512_vnni" in flags:
+        return "avx512_vnni"
+    if "avx512" in flags:
+        return "avx512"
+    return "avx2"
+
+def _onnx_dir(model_name: str, cache_dir: str) -> pathlib.Path:
+    return pathlib.Path(cache_dir) / model_name.replace("/", "__")
+
+def load_encoder(model_name: str, backend: str = ENCODER_BACKEND, threads: int = ENCODER_THREADS,
+                 cache_dir: str = ONNX_CACHE_DIR):
+    """SentenceTransformer döner (encode / get_sentence_embedding_dimension aynı);
+    ONNX arka uçlarında model ilk seferde dışa aktarılıp cache_dir altına kaydedilir."""
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"Bilinmeyen encoder: {backend} ({', '.join(ENCODER_BACKENDS)})")
+    with startup.timed("import sentence_transformers"):
+        from sentence_transformers import SentenceTransformer
+    if backend == "torch":
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        return SentenceTransformer(model_name)
+
+    import onnxruntime as ort
+    opts = ort.SessionOptions()
+    if threads:
+        opts.intra_op_num_threads = threads
+        opts.inter_op_num_threads = 1
+    local = _onnx_dir(model_name, cache_dir)
+    kwargs = {"provider": "CPUExecutionProvider", "session_options": opts}
+    if not (local / "onnx" / "model.onnx").exists():
+        log.info(f"{model_name} ONNX'e aktarılıyor -> {local}")
+        with startup.timed("onnx export"):
+            # optimum ile dışa aktarım (hub'da onnx/model.onnx yoksa otomatik); bir kez yapılır
+            SentenceTransformer(model_name, backend="onnx", model_kwargs=kwargs).save_pretrained(str(local))
+    fname = "onnx/model.onnx"
+    if backend == "onnx-int8":
+        cfg = int8_config()
+        fname = f"onnx/model_qint8_{cfg}.onnx"
+        if not (local / fname).exists():
+            from sentence_transformers import export_dynamic_quantized_onnx_model
+            # optimum'un ORTQuantizer'ı model yapılandırmasını .onnx dosyasının yanında arar
+            if not (local / "onnx" / "config.json").exists():
+                shutil.copyfile(local / "config.json", local / "onnx" / "config.json")
+            with startup.timed("onnx int8 quantize"):
+                base = SentenceTransformer(str(local), backend="onnx",
+                                           model_kwargs={**kwargs, "file_name": "onnx/model.onnx"})
+                export_dynamic_quantized_onnx_model(base, cfg, str(local))
+    kwargs["file_name"] = fname  # klasörde birden fazla .onnx olabilir (fp32 + int8)
+    model = SentenceTransformer(str(local), backend="onnx", model_kwargs=kwargs)
+    check = _export_check(model_name, model, local, fname)
+    if not check["ok"]:
+        raise RuntimeError(f"{local / fname} torch çıktısıyla uyumsuz (en düşük cosine {check['min_cosine']:.4f} "
+                           f"< {PARITY_MIN_COSINE}); SBE_ENCODER=torch kullanın ya da dosyayı silip yeniden aktarın")
+    return model
+
+def _export_check(model_name: str, model, local: pathlib.Path, fname: str) -> Dict:
+    """Dışa aktarılan dosya başına bir kez: EXPORT_CHECK_TEXTS üzerinde torch'a karşı cosine.
+    Sonuç local/parity.json'a yazılır; sonraki açılışlar torch modelini yüklemez."""
+    path = local / PARITY_FILE
+    try:
+        record = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        record = {}
+    if fname in record:
+        return record[fname]
+    from sentence_transformers import SentenceTransformer
+    with startup.timed("onnx parity check"):
+        texts = list(EXPORT_CHECK_TEXTS)
+        cos = np.sum(_encode(SentenceTransformer(model_name), texts) * _encode(model, texts), axis=1)
+    record[fname] = {"min_cosine": float(cos.min()), "mean_cosine": float(cos.mean()),
+                     "ok": bool(cos.min() >= PARITY_MIN_COSINE), "checked": time.time()}
+    log.info(f"{fname}: torch'a karşı cosine en düşük {cos.min():.4f}, ort. {cos.mean():.4f}")
+    path.write_text(json.dumps(record, indent=2), encoding="utf-8")
+    return record[fname]
+
+# -----------------------------
+# Parite / hız karşılaştırması
+# -----------------------------
+def _encode(model, texts: List[str], batch_size: int = 32) -> np.ndarray:
+    emb = model.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+    emb = emb.astype("float32")
+    emb /= np.maximum(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12)
+    return emb
+
+def _throughput(model, passages: List[str], queries: List[str]) -> Dict:
+    t = time.perf_counter()
+    emb = _encode(model, passages)
+    bulk_s = time.perf_counter() - t
+    q_ms = []
+    for q in queries:
+        t = time.perf_counter()
+        _encode(model, [q])
+        q_ms.append(1000 * (time.perf_counter() - t))
+    return {"emb": emb, "bulk_s": bulk_s, "passages_per_s": len(passages) / bulk_s if bulk_s else None,
+            "query_ms_p50": float(np.percentile(q_ms, 50)) if q_ms else None,
+            "query_ms_p95": float(np.percentile(q_ms, 95)) if q_ms else None}
+
+def parity_report(reference, candidate, passages: List[str], queries: List[str], k: int = 10) -> Dict:
+    """Aynı metinler için iki encoder'ın vektör uyumu (cosine), sorgu top-k örtüşmesi ve hızı."""
+    ref = _throughput(reference, passages, queries)
+    cand = _throughput(candidate, passages, queries)
+    cos = np.sum(ref["emb"] * cand["emb"], axis=1)
+    qr, qc = _encode(reference, queries), _encode(candidate, queries)
+    q_cos = np.sum(qr * qc, axis=1)
+    # her sorgu için kendi vektör uzayında arama: torch top-k'sının ne kadarı korunuyor
+    k = min(k, len(passages))
+    top_r = np.argsort(-(qr @ ref["emb"].T), axis=1)[:, :k]
+    top_c = np.argsort(-(qc @ cand["emb"].T), axis=1)[:, :k]
+    overlap = np.array([len(set(a) & set(b)) / k for a, b in zip(top_r, top_c)])
+    out = {
+        "passages": len(passages), "queries": len(queries), "k": k,
+        "passage_cosine": {"mean": float(cos.mean()), "min": float(cos.min()),
+                           "p01": float(np.percentile(cos, 1)), "p05": float(np.percentile(cos, 5))},
+        "query_cosine": {"mean": float(q_cos.mean()), "min": float(q_cos.min())},
+        "topk_overlap": {"mean": float(overlap.mean()), "min": float(overlap.min())},
+        "top1_agreement": float(np.mean(top_r[:, 0] == top_c[:, 0])),
+        "throughput": {name: {key: v for key, v in r.items() if key != "emb"}
+                       for name, r in (("reference", ref), ("candidate", cand))},
+    }
+    r, c = out["throughput"]["reference"], out["throughput"]["candidate"]
+    out["speedup"] = {"bulk": r["bulk_s"] / c["bulk_s"] if c["bulk_s"] else None,
+                      "query_p50": (r["query_ms_p50"] / c["query_ms_p50"]) if c["query_ms_p50"] else None}
+    out["ok"] = (out["passage_cosine"]["p01"] >= PARITY_MIN_COSINE
+                 and out["topk_overlap"]["mean"] >= PARITY_MIN_OVERLAP)
+    return out
+
+def main(argv=None) -> int:
+    from benchmark import GOLDEN_PATH, load_golden
+    from docstore import DocStore, list_docs_from_local, LOCAL_DOCS_PATH, EMBED_MODEL_NAME
+
+    ap = argparse.ArgumentParser(description="Encoder arka ucu parite ve hız kontrolü (torch'a karşı)")
+    ap.add_argument("--backend", choices=[b for b in ENCODER_BACKENDS if b != "torch"], default="onnx-int8")
+    ap.add_argument("--threads", type=int, default=ENCODER_THREADS, help="intra-op thread (0: varsayılan)")
+    ap.add_argument("--model", default=EMBED_MODEL_NAME)
+    ap.add_argument("--docs", default=LOCAL_DOCS_PATH)
+    ap.add_argument("--queries", default=GOLDEN_PATH, help="sorgu dosyası (jsonl, 'question' alanı)")
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--limit", type=int, default=None, help="en fazla bu kadar passage kullan")
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args(argv)
+
+    # passage metinleri uygulamadaki chunking ile; model yüklenmeden
+    chunker = DocStore(model_name=args.model, lazy_model=True)
+    passages = []
+    for path in list_docs_from_local(args.docs):
+        passages += [c["text"] for c in chunker._iter_chunks(path, os.path.basename(path))]
+    passages = passages[:args.limit] if args.limit else passages
+    if not passages:
+        print(f"Passage bulunamadı: {args.docs}", file=sys.stderr)
+        return 2
+    queries = [it["question"] for it in load_golden(args.queries)]
+
+    t = time.perf_counter()
+    reference = load_encoder(args.model, "torch", args.threads)
+    ref_load = time.perf_counter() - t
+    t = time.perf_counter()
+    candidate = load_encoder(args.model, args.backend, args.threads)
+    cand_load = time.perf_counter() - t
+    rep = parity_report(reference, candidate, passages, queries, args.k)
+    rep.update(model=args.model, reference="torch", candidate=args.backend, threads=args.threads,
+               int8_config=int8_config() if args.backend == "onnx-int8" else None,
+               load_s={"reference": ref_load, "candidate": cand_load},
+               thresholds={"passage_cosine_p01": PARITY_MIN_COSINE, "topk_overlap_mean": PARITY_MIN_OVERLAP})
+    text = json.dumps(rep, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    sp = rep["speedup"]
+    print(f"{args.backend}: cosine ort. {rep['passage_cosine']['mean']:.4f} (p01 {rep['passage_cosine']['p01']:.4f}), "
+          f"top-{rep['k']} örtüşme {rep['topk_overlap']['mean']:.3f}, toplu hız x{sp['bulk'] or 0:.2f}, "
+          f"sorgu p50 x{sp['query_p50'] or 0:.2f} -> {'OK' if rep['ok'] else 'PARITE BOZUK'}", file=sys.stderr)
+    return 0 if rep["ok"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
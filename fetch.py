@@ -0,0 +1,162 @@
+# fetch.py
+# Doküman indirme: tek (havuzlu) HTTP oturumu, paralel indirme, koşullu istek (ETag /
+# If-Modified-Since) ve içerik adresli yerel önbellek.
+# Değişmemiş bir dosya tek bir 304 cevabına mal olur; diske tekrar yazılmaz, geçici dosya bırakılmaz.
+#
+# Yerel deneme (Python'un http.server'ı Last-Modified / If-Modified-Since destekler):
+#   python -m http.server 8000 -d docs
+#   base url: http://127.0.0.1:8000
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import pathlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+# snapshot klasörünün (.index_cache) dışında: prune_snapshots oradaki eski klasörleri siler
+FETCH_CACHE_DIR = "./.fetch_cache"
+FETCH_WORKERS = 4             # eşzamanlı indirme sayısı (= bağlantı havuzu boyutu)
+FETCH_TIMEOUT = (5, 30)       # (bağlanma, okuma) sn
+FETCH_RETRIES = 2             # bağlantı hatası / 5xx için tekrar
+_CHUNK = 1 << 16
+
+class Fetcher:
+    """URL -> yerel dosya. İçerikler blobs/<sha256><uzantı> olarak saklanır;
+    her URL için son ETag / Last-Modified ve hangi blob'a karşılık geldiği sqlite'ta tutulur."""
+
+    def __init__(self, cache_dir: str = FETCH_CACHE_DIR, workers: int = FETCH_WORKERS,
+                 timeout=FETCH_TIMEOUT, retries: int = FETCH_RETRIES):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        self.blob_dir = pathlib.Path(cache_dir) / "blobs"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers,
+                              max_retries=Retry(total=retries, backoff_factor=0.3,
+                                                status_forcelist=(500, 502, 503, 504),
+                                                allowed_methods=("GET",)))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.conn = sqlite3.connect(str(pathlib.Path(cache_dir) / "fetch.sqlite"), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS urls (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    sha256 TEXT,
+                    suffix TEXT,
+                    size INTEGER,
+                    checked REAL
+                )
+            """)
+            self.conn.commit()
+
+    def _blob_path(self, sha: str, suffix: str) -> pathlib.Path:
+        return self.blob_dir / f"{sha}{suffix}"
+
+    def _meta(self, url: str) -> Optional[Tuple]:
+        with self._lock:
+            return self.conn.execute("SELECT etag, last_modified, sha256, suffix FROM urls WHERE url=?",
+                                     (url,)).fetchone()
+
+    def fetch(self, url: str, suffix: str = "") -> Dict:
+        """{"url", "path", "status", "sha256", "error"} döner.
+        status: "downloaded" | "not_modified" | "stale" (hata, önbellekteki kopya kullanıldı) | "error"."""
+        meta = self._meta(url)
+        cached = None
+        headers = {}
+        if meta is not None and self._blob_path(meta[2], meta[3]).exists():
+            cached = self._blob_path(meta[2], meta[3])
+            if meta[0]:
+                headers["If-None-Match"] = meta[0]
+            if meta[1]:
+                headers["If-Modified-Since"] = meta[1]
+        try:
+            with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as r:
+                if r.status_code == 304 and cached is not None:
+                    with self._lock:
+                        self.conn.execute("UPDATE urls SET checked=? WHERE url=?", (time.time(), url))
+                        self.conn.commit()
+                    return {"url": url, "path": str(cached), "status": "not_modified", "sha256": meta[2], "error": None}
+                r.raise_for_status()
+                sha, size, path = self._store(r, suffix)
+                with self._lock:
+                    self.conn.execute("INSERT OR REPLACE INTO urls (url, etag, last_modified, sha256, suffix, size, checked) "
+                                      "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                      (url, r.headers.get("ETag"), r.headers.get("Last-Modified"),
+                                       sha, suffix, size, time.time()))
+                    self.conn.commit()
+                return {"url": url, "path": str(path), "status": "downloaded", "sha256": sha, "error": None}
+        except Exception as e:
+            if cached is not None:
+                # ağ hatasında son bilinen kopyayla devam
+                return {"url": url, "path": str(cached), "status": "stale", "sha256": meta[2], "error": str(e)}
+            return {"url": url, "path": None, "status": "error", "sha256": None, "error": str(e)}
+
+    def _store(self, r, suffix: str):
+        # önce blob klasöründe geçici dosyaya yazılır (aynı disk -> atomik rename)
+        h = hashlib.sha256()
+        size = 0
+        fd, tmp = tempfile.mkstemp(dir=self.blob_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for block in r.iter_content(_CHUNK):
+                    h.update(block)
+                    size += len(block)
+                    f.write(block)
+            sha = h.hexdigest()
+            path = self._blob_path(sha, suffix)
+            if path.exists():
+                os.remove(tmp)  # içerik değişmemiş (ör. sunucu koşullu isteği desteklemiyor)
+            else:
+                os.replace(tmp, path)
+            return sha, size, path
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def fetch_many(self, items: List[Tuple[str, str]]) -> List[Dict]:
+        """[(dosya adı, url)] listesini paralel indirir; sonuçlar aynı sırada, "name" alanıyla döner."""
+        def one(item):
+            name, url = item
+            res = self.fetch(url, suffix=pathlib.Path(name).suffix.lower())
+            res["name"] = name
+            return res
+        if len(items) <= 1 or self.workers == 1:
+            return [one(it) for it in items]
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(items))) as ex:
+            return list(ex.map(one, items))
+
+    def prune(self) -> int:
+        """Hiçbir URL'nin işaret etmediği blob'ları ve yarım kalmış .part dosyalarını siler."""
+        with self._lock:
+            live = {f"{sha}{suffix}" for sha, suffix in self.conn.execute("SELECT sha256, suffix FROM urls")}
+        n = 0
+        for p in self.blob_dir.iterdir():
+            if p.name not in live:
+                p.unlink(missing_ok=True)
+                n += 1
+        return n
+
+    def close(self):
+        self.session.close()
+        with self._lock:
+            self.conn.close()
+
+def fetch_docs(fetcher: Fetcher, base_url: str, filenames: List[str]) -> List[Dict]:
+    # base_url + "/" + dosya adı şeklindeki (GitHub raw gibi) kaynaklar için kısa yol
+    base = base_url.rstrip("/")
+    return fetcher.fetch_many([(fn, f"{base}/{fn}") for fn in filenames])
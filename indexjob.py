@@ -0,0 +1,266 @@
+# indexjob.py
+# Arka plan indeksleme işi: DocStore.reload (çıkarma / chunk / encode / indeks / kontrol /
+# snapshot) ayrı bir thread'de çalışır; aşama ilerlemesi okunabilir, iş iptal edilebilir.
+# Bu sırada sorgular önceki indeksten cevaplanır; yeni sürüm ancak kontrolden geçerse
+# (DocStore._validate) tek referans değişimiyle devreye girer. İptal ya da hata aktif indekse dokunmaz.
+#
+# Gözetimsiz çalıştırma (snapshot LATEST'e yazılır; arayüz ve server.py yeni snapshot'a kendiliğinden geçer):
+#   python indexjob.py                      # docs/ klasörünü bir kez indeksle (cron: 0 3 * * *)
+#   python indexjob.py --daily 03:00        # süreç açık kalır, her gün 03:00'te yeniden indeksler
+# Çıkış kodu: 0 tamam, 1 başarısız (kontrol / hata), 2 iptal (SIGTERM / Ctrl-C), 3 belge yok.
+
+import os
+import sys
+import json
+import time
+import signal
+import logging
+import pathlib
+import argparse
+import datetime
+import threading
+import itertools
+from typing import Dict, List, Optional, Tuple
+
+import metrics
+from docstore import DocStore, IndexValidationError, list_docs_from_local, LOCAL_DOCS_PATH, INDEX_CACHE_DIR
+
+log = logging.getLogger(__name__)
+
+JOB_STATUS_FILE = "index_job.json"  # cache_dir altında; son işin durumu (başka süreçler de okur)
+SNAPSHOT_POLL_SEC = 5.0
+JOB_MAX_WARNINGS = 200  # durum dosyası / API cevabı şişmesin
+# DocStore.reload ilerleme aşamaları -> arayüz etiketi
+JOB_STAGES = {
+    "queued": "Sırada",
+    "hash": "Dosyalar kontrol ediliyor",
+    "files": "Okunuyor / chunk / encode",
+    "encode": "Encode",
+    "index": "İndeks kuruluyor",
+    "validate": "Yeni indeks kontrol ediliyor",
+    "snapshot": "Snapshot kaydediliyor",
+}
+
+class JobCancelled(Exception):
+    pass
+
+_ids = itertools.count(1)
+
+class IndexJob:
+    """Tek bir yeniden indeksleme. start() arka planda, run() bulunduğu thread'de çalıştırır."""
+
+    def __init__(self, store: DocStore, docs: List[Tuple[str, str]], cache_dir: str = INDEX_CACHE_DIR,
+                 trigger: str = "manual"):
+        self.store = store
+        self.docs = list(docs)
+        self.cache_dir = cache_dir
+        self.trigger = trigger  # "manual" | "api" | "nightly" ...
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_ids)}"
+        self.state = "queued"  # queued | running | done | failed | cancelled
+        self.stage, self.done, self.total = "queued", 0, None
+        self.created = time.time()
+        self.started = self.finished = None
+        self.mode = None   # "snapshot" | "synced"
+        self.stats = None
+        self.error = None
+        self.warnings = []  # okunamayan sayfalar / snapshot; arayüz iş panelinde gösterir
+        self._cancel = threading.Event()
+        self._thread = None
+
+    def _progress(self, stage: str, done: int = 0, total: Optional[int] = None):
+        # DocStore'un kontrol noktaları; iptal istenmişse senkron burada yarıda kalır.
+        # "snapshot" kesilmez: senkronda yeni sürüm bu aşamadan önce devreye girmiştir, kaydı yarıda
+        # bırakmak LATEST'i (diğer süreçler, sonraki açılış) geride bırakırdı
+        if self._cancel.is_set() and stage != "snapshot":
+            raise JobCancelled()
+        if stage != self.stage:
+            log.info(f"[{self.id}] {JOB_STAGES.get(stage, stage)}")
+        self.stage, self.done, self.total = stage, done, total
+
+    def _warn(self, msg: str):
+        # iş ayrı thread'de: st.warning burada görünmez, uyarılar işin durumuyla taşınır
+        log.warning(f"[{self.id}] {msg}")
+        if len(self.warnings) < JOB_MAX_WARNINGS:
+            self.warnings.append(msg)
+
+    def run(self) -> "IndexJob":
+        self.state, self.started = "running", time.time()
+        try:
+            self._progress("hash", 0, len(self.docs))
+            self.mode, self.stats = self.store.reload(self.docs, self.cache_dir, self._progress, self._warn)
+            self.state = "done"
+        except JobCancelled:
+            self.state = "cancelled"
+        except IndexValidationError as e:
+            self.state, self.error = "failed", str(e)
+            log.warning(f"[{self.id}] yeni indeks devreye alınmadı: {e}")
+        except Exception as e:
+            self.state, self.error = "failed", f"{type(e).__name__}: {e}"
+            log.exception(f"[{self.id}] indeksleme başarısız")
+        finally:
+            self.finished = time.time()
+            metrics.INDEX_JOBS.inc(result=self.state)
+            write_status(self.status(), self.cache_dir)
+        return self
+
+    def start(self) -> "IndexJob":
+        self._thread = threading.Thread(target=self.run, name=f"index-job-{self.id}", daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        # yer değiştirmeden önceki ilk kontrol noktasında durur; devreye alınmış indeks geri alınmaz
+        self._cancel.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return not self.running
+
+    @property
+    def running(self) -> bool:
+        return self.state in ("queued", "running")
+
+    def status(self) -> Dict:
+        end = self.finished or time.time()
+        frac = None
+        if self.state == "done":
+            frac = 1.0
+        elif self.total:
+            frac = min(self.done / self.total, 1.0)
+        return {"id": self.id, "state": self.state, "trigger": self.trigger, "stage": self.stage,
+                "stage_label": JOB_STAGES.get(self.stage, self.stage), "done": self.done, "total": self.total,
+                "fraction": frac, "files": len(self.docs), "started": self.started, "finished": self.finished,
+                "seconds": end - self.started if self.started else 0.0, "cancel_requested": self._cancel.is_set(),
+                "mode": self.mode, "stats": self.stats, "error": self.error, "warnings": list(self.warnings)}
+
+class IndexJobs:
+    """Süreç başına tek kuyruk: aynı anda en fazla bir iş; çalışan varken start() onu döner."""
+
+    def __init__(self, store: DocStore, cache_dir: str = INDEX_CACHE_DIR):
+        self.store = store
+        self.cache_dir = cache_dir
+        self.current = None  # son (ya da çalışan) iş
+        self._lock = threading.Lock()
+
+    def start(self, docs: List[Tuple[str, str]], trigger: str = "manual") -> Tuple[IndexJob, bool]:
+        """(iş, yeni mi) döner; çalışan bir iş varsa yenisi başlatılmaz."""
+        with self._lock:
+            if self.current is not None and self.current.running:
+                return self.current, False
+            self.current = IndexJob(self.store, docs, self.cache_dir, trigger).start()
+            return self.current, True
+
+    def cancel(self) -> bool:
+        job = self.current
+        if job is None or not job.running:
+            return False
+        job.cancel()
+        return True
+
+    @property
+    def running(self) -> bool:
+        return self.current is not None and self.current.running
+
+    def status(self) -> Optional[Dict]:
+        # bu süreçte iş yoksa son kaydedilen durum (ör. gece çalışan CLI)
+        return self.current.status() if self.current is not None else read_status(self.cache_dir)
+
+def write_status(status: Dict, cache_dir: str = INDEX_CACHE_DIR):
+    path = pathlib.Path(cache_dir) / JOB_STATUS_FILE
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_text(json.dumps(status, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError as e:
+        log.warning(f"İş durumu yazılamadı: {e}")
+
+def read_status(cache_dir: str = INDEX_CACHE_DIR) -> Optional[Dict]:
+    try:
+        return json.loads((pathlib.Path(cache_dir) / JOB_STATUS_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+def watch_snapshots(store: DocStore, cache_dir: str = INDEX_CACHE_DIR, poll_sec: float = SNAPSHOT_POLL_SEC,
+                    stop: Optional[threading.Event] = None) -> threading.Thread:
+    """Başka bir süreç (gece işi, arayüz, diğer API süreçleri) yeni snapshot yazdıysa ona geçer."""
+    stop = stop or threading.Event()
+
+    def loop():
+        while not stop.wait(poll_sec):
+            try:
+                if store.refresh_from_latest(cache_dir):
+                    log.info(f"Yeni snapshot yüklendi: {store.snapshot_key[:12]}")
+            except Exception as e:
+                log.warning(f"Snapshot kontrolü başarısız: {e}")
+
+    t = threading.Thread(target=loop, name="snapshot-watch", daemon=True)
+    t.start()
+    return t
+
+# -----------------------------
+# Gözetimsiz çalıştırma (cron / systemd timer / --daily)
+# -----------------------------
+def local_docs(path: str = LOCAL_DOCS_PATH) -> List[Tuple[str, str]]:
+    return [(os.path.basename(p), p) for p in list_docs_from_local(path)]
+
+def next_run(at: str, now: Optional[datetime.datetime] = None) -> datetime.datetime:
+    """"HH:MM" için bir sonraki yerel saat."""
+    now = now or datetime.datetime.now()
+    hh, mm = (int(x) for x in at.split(":"))
+    t = now.replace(hour=hh, minute=mm, second=0, microsecond=0)
+    return t if t > now else t + datetime.timedelta(days=1)
+
+_EXIT = {"done": 0, "failed": 1, "cancelled": 2}
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="SBE doküman indeksleme (arka plan / gece işi)")
+    ap.add_argument("--docs", default=LOCAL_DOCS_PATH)
+    ap.add_argument("--cache-dir", default=INDEX_CACHE_DIR, help="snapshot klasörü (arayüz / API ile ortak)")
+    ap.add_argument("--daily", default=None, metavar="HH:MM", help="açık kal ve her gün bu saatte indeksle")
+    ap.add_argument("--log-level", default="INFO")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(name)s %(message)s")
+    if args.daily:
+        next_run(args.daily)  # biçim hatası başta görülsün
+
+    stop = threading.Event()
+    store = DocStore(lazy_model=True)
+    job = None
+
+    def on_signal(*_):
+        stop.set()
+        if job is not None:
+            job.cancel()
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+
+    code = 0
+    while not stop.is_set():
+        if args.daily:
+            when = next_run(args.daily)
+            log.info(f"Sıradaki indeksleme: {when:%Y-%m-%d %H:%M}")
+            if stop.wait(max(0.0, (when - datetime.datetime.now()).total_seconds())):
+                break
+        docs = local_docs(args.docs)
+        if not docs:
+            log.warning(f"Belge bulunamadı: {args.docs}")
+            code = 3
+        else:
+            job = IndexJob(store, docs, args.cache_dir, trigger="nightly" if args.daily else "cli").start()
+            # ana thread sinyalleri alabilsin diye kısa aralıklarla beklenir
+            while not job.wait(0.5):
+                pass
+            st = job.status()
+            s = st["stats"] or {}
+            log.info(f"[{job.id}] {st['state']} ({st['seconds']:.1f} sn, {st['mode'] or '-'}): "
+                     f"yeniden kullanılan {s.get('reused', 0)}, encode {s.get('encoded', 0)}, "
+                     f"silinen {s.get('removed', 0)}" + (f" - {st['error']}" if st["error"] else ""))
+            code = _EXIT[st["state"]]
+        if not args.daily:
+            break
+    return code
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+# lexical.py
+# BM25 sözcüksel indeks - Türkçe'ye uygun normalizasyon:
+# İ/ı büyük-küçük harf dönüşümü, aksan katlama (ç->c, ş->s ...) ve hafif ek kırpma.
+# Embedding gerektirmediği için "madde 12", "intibak" gibi anahtar kelime sorgularında
+# transformer çağrısı yapılmadan cevap verilebilir.
+
+import re
+import json
+import pathlib
+import unicodedata
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+MIN_STEM = 3  # ek kırpıldıktan sonra kalacak en kısa gövde
+# tokenize / ağırlık hesabı değişirse artırılır; diske kaydedilmiş indeksler yeniden kurulur
+LEXICAL_VERSION = 1
+
+# Türkçe'de I -> ı, İ -> i; str.lower() bunu bilmez
+_TR_LOWER = str.maketrans({"I": "ı", "İ": "i"})
+# ı ayrıştırılamayan bir harf, NFKD ile düşmez
+_FOLD = str.maketrans({"ı": "i"})
+_TOKEN_RE = re.compile(r"\w+")
+
+# aksansız yazılmış ekler (katlamadan sonra uygulanır); uzundan kısaya denenir
+SUFFIXES = sorted({
+    "lerinden", "larindan", "lerinde", "larinda", "lerine", "larina", "lerini", "larini",
+    "leri", "lari", "ler", "lar",
+    "sinden", "sindan", "sinde", "sinda", "sine", "sina", "sini", "sinin",
+    "inden", "indan", "inde", "inda", "nden", "ndan", "nde", "nda",
+    "nin", "nun", "in", "un", "si", "su",
+    "den", "dan", "ten", "tan", "de", "da", "te", "ta",
+    "ye", "ya", "yi", "yu", "i", "u",
+    "masi", "mesi", "ma", "me",
+}, key=len, reverse=True)
+
+STOPWORDS = {
+    "ve", "veya", "ile", "bir", "bu", "su", "o", "da", "de", "ki", "mi", "mu",
+    "icin", "olan", "olarak", "gibi", "en", "her", "ne", "nasil", "nedir", "hangi",
+    "ya", "ama", "ancak", "daha", "cok", "kadar", "sonra", "once", "ise",
+}
+
+def tr_lower(text: str) -> str:
+    return text.translate(_TR_LOWER).lower()
+
+def fold(text: str) -> str:
+    # aksanları düşür: "öğrenci" -> "ogrenci", "yönergesi" -> "yonergesi"
+    text = unicodedata.normalize("NFKD", text.translate(_FOLD))
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+def stem(tok: str) -> str:
+    if tok.isdigit():
+        return tok
+    # en fazla iki ek (ör. "belgelerinden" -> "belge")
+    for _ in range(2):
+        for suf in SUFFIXES:
+            if tok.endswith(suf) and len(tok) - len(suf) >= MIN_STEM:
+                tok = tok[:-len(suf)]
+                break
+        else:
+            break
+    return tok
+
+def tokenize(text: str) -> List[str]:
+    toks = _TOKEN_RE.findall(fold(tr_lower(text)))
+    return [stem(t) for t in toks if t not in STOPWORDS]
+
+class BM25Index:
+    """Passage listesi üzerinde ters indeks. Terim ağırlıkları (idf * tf normu) kurulumda
+    önceden hesaplanır; sorgu sadece ilgili posting'lerin toplanmasıdır."""
+
+    def __init__(self, texts: List[str], k1=BM25_K1, b=BM25_B):
+        self.n_docs = len(texts)
+        self.k1, self.b = k1, b
+        postings = {}  # term -> {row: tf}
+        doc_len = np.zeros(self.n_docs, dtype="float32")
+        for row, text in enumerate(texts):
+            toks = tokenize(text)
+            doc_len[row] = len(toks)
+            for t in toks:
+                d = postings.setdefault(t, {})
+                d[row] = d.get(row, 0) + 1
+        avgdl = float(doc_len.mean()) if self.n_docs else 0.0
+        norm = k1 * (1 - b + b * doc_len / avgdl) if avgdl else np.full(self.n_docs, k1, dtype="float32")
+        self.postings = {}  # term -> (rows int32, weights float32)
+        for t, d in postings.items():
+            rows = np.fromiter(d.keys(), dtype="int32", count=len(d))
+            tf = np.fromiter(d.values(), dtype="float32", count=len(d))
+            idf = np.log(1 + (self.n_docs - len(d) + 0.5) / (len(d) + 0.5))
+            self.postings[t] = (rows, (idf * tf * (k1 + 1) / (tf + norm[rows])).astype("float32"))
+
+    # -----------------------------
+    # Disk: posting'ler terim sırasıyla tek dizide (CSR); np.load(mmap_mode="r") ile kopyalanmadan açılır
+    # -----------------------------
+    def save(self, path):
+        d = pathlib.Path(path)
+        d.mkdir(parents=True, exist_ok=True)
+        terms = sorted(self.postings)
+        offsets = np.zeros(len(terms) + 1, dtype="int64")
+        np.cumsum([len(self.postings[t][0]) for t in terms], out=offsets[1:])
+        rows = [self.postings[t][0] for t in terms]
+        weights = [self.postings[t][1] for t in terms]
+        np.save(d / "rows.npy", np.concatenate(rows) if rows else np.zeros(0, dtype="int32"))
+        np.save(d / "weights.npy", np.concatenate(weights) if weights else np.zeros(0, dtype="float32"))
+        np.save(d / "offsets.npy", offsets)
+        with open(d / "meta.json", "w", encoding="utf-8") as f:
+            json.dump({"version": LEXICAL_VERSION, "k1": self.k1, "b": self.b, "n_docs": self.n_docs,
+                       "terms": terms}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path, mmap: bool = True, k1=BM25_K1, b=BM25_B) -> Optional["BM25Index"]:
+        """Kaydedilmiş indeks; sürüm ya da parametreler farklıysa None (çağıran yeniden kurar)."""
+        d = pathlib.Path(path)
+        with open(d / "meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != LEXICAL_VERSION or meta.get("k1") != k1 or meta.get("b") != b:
+            return None
+        mode = "r" if mmap else None
+        rows, weights = np.load(d / "rows.npy", mmap_mode=mode), np.load(d / "weights.npy", mmap_mode=mode)
+        offsets = np.load(d / "offsets.npy").tolist()
+        self = cls.__new__(cls)
+        self.n_docs, self.k1, self.b = meta["n_docs"], k1, b
+        # terim başına dilimler eşlenmiş dizilerin görünümleri (kopya yok)
+        self.postings = {t: (rows[offsets[i]:offsets[i + 1]], weights[offsets[i]:offsets[i + 1]])
+                         for i, t in enumerate(meta["terms"])}
+        return self
+
+    def search(self, query: str, top_k=5) -> Tuple[np.ndarray, np.ndarray, float]:
+        """(satırlar, skorlar, kapsama) döner. Kapsama: sorgu terimlerinden en iyi
+        passage'da geçenlerin oranı (0-1)."""
+        q_terms = list(dict.fromkeys(tokenize(query)))
+        terms = [t for t in q_terms if t in self.postings]
+        if not terms or not self.n_docs:
+            return np.zeros(0, dtype="int32"), np.zeros(0, dtype="float32"), 0.0
+        scores = np.zeros(self.n_docs, dtype="float32")
+        for t in terms:
+            rows, w = self.postings[t]
+            scores[rows] += w
+        k = min(top_k, int((scores > 0).sum()))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        best = int(top[0])
+        covered = sum(1 for t in terms if best in self.postings[t][0])
+        return top.astype("int32"), scores[top], covered / len(q_terms)
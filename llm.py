@@ -0,0 +1,230 @@
+# llm.py
+# Sıkı LLM özetleme (sadece verilen pasajlar) - OpenAI uyumlu chat completions API üzerinden.
+# - Cevap token token akar (stream=True, SSE); ilk kelimeler beklemeden ekrana düşer.
+# - Sert süre bütçesi: ilk token ve toplam süre aşılırsa akış kesilir, uygulama pasajlarla devam eder.
+# - Tamamlanan özetler (soru, pasaj id'leri ve metinleri, model, prompt sürümü) anahtarıyla sqlite'ta saklanır.
+#
+# OPENAI_BASE_URL ile istek başka bir sunucuya yönlendirilebilir; çevrimdışı deneme için
+# bench/llm_stub.py aynı API'yi taklit eden yerel bir sunucu başlatır.
+
+import os
+import json
+import time
+import queue
+import sqlite3
+import hashlib
+import logging
+import pathlib
+import threading
+from typing import Dict, List, Optional
+
+import metrics
+from articles import article_label
+
+log = logging.getLogger(__name__)
+
+LLM_MODEL = os.getenv("SBE_LLM_MODEL", "gpt-4o-mini")  # hesabınızda erişilebilen bir model
+LLM_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+LLM_MAX_TOKENS = 300
+LLM_FIRST_TOKEN_SEC = 8.0   # ilk token bu sürede gelmezse vazgeç
+LLM_TIMEOUT_SEC = 30.0      # toplam süre bütçesi
+# prompt değişirse artırın -> özet önbelleği geçersizleşir
+PROMPT_VERSION = 3
+SUMMARY_CACHE_PATH = os.path.join("./.index_cache", "summaries.sqlite")
+
+SYSTEM_PROMPT = ("Sen bir mevzuat/hukuk asistanısın. Aşağıdaki **sadece** verilen pasajlardan özet çıkaracaksın. "
+                 "Yeni bilgi ekleme, genelleme yaparken bile sadece bu pasajlarda açıkça geçenlerden hareket et. "
+                 "Eğer pasajlarda sorunun kesin cevabı yoksa 'VERI YETERSIZ' yaz. "
+                 "Cevabı Türkçe ver. Kısa ve net maddeler halinde yaz. Her maddenin sonunda kaynak belirt (dosya adı, mevzuat maddesi, sayfa ve chunk).")
+
+def _cite(p: Dict) -> str:
+    # docstore.cite_label ile aynı biçim; llm.py docstore'u (model yüklemesini) içe aktarmasın diye burada
+    a, b = p.get("page_start"), p.get("page_end")
+    page = "" if a is None else (f", s. {a}" if a == b else f", s. {a}-{b}")
+    art = f", {article_label(p)}" if p.get("article_no") is not None else ""
+    # yakın kopyalar (dedup): aynı metnin geçtiği diğer belgeler de kaynak olarak verilir
+    also = "".join(f"; aynı metin: {d['source']}" + (f", {article_label(d)}" if d.get("article_no") is not None else "")
+                   for d in getattr(p, "duplicates", ()))
+    return f"{p['source']}{art}{page} - chunk {p['chunk_index']}{also}"
+
+def build_messages(query: str, passages: List[Dict]) -> List[Dict]:
+    combined = "\n\n---\n\n".join([f"[SOURCE: {_cite(p)}]\n{p['text']}" for p in passages])
+    return [{"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": f"Soru: {query}\n\nPasajlar:\n{combined}\n\nCevap:"}]
+
+def summary_key(query: str, passages: List[Dict], model: str, prompt_version: int = PROMPT_VERSION) -> str:
+    # passage id'si (kaynak + chunk) içerik değişince aynı kalır: aynı adla yenilenen belgenin eski
+    # özeti dönmesin diye her passage'ın metin özeti de anahtara girer
+    raw = json.dumps([" ".join(query.split()),
+                      [[p["id"], hashlib.sha256(p["text"].encode("utf-8")).hexdigest()[:16]] for p in passages],
+                      model, prompt_version], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class SummaryCache:
+    """Tamamlanmış özetler: anahtar -> metin (sqlite, süreçler arası kalıcı)."""
+
+    def __init__(self, path: str = SUMMARY_CACHE_PATH):
+        pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS summaries (key TEXT PRIMARY KEY, model TEXT, text TEXT, ts REAL)")
+            # eski önbellek dosyaları: üretim süresi sütunu sonradan eklendi
+            if "seconds" not in {row[1] for row in self.conn.execute("PRAGMA table_info(summaries)")}:
+                self.conn.execute("ALTER TABLE summaries ADD COLUMN seconds REAL")
+            self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.saved_s = 0.0  # isabetlerde üretilmesi gerekmeyen özetlerin süresi
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute("SELECT text, seconds FROM summaries WHERE key=?", (key,)).fetchone()
+        metrics.CACHE_REQUESTS.inc(cache="summary", outcome="miss" if row is None else "hit")
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if row[1]:
+            self.saved_s += row[1]
+            metrics.CACHE_SAVED.inc(row[1], cache="summary")
+        return row[0]
+
+    def put(self, key: str, model: str, text: str, seconds: Optional[float] = None):
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO summaries (key, model, text, ts, seconds) VALUES (?, ?, ?, ?, ?)",
+                              (key, model, text, time.time(), seconds))
+            self.conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM summaries")
+            self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.saved_s = 0.0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            n = self.conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+        return {"entries": n, "hits": self.hits, "misses": self.misses, "saved_ms": 1000 * self.saved_s}
+
+_DONE = object()
+
+class SummaryStream:
+    """Özet metnini parça parça veren iterator (st.write_stream ile tüketilir).
+    Akış bitince status: "cached" | "complete" | "timeout" | "error"; text: gelen metnin tamamı."""
+
+    def __init__(self, summarizer: "Summarizer", query: str, passages: List[Dict], max_tokens: int):
+        self.s = summarizer
+        self.query = query
+        self.passages = passages
+        self.max_tokens = max_tokens
+        self.key = summary_key(query, passages, summarizer.model)
+        self.status = None
+        self.error = None
+        self.text = ""
+        self.first_token_s = None
+
+    def __iter__(self):
+        t0 = time.monotonic()
+        if self.s.cache is not None:
+            cached = self.s.cache.get(self.key)
+            if cached is not None:
+                self.status, self.text, self.first_token_s = "cached", cached, 0.0
+                metrics.LLM_REQUESTS.inc(status="cached")
+                yield cached
+                return
+        q = queue.Queue()
+        stop = threading.Event()
+        worker = threading.Thread(target=self.s._request, name="llm-stream", daemon=True,
+                                  args=(build_messages(self.query, self.passages), self.max_tokens, q, stop))
+        worker.start()
+        deadline = t0 + self.s.timeout
+        parts = []
+        try:
+            while True:
+                # ilk token için ayrı, daha kısa bir bütçe
+                limit = deadline if parts else min(deadline, t0 + self.s.first_token_timeout)
+                try:
+                    item = q.get(timeout=max(0.0, limit - time.monotonic()))
+                except queue.Empty:
+                    self.status = "timeout"
+                    return
+                if item is _DONE:
+                    self.status = "complete"
+                    return
+                if isinstance(item, Exception):
+                    self.status, self.error = "error", str(item)
+                    return
+                if self.first_token_s is None:
+                    self.first_token_s = time.monotonic() - t0
+                parts.append(item)
+                self.text = "".join(parts)
+                yield item
+        finally:
+            stop.set()  # zaman aşımı / erken bırakmada worker bağlantıyı kapatır
+            if self.status is None:
+                self.status = "timeout"
+            if self.status == "complete" and self.s.cache is not None and self.text.strip():
+                self.s.cache.put(self.key, self.s.model, self.text, time.monotonic() - t0)
+            metrics.LLM_REQUESTS.inc(status=self.status)
+            if self.first_token_s is not None:
+                metrics.LLM_SECONDS.observe(self.first_token_s, phase="first_token")
+            metrics.LLM_SECONDS.observe(time.monotonic() - t0, phase="total")
+
+class Summarizer:
+    def __init__(self, api_key: Optional[str] = None, base_url: str = LLM_BASE_URL, model: str = LLM_MODEL,
+                 timeout: float = LLM_TIMEOUT_SEC, first_token_timeout: float = LLM_FIRST_TOKEN_SEC,
+                 cache: Optional[SummaryCache] = None):
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+        self.first_token_timeout = first_token_timeout
+        self.cache = cache
+
+    @property
+    def available(self) -> bool:
+        return bool(self.api_key)
+
+    def stream(self, query: str, passages: List[Dict], max_tokens: int = LLM_MAX_TOKENS) -> SummaryStream:
+        return SummaryStream(self, query, passages, max_tokens)
+
+    def summarize(self, query: str, passages: List[Dict], max_tokens: int = LLM_MAX_TOKENS) -> Optional[str]:
+        """Akışsız kullanım: tamamlanan özet ya da None (zaman aşımı / hata)."""
+        s = self.stream(query, passages, max_tokens)
+        for _ in s:
+            pass
+        return s.text if s.status in ("cached", "complete") else None
+
+    def _request(self, messages: List[Dict], max_tokens: int, out: queue.Queue, stop: threading.Event):
+        # worker thread: SSE satırlarını okuyup metin parçalarını kuyruğa koyar
+        import requests
+        try:
+            with requests.post(f"{self.base_url}/chat/completions",
+                               headers={"Authorization": f"Bearer {self.api_key}"},
+                               json={"model": self.model, "messages": messages, "max_tokens": max_tokens,
+                                     "temperature": 0.0, "stream": True},
+                               stream=True, timeout=(5, self.timeout)) as r:
+                if r.status_code != 200:
+                    out.put(RuntimeError(f"HTTP {r.status_code}: {r.text[:200]}"))
+                    return
+                r.encoding = "utf-8"  # text/event-stream charset belirtmeyebilir
+                for line in r.iter_lines(decode_unicode=True):
+                    if stop.is_set():
+                        return
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    choice = json.loads(data)["choices"][0]
+                    piece = (choice.get("delta") or {}).get("content")
+                    if piece:
+                        out.put(piece)
+            out.put(_DONE)
+        except Exception as e:
+            if not stop.is_set():
+                out.put(e)
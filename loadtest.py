@@ -0,0 +1,362 @@
+# loadtest.py
+# Yük testi: soru setini eşzamanlı sanal kullanıcılarla tekrar tekrar sorar; iş hacmi,
+# p50/p95/p99 gecikme, aşama kırılımı (encode, search, log) ve en yüksek RSS raporlanır.
+# Hedef süreç içi (DocStore + audit, server.py ile aynı yol) ya da çalışan bir HTTP API olabilir.
+#
+#   python loadtest.py --concurrency 1,2,4,8 --duration 20          # süreç içi, eşzamanlılık taraması
+#   python loadtest.py --target http://127.0.0.1:8080 --concurrency 16 --rate 20 --duration 60
+#   python loadtest.py --concurrency 8 --requests 500 --out yeni.json --baseline eski.json
+#
+# --rate 0 (varsayılan): kapalı döngü; her kullanıcı cevabı alınca (--think kadar bekleyip) yeniden sorar.
+# --rate R: açık döngü; istekler saniyede ortalama R (Poisson) gelir, gecikmeye kuyrukta bekleme dahildir.
+# Aynı --seed ile soru sırası ve varış zamanları aynıdır; JSON çıktısı koşular arası karşılaştırılabilir.
+
+import os
+import sys
+import json
+import time
+import queue
+import random
+import platform
+import argparse
+import tempfile
+import threading
+import subprocess
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from benchmark import GOLDEN_PATH, load_golden
+from docstore import (LOCAL_DOCS_PATH, INDEX_CACHE_DIR, DEFAULT_SIM_THRESHOLD, DEFAULT_TOP_K,
+                      RETRIEVAL_MODES, RETRIEVAL_MODE, LRUCache, process_memory)
+
+STAGES = ("article", "lexical", "encode", "search", "log", "total")
+MEM_SAMPLE_SEC = 0.1
+
+# -----------------------------
+# Hedefler
+# -----------------------------
+class InProcessTarget:
+    """server.QueryService üzerinden süreç içi sorgu (arama + eşik kararı + audit log)."""
+
+    name = "inproc"
+
+    def __init__(self, docs: str, cache_dir: str, audit_path: str, cold: bool = False):
+        from server import QueryService
+        self.svc = QueryService(docs, cache_dir, audit_path=audit_path, build=True, poll_sec=0)
+        if cold:
+            # her istek encode + arama yapsın (tekrarlanan ya da benzer sorular önbellekten gelmesin)
+            self.svc.store.query_emb_cache = LRUCache(0)
+            self.svc.store.result_cache = LRUCache(0)
+            self.svc.store.semantic_cache = None
+
+    def query(self, body: Dict) -> Dict:
+        return self.svc.query(body)
+
+    def stats(self) -> Dict:
+        return self.svc.stats()
+
+    def close(self):
+        self.svc.close()
+
+class HttpTarget:
+    """Çalışan server.py'ye POST /query; her kullanıcı thread'i kendi keep-alive oturumunu kullanır."""
+
+    name = "http"
+
+    def __init__(self, url: str, timeout: float = 30.0):
+        import requests
+        self._requests = requests
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self):
+        s = getattr(self._local, "session", None)
+        if s is None:
+            s = self._local.session = self._requests.Session()
+        return s
+
+    def query(self, body: Dict) -> Dict:
+        r = self._session().post(f"{self.url}/query", json=body, timeout=self.timeout)
+        if r.status_code != 200:
+            raise RuntimeError(f"HTTP {r.status_code}: {r.text[:200]}")
+        return r.json()
+
+    def stats(self) -> Dict:
+        try:
+            return self._requests.get(f"{self.url}/stats", timeout=self.timeout).json()
+        except Exception:
+            return {}
+
+    def close(self):
+        pass
+
+# -----------------------------
+# Yük üretimi
+# -----------------------------
+class MemorySampler:
+    """Koşu süresince bu sürecin RSS'ini örnekler (süreç içi hedefte motorun belleği)."""
+
+    def __init__(self, every: float = MEM_SAMPLE_SEC):
+        self.every = every
+        self.max_rss = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="mem-sampler", daemon=True)
+
+    def _run(self):
+        while True:
+            rss = process_memory()["rss_mb"]
+            if rss is not None:
+                self.max_rss = max(self.max_rss, rss)
+            if self._stop.wait(self.every):
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def run_load(target, questions: List[str], concurrency: int, duration: Optional[float],
+             n_requests: Optional[int], rate: float = 0.0, think: float = 0.0,
+             body: Optional[Dict] = None, seed: int = 0) -> List[Dict]:
+    """İstekleri gönderir; istek başına {"t", "latency", "service", "wait", "ok", ...} kayıtları döner.
+    t: koşu başından itibaren tamamlanma anı (sn)."""
+    body = body or {}
+    rng = random.Random(seed)
+    order = questions[:]
+    rng.shuffle(order)
+    records = []
+    lock = threading.Lock()
+    counter = iter(range(n_requests if n_requests else sys.maxsize))
+    t0 = time.perf_counter()
+    deadline = t0 + duration if duration else None
+
+    def one(i: int, scheduled: float):
+        q = order[i % len(order)]
+        start = time.perf_counter()
+        rec = {"i": i}
+        try:
+            res = target.query({**body, "query": q})
+            rec.update(ok=True, result=res.get("result"), mode=res.get("mode"), cached=res.get("cached"),
+                       stages={k: v for k, v in res.get("timings_ms", {}).items()})
+        except Exception as e:
+            rec.update(ok=False, error=str(e)[:200])
+        end = time.perf_counter()
+        rec.update(t=end - t0, latency=end - scheduled, service=end - start, wait=start - scheduled)
+        with lock:
+            records.append(rec)
+
+    def next_index() -> Optional[int]:
+        with lock:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            return next(counter, None)
+
+    if rate <= 0:
+        # kapalı döngü: her kullanıcı kendi isteği bitince yenisini gönderir
+        def user():
+            while True:
+                i = next_index()
+                if i is None:
+                    return
+                one(i, time.perf_counter())
+                if think:
+                    time.sleep(think)
+        threads = [threading.Thread(target=user, name=f"user-{u}") for u in range(concurrency)]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+        return records
+
+    # açık döngü: varış zamanları önceden belirlenir; boş kullanıcı kalmazsa istek kuyrukta bekler
+    # (gecikme planlanan varıştan ölçülür, yavaşlayan sunucu daha az yük üretmiş gibi görünmez)
+    pending = queue.Queue()
+
+    def worker():
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            one(*item)
+
+    threads = [threading.Thread(target=worker, name=f"user-{u}") for u in range(concurrency)]
+    for th in threads:
+        th.start()
+    at = t0
+    while True:
+        at += rng.expovariate(rate)
+        if deadline is not None and at >= deadline:
+            break
+        i = next(counter, None)
+        if i is None:
+            break
+        delay = at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        pending.put((i, at))
+    for _ in threads:
+        pending.put(None)
+    for th in threads:
+        th.join()
+    return records
+
+# -----------------------------
+# Rapor
+# -----------------------------
+def _dist(values_ms: List[float]) -> Optional[Dict]:
+    if not values_ms:
+        return None
+    v = np.asarray(values_ms)
+    return {"mean": float(v.mean()), "p50": float(np.percentile(v, 50)), "p95": float(np.percentile(v, 95)),
+            "p99": float(np.percentile(v, 99)), "max": float(v.max())}
+
+def summarize(records: List[Dict], wall_s: float) -> Dict:
+    ok = [r for r in records if r["ok"]]
+    stages = {s: _dist([r["stages"][s] for r in ok if s in r["stages"]]) for s in STAGES}
+    # saniyelik zaman çizelgesi: gecikmenin hangi anda bozulduğu görülsün
+    timeline = []
+    for sec in range(int(wall_s) + 1):
+        lat = [1000 * r["latency"] for r in ok if sec <= r["t"] < sec + 1]
+        if lat:
+            timeline.append({"s": sec, "requests": len(lat), "p95_ms": float(np.percentile(lat, 95))})
+    return {
+        "requests": len(records),
+        "ok": len(ok),
+        "errors": len(records) - len(ok),
+        "error_samples": sorted({r["error"] for r in records if not r["ok"]})[:5],
+        "wall_s": wall_s,
+        "throughput_rps": len(ok) / wall_s if wall_s else None,
+        "latency_ms": _dist([1000 * r["latency"] for r in ok]),
+        "service_ms": _dist([1000 * r["service"] for r in ok]),
+        "queue_wait_ms": _dist([1000 * r["wait"] for r in ok]),
+        "stages_ms": {s: d for s, d in stages.items() if d},
+        "found": sum(r["result"] == "FOUND" for r in ok),
+        "not_found": sum(r["result"] == "NOT_FOUND" for r in ok),
+        "cached_ratio": sum(bool(r["cached"]) for r in ok) / len(ok) if ok else None,
+        "timeline": timeline,
+    }
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+def compare(out: Dict, base: Dict) -> List[str]:
+    """Aynı eşzamanlılık seviyeleri için iş hacmi ve gecikme değişimleri (okunur satırlar)."""
+    lines = []
+    diff = [k for k in ("target", "mode", "k", "rate", "think", "cold", "seed", "questions")
+            if out["config"].get(k) != base.get("config", {}).get(k)]
+    if diff:
+        lines.append(f"UYARI: yapılandırma farklı ({', '.join(diff)}); karşılaştırma yanıltıcı olabilir")
+    prev = {r["concurrency"]: r["summary"] for r in base.get("runs", [])}
+    for run in out["runs"]:
+        b, s = prev.get(run["concurrency"]), run["summary"]
+        if not b or not b.get("latency_ms") or not s.get("latency_ms"):
+            continue
+        x, y = b["throughput_rps"], s["throughput_rps"]
+        parts = [f"c={run['concurrency']}", f"rps {x:.1f} -> {y:.1f} ({100 * (y / x - 1):+.0f}%)"]
+        for p in ("p50", "p95", "p99"):
+            x, y = b["latency_ms"][p], s["latency_ms"][p]
+            parts.append(f"{p} {x:.1f} -> {y:.1f} ms ({100 * (y / x - 1):+.0f}%)")
+        lines.append("  ".join(parts))
+    return lines
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="SBE chatbot yük testi (iş hacmi, p50/p95/p99, aşama kırılımı, RSS)")
+    ap.add_argument("--target", default="inproc", help="'inproc' ya da API adresi (http://127.0.0.1:8080)")
+    ap.add_argument("--questions", default=GOLDEN_PATH, help="soru dosyası (jsonl, 'question' alanı)")
+    ap.add_argument("--concurrency", default="8", help="eşzamanlı kullanıcı; virgülle birden fazla seviye (1,4,16)")
+    ap.add_argument("--rate", type=float, default=0.0, help="açık döngü varış hızı (istek/sn); 0 -> kapalı döngü")
+    ap.add_argument("--think", type=float, default=0.0, help="kapalı döngüde istekler arası bekleme (sn)")
+    ap.add_argument("--duration", type=float, default=None, help="seviye başına süre (sn)")
+    ap.add_argument("--requests", type=int, default=None, help="seviye başına istek sayısı")
+    ap.add_argument("--warmup", type=int, default=20, help="ölçülmeyen ısınma isteği sayısı")
+    ap.add_argument("--k", type=int, default=DEFAULT_TOP_K)
+    ap.add_argument("--mode", choices=RETRIEVAL_MODES, default=RETRIEVAL_MODE)
+    ap.add_argument("--threshold", type=float, default=DEFAULT_SIM_THRESHOLD)
+    ap.add_argument("--cold", action="store_true", help="süreç içi: sorgu önbelleklerini kapat")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--docs", default=LOCAL_DOCS_PATH, help="süreç içi: snapshot yoksa indekslenecek klasör")
+    ap.add_argument("--cache-dir", default=INDEX_CACHE_DIR, help="süreç içi: snapshot klasörü")
+    ap.add_argument("--out", default=None, help="JSON çıktı dosyası (verilmezse stdout)")
+    ap.add_argument("--baseline", default=None, help="önceki koşunun JSON'u; fark özeti stderr'e yazılır")
+    args = ap.parse_args(argv)
+    if not args.duration and not args.requests:
+        args.duration = 20.0
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    questions = [it["question"] for it in load_golden(args.questions)]
+    body = {"top_k": args.k, "mode": args.mode, "threshold": args.threshold}
+
+    tmp = None
+    t = time.perf_counter()
+    if args.target == "inproc":
+        # audit kayıtları ölçüm için ayrı (geçici) dosyaya; gerçek log'u doldurmasın
+        tmp = tempfile.TemporaryDirectory(prefix="sbe_load_")
+        target = InProcessTarget(args.docs, args.cache_dir, os.path.join(tmp.name, "audit.db"), cold=args.cold)
+    else:
+        target = HttpTarget(args.target)
+    setup_s = time.perf_counter() - t
+
+    runs = []
+    try:
+        if args.warmup:
+            run_load(target, questions, max(levels), None, args.warmup, body=body, seed=args.seed)
+        for c in levels:
+            stats_before = target.stats()
+            with MemorySampler() as mem:
+                t = time.perf_counter()
+                records = run_load(target, questions, c, args.duration, args.requests, rate=args.rate,
+                                   think=args.think, body=body, seed=args.seed)
+                wall = time.perf_counter() - t
+            stats_after = target.stats()
+            summary = summarize(records, wall)
+            if target.name == "inproc":
+                summary["memory"] = {"run_max_rss_mb": mem.max_rss, **process_memory()}
+            else:
+                # sunucu süreci (birden fazla süreçte yanıt veren süreç)
+                summary["memory"] = {"server_pid": stats_after.get("pid"), **(stats_after.get("memory") or {}),
+                                     "client_run_max_rss_mb": mem.max_rss}
+            summary["server_cache"] = {"before": stats_before.get("cache"), "after": stats_after.get("cache")}
+            runs.append({"concurrency": c, "summary": summary})
+            lat = summary["latency_ms"] or {}
+            print(f"c={c:<4} {summary['throughput_rps'] or 0:8.1f} istek/sn  p50={lat.get('p50', 0):7.1f}  "
+                  f"p95={lat.get('p95', 0):7.1f}  p99={lat.get('p99', 0):7.1f} ms  hata={summary['errors']}",
+                  file=sys.stderr)
+    finally:
+        target.close()
+        if tmp is not None:
+            tmp.cleanup()
+
+    out = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {"target": target.name if target.name == "inproc" else args.target,
+                   "questions": os.path.basename(args.questions), "n_questions": len(questions),
+                   "levels": levels, "rate": args.rate, "think": args.think, "duration": args.duration,
+                   "requests": args.requests, "warmup": args.warmup, "k": args.k, "mode": args.mode,
+                   "threshold": args.threshold, "cold": args.cold, "seed": args.seed},
+        "env": {"python": platform.python_version(), "platform": platform.platform(),
+                "cpus": os.cpu_count(), "git": _git_rev()},
+        "setup_s": setup_s,
+        "runs": runs,
+    }
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            for line in compare(out, json.load(f)):
+                print(line, file=sys.stderr)
+    text = json.dumps(out, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+# metrics.py
+# Süreç içi metrikler: sayaç, gösterge ve histogramlar (etiketli); ek bağımlılık yok.
+# Sorgu aşamaları (docstore.search), indeksleme aşamaları (extract/chunk/encode/index),
+# audit yazımı ve LLM çağrısı buraya kaydedilir. Okuma yolları:
+# - arayüz: Admin kenar çubuğunda "Metrikler"
+# - API: GET /metrics (Prometheus metin biçimi, text/plain; version=0.0.4)
+# - dosya: SBE_METRICS_FILE ayarlıysa (ör. node_exporter textfile collector) periyodik yazılır;
+#   yol "{pid}" içerebilir (--processes > 1 ile her süreç kendi dosyasını yazar)
+
+import os
+import time
+import bisect
+import threading
+from typing import Dict, List, Optional, Tuple
+
+METRICS_FILE = os.getenv("SBE_METRICS_FILE")
+METRICS_FILE_MIN_SEC = 5.0  # dosya en fazla bu sıklıkla yeniden yazılır
+# saniye; sorgu aşamaları (~ms) ile indeksleme / LLM (~sn-dk) aynı kovalarla
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _fmt_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _fmt_num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) and not v.is_integer() else str(int(v))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.doc = doc
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name}: etiketler {self.labels} olmalı, verilen {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labels)
+
+    def items(self) -> List[Tuple[Dict, object]]:
+        with self._lock:
+            return [(dict(zip(self.labels, k)), v) for k, v in sorted(self._values.items())]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, n: float = 1, **labels):
+        k = self._key(labels)
+        with self._lock:
+            self._values[k] = self._values.get(k, 0) + n
+
+    def _render(self) -> List[str]:
+        return [f"{self.name}{_fmt_labels(self.labels, tuple(l.values()))} {_fmt_num(v)}" for l, v in self.items()]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, v: float, **labels):
+        k = self._key(labels)
+        with self._lock:
+            self._values[k] = v
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, v: float, **labels):
+        k = self._key(labels)
+        with self._lock:
+            d = self._values.get(k)
+            if d is None:
+                d = self._values[k] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            d["counts"][bisect.bisect_left(self.buckets, v)] += 1
+            d["sum"] += v
+            d["count"] += 1
+
+    def items(self):
+        with self._lock:
+            return [(dict(zip(self.labels, k)), {"counts": list(d["counts"]), "sum": d["sum"], "count": d["count"]})
+                    for k, d in sorted(self._values.items())]
+
+    def quantile(self, q: float, data: Dict) -> Optional[float]:
+        """Kova sınırlarından doğrusal tahmin (Prometheus histogram_quantile ile aynı yaklaşım)."""
+        n = data["count"]
+        if not n:
+            return None
+        rank, cum, lower = q * n, 0, 0.0
+        for i, c in enumerate(data["counts"]):
+            upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+            if c and cum + c >= rank:
+                return lower + (upper - lower) * (rank - cum) / c
+            cum += c
+            lower = upper
+        return self.buckets[-1]
+
+    def _render(self) -> List[str]:
+        out = []
+        for labels, d in self.items():
+            vals = tuple(labels.values())
+            cum = 0
+            for b, c in zip(self.buckets + (float("inf"),), d["counts"]):
+                cum += c
+                le = 'le="%s"' % _fmt_num(b)
+                out.append(f"{self.name}_bucket{_fmt_labels(self.labels, vals, le)} {cum}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labels, vals)} {d['sum']!r}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labels, vals)} {d['count']}")
+        return out
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._last_write = 0.0
+
+    def _get(self, cls, name, doc, labels, **kw):
+        with self._lock:
+            m = self._metrics.get(name)
+            if m is None:
+                m = self._metrics[name] = cls(name, doc, labels, **kw)
+            return m
+
+    def counter(self, name: str, doc: str, labels=()) -> Counter:
+        return self._get(Counter, name, doc, labels)
+
+    def gauge(self, name: str, doc: str, labels=()) -> Gauge:
+        return self._get(Gauge, name, doc, labels)
+
+    def histogram(self, name: str, doc: str, labels=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, doc, labels, buckets=buckets)
+
+    def metrics(self) -> List[_Metric]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render(self) -> str:
+        """Prometheus metin biçimi (exposition format 0.0.4)."""
+        lines = []
+        for m in self.metrics():
+            lines.append(f"# HELP {m.name} {m.doc}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            lines.extend(m._render())
+        return "\n".join(lines) + "\n"
+
+    def write_file(self, path: Optional[str] = METRICS_FILE, min_interval: float = 0.0) -> bool:
+        """Metinleri dosyaya atomik yazar (geçici dosya + rename); min_interval içinde tekrar yazmaz."""
+        if not path or time.monotonic() - self._last_write < min_interval:
+            return False
+        self._last_write = time.monotonic()
+        path = path.format(pid=os.getpid())
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(self.render())
+            os.replace(tmp, path)
+            return True
+        except OSError:
+            return False
+
+    def summary(self) -> Dict:
+        """Arayüz için düz özet: {"histograms": [...], "counters": [...]}; süreler ms."""
+        hists, counters = [], []
+        for m in self.metrics():
+            if isinstance(m, Histogram):
+                for labels, d in m.items():
+                    hists.append({"metric": m.name, "labels": ", ".join(f"{k}={x}" for k, x in labels.items()),
+                                  "count": d["count"],
+                                  "avg_ms": 1000 * d["sum"] / d["count"] if d["count"] else None,
+                                  "p50_ms": _ms(m.quantile(0.5, d)), "p95_ms": _ms(m.quantile(0.95, d)),
+                                  "p99_ms": _ms(m.quantile(0.99, d))})
+            else:
+                for labels, v in m.items():
+                    counters.append({"metric": m.name, "labels": ", ".join(f"{k}={x}" for k, x in labels.items()),
+                                     "value": v})
+        return {"histograms": hists, "counters": counters}
+
+    def reset(self):
+        for m in self.metrics():
+            m.clear()
+
+def _ms(v: Optional[float]) -> Optional[float]:
+    return None if v is None else 1000 * v
+
+REGISTRY = Registry()
+
+# -----------------------------
+# Uygulamanın metrikleri
+# -----------------------------
+QUERIES = REGISTRY.counter("sbe_queries_total", "Arama sayısı (kullanılan moda göre; önbellekten gelenler "
+                           "mode=cache / semantic)", ("mode",))
+ANSWERS = REGISTRY.counter("sbe_answers_total", "Eşik kararı (FOUND / NOT_FOUND)", ("result",))
+CACHE_REQUESTS = REGISTRY.counter("sbe_cache_requests_total", "Önbellek erişimleri (embedding, result, semantic, "
+                                  "summary)", ("cache", "outcome"))
+CACHE_SAVED = REGISTRY.counter("sbe_cache_saved_seconds_total", "Önbellek isabetlerinin kazandırdığı tahmini süre "
+                               "(semantic: arama, summary: LLM özeti)", ("cache",))
+QUERY_STAGE = REGISTRY.histogram("sbe_query_stage_seconds", "Sorgu aşama süreleri (article, lexical, encode, "
+                                 "semantic, search, log, total)", ("stage",))
+INGEST_STAGE = REGISTRY.histogram("sbe_ingest_stage_seconds", "İndeksleme aşama süreleri, senkron başına "
+                                  "(extract, chunk, encode, index)", ("stage",))
+INGEST_PASSAGES = REGISTRY.counter("sbe_ingest_passages_total", "İndekslemede passage'lar (encoded, reused, duplicates)",
+                                   ("kind",))
+INDEX_SIZE = REGISTRY.gauge("sbe_index_size", "Aktif indeks: passage ve vektör sayısı", ("kind",))
+INDEX_JOBS = REGISTRY.counter("sbe_index_jobs_total", "Arka plan indeksleme işleri (done, failed, cancelled)",
+                              ("result",))
+AUDIT_WRITE = REGISTRY.histogram("sbe_audit_write_seconds", "Audit log toplu yazım (commit dahil) süresi")
+AUDIT_ROWS = REGISTRY.counter("sbe_audit_rows_total", "Audit kayıtları (written, dropped)", ("outcome",))
+LLM_SECONDS = REGISTRY.histogram("sbe_llm_seconds", "LLM özet süreleri (first_token, total)", ("phase",))
+LLM_REQUESTS = REGISTRY.counter("sbe_llm_requests_total", "LLM özet istekleri (cached, complete, timeout, error)",
+                                ("status",))
+
+def observe_stages(hist: Histogram, timings: Dict[str, float]):
+    for stage, sec in timings.items():
+        hist.observe(sec, stage=stage)
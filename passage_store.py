@@ -0,0 +1,278 @@
+# passage_store.py
+# Passage'lar için sütunlu depo: tüm metinler tek bir UTF-8 tamponda (satır ofsetleriyle),
+# kaynak adları tekil bir tabloda, sayısal alanlar NumPy dizilerinde.
+# Dict listesine göre passage başına Python nesnesi tutulmaz; satıra erişim bir görünüm
+# (Passage) döner, alanlar istendiğinde okunur. Diske .npy dosyaları olarak yazılır ve
+# np.load(mmap_mode="r") ile kopyalanmadan açılabilir.
+
+import json
+import hashlib
+import pathlib
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, List
+
+import numpy as np
+
+NO_PAGE = -1     # sayfası olmayan belge (docx/txt)
+NO_ARTICLE = -1  # madde dışı passage (başlangıç metni, madde içermeyen belge)
+
+# sütun adı -> dtype (metin tamponu ve kaynak tablosu ayrı)
+COLUMNS = {
+    "fids": "int64",         # kararlı FAISS id (faiss_id(id))
+    "source_ids": "int32",   # sources tablosunda sıra
+    "chunk_index": "int32",
+    "page_start": "int32",
+    "page_end": "int32",
+    "char_start": "int64",
+    "char_end": "int64",
+    "article_no": "int32",   # "MADDE n" -> n (bkz. articles.py)
+    "article_kind": "int8",  # articles.ARTICLE_KINDS sırası: 0 normal, 1 geçici, 2 ek
+    "canon_fids": "int64",   # vektörünü kullandığı temsilcinin fid'i (kendisi ya da yakın kopyası, bkz. dedup.py)
+}
+
+def mkid(s: str) -> str:
+    return hashlib.sha1(s.encode("utf-8")).hexdigest()
+
+def faiss_id(pid: str) -> int:
+    # mkid (sha1) değerinin ilk 15 hex hanesi -> pozitif int64; çalıştırmalar arası kararlı FAISS id
+    return int(pid[:15], 16)
+
+class Passage(Mapping):
+    """Depodaki tek satırın görünümü; dict gibi okunur (p["text"], p.get("page_start"))."""
+
+    __slots__ = ("_store", "row")
+    KEYS = ("id", "text", "source", "chunk_index", "page_start", "page_end", "char_start", "char_end",
+            "article_no", "article_kind")
+
+    def __init__(self, store: "PassageStore", row: int):
+        self._store = store
+        self.row = row
+
+    def __getitem__(self, key):
+        return self._store.field(self.row, key)
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    @property
+    def duplicates(self) -> List["Passage"]:
+        # aynı temsilciyi paylaşan diğer passage'lar (yakın kopyalar; atıf için)
+        return [Passage(self._store, r) for r in self._store.duplicates(self.row)]
+
+    @property
+    def text_bytes(self) -> memoryview:
+        # UTF-8 metnin kopyasız görünümü
+        return self._store.text_bytes(self.row)
+
+    def __repr__(self):
+        return f"Passage({self['source']!r}, chunk {self['chunk_index']})"
+
+class PassageStore:
+    def __init__(self, buf: np.ndarray, offsets: np.ndarray, sources: List[str], **cols):
+        self.buf = buf            # uint8, tüm metinler art arda
+        self.offsets = offsets    # int64, n + 1; satır i = buf[offsets[i]:offsets[i + 1]]
+        self.sources = sources
+        for name in COLUMNS:
+            setattr(self, name, cols[name])
+        self._sorter = None       # fids sıralaması (fid -> satır araması için), ilk aramada kurulur
+        self._groups = None       # temsilci fid -> satırlar (sadece kopyası olan gruplar), ilk erişimde kurulur
+
+    @classmethod
+    def empty(cls) -> "PassageStore":
+        return PassageStoreBuilder().build()
+
+    @classmethod
+    def from_passages(cls, passages: Iterable[Mapping]) -> "PassageStore":
+        b = PassageStoreBuilder()
+        for p in passages:
+            b.add(p)
+        return b.build()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [Passage(self, r) for r in range(*row.indices(len(self)))]
+        row = int(row)
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return Passage(self, row)
+
+    def __iter__(self) -> Iterator[Passage]:
+        return (Passage(self, r) for r in range(len(self)))
+
+    def text_bytes(self, row: int) -> memoryview:
+        return memoryview(self.buf[self.offsets[row]:self.offsets[row + 1]])
+
+    def text(self, row: int) -> str:
+        return self.buf[self.offsets[row]:self.offsets[row + 1]].tobytes().decode("utf-8")
+
+    def texts(self) -> Iterator[str]:
+        return (self.text(r) for r in range(len(self)))
+
+    def field(self, row: int, key: str):
+        if key == "text":
+            return self.text(row)
+        if key == "source":
+            return self.sources[self.source_ids[row]]
+        if key == "id":
+            # chunk id'si kaynak adı + sıra no'dan türetilir (docstore._iter_chunks ile aynı)
+            return mkid(f"{self.sources[self.source_ids[row]]}__{self.chunk_index[row]}")
+        if key in ("page_start", "page_end"):
+            v = int(getattr(self, key)[row])
+            return None if v == NO_PAGE else v
+        if key == "article_no":
+            v = int(self.article_no[row])
+            return None if v == NO_ARTICLE else v
+        if key in ("chunk_index", "char_start", "char_end", "article_kind"):
+            return int(getattr(self, key)[row])
+        raise KeyError(key)
+
+    def rows_for_fids(self, fids) -> np.ndarray:
+        """FAISS id'lerini satır numarasına çevirir (bulunamayan / -1 -> -1)."""
+        fids = np.asarray(fids, dtype="int64")
+        if not len(self):
+            return np.full(len(fids), -1, dtype="int64")
+        if self._sorter is None:
+            self._sorter = np.argsort(self.fids, kind="stable")
+        sorted_f = self.fids[self._sorter]
+        pos = np.minimum(np.searchsorted(sorted_f, fids), len(self) - 1)
+        rows = self._sorter[pos]
+        return np.where(sorted_f[pos] == fids, rows, -1)
+
+    def representatives(self) -> np.ndarray:
+        """Kendi vektörü olan satırlar (indekste bulunanlar)."""
+        return np.flatnonzero(np.asarray(self.fids) == np.asarray(self.canon_fids))
+
+    def duplicates(self, row: int) -> List[int]:
+        if self._groups is None:
+            canon = np.asarray(self.canon_fids)
+            groups = {}
+            for r in np.flatnonzero(canon != np.asarray(self.fids)).tolist():
+                groups.setdefault(int(canon[r]), []).append(r)
+            for c, rows in groups.items():
+                rows.extend(self.rows_for_fids([c]).tolist())
+            self._groups = groups
+        rows = self._groups.get(int(self.canon_fids[row]), ())
+        return sorted(r for r in rows if r != row and r >= 0)
+
+    def nbytes(self) -> int:
+        n = self.buf.nbytes + self.offsets.nbytes + sum(getattr(self, c).nbytes for c in COLUMNS)
+        return n + sum(len(s) for s in self.sources)
+
+    # -----------------------------
+    # Disk
+    # -----------------------------
+    def save(self, path):
+        d = pathlib.Path(path)
+        d.mkdir(parents=True, exist_ok=True)
+        np.save(d / "text.npy", self.buf)
+        np.save(d / "offsets.npy", self.offsets)
+        for c in COLUMNS:
+            np.save(d / f"{c}.npy", getattr(self, c))
+        with open(d / "sources.json", "w", encoding="utf-8") as f:
+            json.dump(self.sources, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path, mmap: bool = True) -> "PassageStore":
+        """mmap=True: diziler diskten eşlenir (salt okunur); sayfalar erişildikçe belleğe gelir."""
+        d = pathlib.Path(path)
+        mode = "r" if mmap else None
+        with open(d / "sources.json", "r", encoding="utf-8") as f:
+            sources = json.load(f)
+        cols = {c: np.load(d / f"{c}.npy", mmap_mode=mode) for c in COLUMNS}
+        return cls(np.load(d / "text.npy", mmap_mode=mode), np.load(d / "offsets.npy", mmap_mode=mode),
+                   sources, **cols)
+
+class PassageStoreBuilder:
+    """Satır satır (add) ya da başka bir depodan aralık olarak (add_rows) yeni depo kurar."""
+
+    def __init__(self):
+        self._texts = []      # bytes parçaları
+        self._lens = []       # parça başına metin uzunlukları (ndarray)
+        self._cols = {c: [] for c in COLUMNS}
+        self._pending = None  # add ile gelen, henüz diziye çevrilmemiş satırlar
+        self._source_ix = {}
+        self.sources = []
+        self.n = 0
+
+    def _source(self, name: str) -> int:
+        ix = self._source_ix.get(name)
+        if ix is None:
+            ix = self._source_ix[name] = len(self.sources)
+            self.sources.append(name)
+        return ix
+
+    def add(self, p: Mapping):
+        if self._pending is None:
+            self._pending = {c: [] for c in COLUMNS}
+            self._pending["len"] = []
+        pend = self._pending
+        data = p["text"].encode("utf-8")
+        self._texts.append(data)
+        pend["len"].append(len(data))
+        fid = faiss_id(p["id"])
+        pend["fids"].append(fid)
+        pend["canon_fids"].append(p.get("canon_fid") or fid)
+        pend["source_ids"].append(self._source(p["source"]))
+        pend["chunk_index"].append(p["chunk_index"])
+        for k in ("page_start", "page_end"):
+            v = p.get(k)
+            pend[k].append(NO_PAGE if v is None else v)
+        pend["char_start"].append(p.get("char_start") or 0)
+        pend["char_end"].append(p.get("char_end") or 0)
+        v = p.get("article_no")
+        pend["article_no"].append(NO_ARTICLE if v is None else v)
+        pend["article_kind"].append(p.get("article_kind") or 0)
+        self.n += 1
+
+    def _flush(self):
+        if self._pending is None:
+            return
+        self._lens.append(np.array(self._pending.pop("len"), dtype="int64"))
+        for c, dt in COLUMNS.items():
+            self._cols[c].append(np.array(self._pending[c], dtype=dt))
+        self._pending = None
+
+    def add_rows(self, store: PassageStore, start: int, end: int):
+        """store[start:end] satırlarını kopyalar (metin tamponu ve sütunlar dilim olarak)."""
+        if end <= start:
+            return
+        self._flush()
+        a, b = int(store.offsets[start]), int(store.offsets[end])
+        self._texts.append(store.buf[a:b].tobytes())
+        self._lens.append(np.diff(store.offsets[start:end + 1]).astype("int64"))
+        remap = np.array([self._source(s) for s in store.sources], dtype="int32")
+        for c, dt in COLUMNS.items():
+            col = np.asarray(getattr(store, c)[start:end])
+            self._cols[c].append(remap[col] if c == "source_ids" else col.astype(dt))
+        self.n += end - start
+
+    def build(self) -> PassageStore:
+        self._flush()
+        buf = np.frombuffer(b"".join(self._texts), dtype="uint8").copy()
+        lens = np.concatenate(self._lens) if self._lens else np.zeros(0, dtype="int64")
+        offsets = np.zeros(len(lens) + 1, dtype="int64")
+        np.cumsum(lens, out=offsets[1:])
+        cols = {c: np.concatenate(self._cols[c]) if self._cols[c] else np.zeros(0, dtype=dt)
+                for c, dt in COLUMNS.items()}
+        return PassageStore(buf, offsets, list(self.sources), **cols)
+
+def dict_list_nbytes(passages: List[Dict]) -> int:
+    """Dict listesinin yaklaşık bellek kullanımı (liste + dict'ler + değer nesneleri); karşılaştırma için."""
+    import sys
+    n = sys.getsizeof(passages)
+    seen = set()
+    for p in passages:
+        n += sys.getsizeof(p)
+        for v in p.values():
+            if id(v) not in seen:
+                seen.add(id(v))
+                n += sys.getsizeof(v)
+    return n
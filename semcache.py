@@ -0,0 +1,157 @@
+# semcache.py
+# Anlamsal cevap önbelleği: trafiğin çoğu aynı birkaç düzine sorunun farklı söylenişleri.
+# Geçmiş sorguların embedding'leri küçük, ayrı bir FAISS indeksinde (flat, inner product) tutulur;
+# yeni sorgu kayıtlı bir sorguya SEMANTIC_CACHE_MAX_DIST cosine uzaklığı içindeyse onun passage'ları
+# (arama atlanır) ve onun sorgu metni (LLM özeti, llm.SummaryCache'ten aynı anahtarla gelir) kullanılır.
+# - Girdiler indeks sürümüne bağlıdır: yeniden indekslemeden sonra eski sonuç kullanılmaz, girdi yenilenir.
+# - LRU (SEMANTIC_CACHE_SIZE) ve TTL (SEMANTIC_CACHE_TTL_SEC) ile atılır.
+# - Sorgulardaki sayılar aynı olmalı: "madde 7" ile "madde 8" embedding'de çok yakındır.
+# - Açılışta audit tablosundaki sık sorularla (queries, FOUND) ısıtılır (DocStore.warm_semantic_cache).
+
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import metrics
+from startup import lazy_import
+
+faiss = lazy_import("faiss")
+
+log = logging.getLogger(__name__)
+
+SEMANTIC_CACHE = True
+SEMANTIC_CACHE_SIZE = 2048
+SEMANTIC_CACHE_TTL_SEC = 7 * 86400
+# cosine uzaklığı (1 - cosine); küçük tutulur: yanlış eşleşme yanlış kaynak göstermek demek
+SEMANTIC_CACHE_MAX_DIST = 0.06
+SEMANTIC_CACHE_CANDIDATES = 4   # eşik içindeki en yakın bu kadar girdi denenir (sayı / parametre uyumu)
+SEMANTIC_SEED_QUERIES = 200     # açılışta audit'ten ısıtılan en sık soru sayısı
+SEMANTIC_SEED_DAYS = 30
+
+_NUM_RE = re.compile(r"\d+")
+
+def numbers(q: str) -> Tuple[str, ...]:
+    return tuple(sorted(set(_NUM_RE.findall(q))))
+
+class SemanticCache:
+    """Sorgu embedding'i -> (indeks sürümü, top_k, mod) başına sonuçlar. Thread-safe."""
+
+    def __init__(self, maxsize: int = SEMANTIC_CACHE_SIZE, ttl: float = SEMANTIC_CACHE_TTL_SEC,
+                 max_dist: float = SEMANTIC_CACHE_MAX_DIST):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_dist = max_dist
+        self.index = None  # boyut ilk put'ta (modelden) belli olur
+        self.entries = OrderedDict()  # slot -> girdi; sıra = LRU
+        self._by_query = {}           # normalize sorgu -> slot
+        self._slots = iter(range(1 << 62))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_s = 0.0
+
+    def _drop(self, slot: int):
+        e = self.entries.pop(slot)
+        self._by_query.pop(e["query"], None)
+        self.index.remove_ids(np.array([slot], dtype="int64"))
+
+    def get(self, query: str, q_emb: np.ndarray, version: int, top_k: int, mode: str) -> Optional[Dict]:
+        """Eşleşen girdi: {"query", "similarity", "results", "mode", "cost_s"} ya da None.
+        query normalize edilmiş olmalı (docstore.normalize_query)."""
+        with self._lock:
+            hit = self._lookup(query, q_emb, version, (int(top_k), mode))
+            if hit is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.saved_s += hit["cost_s"]
+        metrics.CACHE_REQUESTS.inc(cache="semantic", outcome="miss" if hit is None else "hit")
+        if hit is not None:
+            metrics.CACHE_SAVED.inc(hit["cost_s"], cache="semantic")
+        return hit
+
+    def _lookup(self, query, q_emb, version, key) -> Optional[Dict]:
+        if self.index is None or not self.index.ntotal or q_emb.shape[1] != self.index.d:
+            return None
+        D, I = self.index.search(q_emb, min(SEMANTIC_CACHE_CANDIDATES, self.index.ntotal))
+        now = time.time()
+        nums = numbers(query)
+        for sim, slot in zip(D[0].tolist(), I[0].tolist()):
+            if slot < 0 or 1.0 - sim > self.max_dist:
+                break
+            e = self.entries.get(slot)
+            if e is None:
+                continue
+            if now - e["ts"] > self.ttl:
+                self._drop(slot)
+                continue
+            res = e["results"].get(key)
+            if e["version"] != version or res is None or e["numbers"] != nums:
+                continue
+            self.entries.move_to_end(slot)
+            return {"query": e["text"], "similarity": float(sim), "results": res[0], "mode": res[1],
+                    "cost_s": res[2]}
+        return None
+
+    def put(self, query: str, text: str, q_emb: np.ndarray, version: int, top_k: int, mode: str,
+            results, used: str, cost_s: float):
+        """query: normalize edilmiş anahtar, text: kullanıcının yazdığı hali (özet anahtarı bunu kullanır)."""
+        key = (int(top_k), mode)
+        with self._lock:
+            slot = self._by_query.get(query)
+            e = self.entries.get(slot) if slot is not None else None
+            if e is not None and e["version"] == version and time.time() - e["ts"] <= self.ttl:
+                e["results"][key] = (tuple(results), used, cost_s)
+                self.entries.move_to_end(slot)
+                return
+            if e is not None:
+                self._drop(slot)  # eski indeks sürümü / süresi dolmuş: embedding aynı, sonuçlar yenilenir
+            if self.index is None or self.index.d != q_emb.shape[1]:
+                self.entries.clear()
+                self._by_query.clear()
+                self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(q_emb.shape[1]))
+            slot = next(self._slots)
+            self.entries[slot] = {"query": query, "text": text, "numbers": numbers(query), "version": version,
+                                  "ts": time.time(), "results": {key: (tuple(results), used, cost_s)}}
+            self._by_query[query] = slot
+            self.index.add_with_ids(np.ascontiguousarray(q_emb, dtype="float32"), np.array([slot], dtype="int64"))
+            while len(self.entries) > self.maxsize:
+                self._drop(next(iter(self.entries)))
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self._by_query.clear()
+            if self.index is not None:
+                self.index.reset()
+            self.hits = self.misses = 0
+            self.saved_s = 0.0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {"entries": len(self.entries), "maxsize": self.maxsize, "max_dist": self.max_dist,
+                "hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0,
+                "saved_ms": 1000 * self.saved_s}
+
+def seed_in_background(store, queries: Callable[[], List[str]], **kw) -> threading.Thread:
+    """Model ve indeks yüklenince queries() ile gelen sorularla önbelleği ısıtır (arayüz / API açılışı)."""
+    def run():
+        store.wait_loaded()
+        try:
+            n = store.warm_semantic_cache(queries(), **kw)
+            if n:
+                log.info(f"Anlamsal önbellek {n} soruyla ısıtıldı")
+        except Exception as e:
+            log.warning(f"Anlamsal önbellek ısıtılamadı: {e}")
+
+    t = threading.Thread(target=run, name="semantic-seed", daemon=True)
+    t.start()
+    return t
@@ -0,0 +1,329 @@
+# server.py
+# Arayüzsüz JSON HTTP servisi: DocStore sorgu / yeniden indeksleme / durum.
+# Streamlit'ten bağımsız çalışır; kurum portalı gibi istemciler ve yük testi için.
+# Eşik kararı (VERI YETERSIZ) ve audit log arayüzle aynıdır (docstore.judge, audit.AuditLog).
+# İndeks diskteki snapshot'lardan (.index_cache, LATEST) açılır; arayüz ya da başka bir süreç
+# yeniden indekslediğinde yeni snapshot'a kendiliğinden geçilir.
+# Snapshot salt okunur eşlenerek açılır (docstore.INDEX_MMAP): --processes ile açılan süreçler
+# indeksin, passage metinlerinin ve BM25 posting'lerinin sayfa önbelleğindeki tek kopyasını paylaşır.
+#
+#   python server.py --port 8080 --workers 8
+#   python server.py --port 8080 --workers 4 --processes 2   # Linux: aynı soketi paylaşan süreçler
+#   python server.py --build                                 # snapshot yoksa docs/ klasörünü indeksle
+#
+#   curl -s localhost:8080/query -d '{"query": "tez savunma sınavı", "top_k": 3}'
+#
+# Uç noktalar:
+#   GET  /health    -> {"status", "passages"}
+#   GET  /stats     -> indeks, önbellek, mod ve audit istatistikleri
+#   GET  /metrics   -> Prometheus metin biçimi (aşama histogramları, sayaçlar; bkz. metrics.py)
+#   POST /query     {"query", ["top_k"], ["mode"], ["threshold"]} -> cevapta "semantic": sonuçları kullanılan
+#                   benzer önceki soru (anlamsal önbellek, bkz. semcache.py) ya da null; "score_kind": cosine | bm25 |
+#                   article — cosine dışında "threshold_applied": false (kesin sözcüksel / madde eşleşmesi)
+#   POST /reindex   {["wait"]} -> docs klasörünü arka planda yeniden indeksler (indexjob.py); iş durumu döner,
+#                   "wait": true ise bitmesini bekler. Sorgular bu sırada önceki indeksten cevaplanır.
+#   GET  /reindex   -> son / çalışan indeksleme işinin durumu (aşama, ilerleme, sonuç, "warnings": okunamayan sayfalar)
+#   POST /reindex/cancel -> çalışan işi iptal eder (aktif indeks değişmez)
+#                   (SBE_API_TOKEN ayarlıysa POST /reindex* için "Authorization: Bearer <token>" gerekir)
+
+import os
+import sys
+import json
+import time
+import signal
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+import startup
+import metrics
+from audit import AuditLog, DB_PATH
+from indexjob import IndexJob, IndexJobs, watch_snapshots
+from semcache import seed_in_background, SEMANTIC_SEED_QUERIES, SEMANTIC_SEED_DAYS
+from docstore import (DocStore, judge, list_docs_from_local, LOCAL_DOCS_PATH, INDEX_CACHE_DIR,
+                      DEFAULT_SIM_THRESHOLD, DEFAULT_TOP_K, RETRIEVAL_MODES, RETRIEVAL_MODE,
+                      NOT_FOUND_ANSWER, process_memory)
+
+log = logging.getLogger("sbe.server")
+
+API_HOST = "127.0.0.1"
+API_PORT = 8080
+API_WORKERS = 8            # süreç başına aynı anda işlenen sorgu
+API_PROCESSES = 1          # >1: önceden fork edilmiş süreçler aynı portu dinler (sadece Unix)
+API_MAX_TOP_K = 10         # arayüzdeki üst sınırla aynı
+API_MAX_BODY = 64 * 1024   # istek gövdesi üst sınırı (bayt)
+API_REQUEST_TIMEOUT = 30   # boşta kalan keep-alive bağlantı bu kadar sn sonra kapanır
+SNAPSHOT_POLL_SEC = 5.0    # LATEST değişikliği kontrol aralığı
+REINDEX_WAIT_SEC = 3600    # "wait": true ile en fazla bu kadar beklenir
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+class QueryService:
+    """HTTP'den bağımsız iş mantığı: uç noktalar JSON gövdesi (dict) döner, hatalar ApiError ile bildirilir."""
+
+    def __init__(self, docs_path: str = LOCAL_DOCS_PATH, cache_dir: str = INDEX_CACHE_DIR,
+                 threshold: float = DEFAULT_SIM_THRESHOLD, audit_path: str = DB_PATH,
+                 token: str = None, build: bool = False, poll_sec: float = SNAPSHOT_POLL_SEC):
+        self.docs_path = docs_path
+        self.cache_dir = cache_dir
+        self.threshold = threshold
+        self.token = token
+        self.started = time.time()
+        self.store = DocStore()
+        self.jobs = IndexJobs(self.store, cache_dir)
+        if not self.store.load_latest_snapshot(cache_dir) and build:
+            # açılışta henüz sorgu alınmıyor: bitmesi beklenir
+            self._reindex("startup").wait()
+        self.audit = AuditLog(audit_path)
+        # farklı söylenmiş sık sorular: anlamsal önbellek audit'teki son sorularla ısıtılır
+        seed_in_background(self.store, lambda: self.audit.top_queries(SEMANTIC_SEED_QUERIES, SEMANTIC_SEED_DAYS))
+        self._stop = threading.Event()
+        if poll_sec:
+            # başka bir süreç (arayüz, gece işi, diğer API süreçleri) yeni snapshot yazdıysa ona geç
+            watch_snapshots(self.store, cache_dir, poll_sec, self._stop)
+
+    def close(self):
+        self._stop.set()
+        self.jobs.cancel()
+        self.audit.close()
+
+    def _reindex(self, trigger: str = "api") -> IndexJob:
+        docs = [(os.path.basename(p), p) for p in list_docs_from_local(self.docs_path)]
+        job, _ = self.jobs.start(docs, trigger)
+        return job
+
+    # -----------------------------
+    # Uç noktalar
+    # -----------------------------
+    def health(self) -> Dict:
+        return {"status": "ok" if self.store.index is not None else "empty", "passages": len(self.store.passages)}
+
+    def stats(self) -> Dict:
+        store = self.store
+        return {"pid": os.getpid(), "uptime_s": time.time() - self.started,
+                "passages": len(store.passages), "embed_dim": store.embed_dim,
+                "index_kind": store.index_kind, "index_mapped": store.index_mapped, "snapshot": store.snapshot_key,
+                "last_sync": store.last_sync, "index_job": self.jobs.status(), "threshold": self.threshold,
+                "cache": store.cache_stats(), "modes": store.mode_stats(), "audit": self.audit.stats(),
+                "memory": process_memory(), "startup": startup.report()}
+
+    def query(self, body: Dict) -> Dict:
+        q = body.get("query")
+        if not isinstance(q, str) or not q.strip():
+            raise ApiError(400, "'query' alanı boş olamaz")
+        try:
+            top_k = int(body.get("top_k", DEFAULT_TOP_K))
+            threshold = float(body.get("threshold", self.threshold))
+        except (TypeError, ValueError):
+            raise ApiError(400, "'top_k' tamsayı, 'threshold' sayı olmalı")
+        if not 1 <= top_k <= API_MAX_TOP_K:
+            raise ApiError(400, f"'top_k' 1-{API_MAX_TOP_K} arasında olmalı")
+        if not 0.0 <= threshold <= 1.0:
+            raise ApiError(400, "'threshold' 0.0-1.0 arasında olmalı")
+        mode = body.get("mode", RETRIEVAL_MODE)
+        if mode not in RETRIEVAL_MODES:
+            raise ApiError(400, f"'mode' şunlardan biri olmalı: {', '.join(RETRIEVAL_MODES)}")
+        if self.store.index is None or len(self.store.passages) == 0:
+            raise ApiError(503, "Henüz doküman yüklenmedi veya indeks oluşturulmadı (/reindex)")
+        res = self.store.search(q, top_k=top_k, mode=mode)
+        if not res["results"]:
+            raise ApiError(503, "Arama başarısız: indeks yok veya boş.")
+        verdict = judge(res["results"], threshold, res["mode"])
+        t = time.perf_counter()
+        self.audit.log(q, verdict["result"], verdict["best_score"], verdict["passages"], res["timings"],
+                       verdict["mode"])
+        res["timings"]["log"] = time.perf_counter() - t
+        metrics.QUERY_STAGE.observe(res["timings"]["log"], stage="log")
+        metrics.REGISTRY.write_file(min_interval=metrics.METRICS_FILE_MIN_SEC)
+        return {"query": q, "result": verdict["result"],
+                "answer": NOT_FOUND_ANSWER if verdict["result"] == "NOT_FOUND" else None,
+                "best_score": verdict["best_score"], "score_kind": verdict["score_kind"], "threshold": threshold,
+                "threshold_applied": verdict["threshold_applied"],
+                "mode": res["mode"], "cached": res["cached"], "semantic": res["semantic"],
+                "timings_ms": {k: 1000 * v for k, v in res["timings"].items()},
+                "passages": verdict["passages"]}
+
+    def _authorize(self, auth: str):
+        if self.token and auth != f"Bearer {self.token}":
+            raise ApiError(401, "Yetkisiz")
+
+    def reindex(self, body: Dict, auth: str) -> Dict:
+        self._authorize(auth)
+        job = self._reindex()
+        if body.get("wait"):
+            job.wait(REINDEX_WAIT_SEC)
+        return self.reindex_status()
+
+    def reindex_status(self) -> Dict:
+        return {"job": self.jobs.status(), "passages": len(self.store.passages),
+                "snapshot": self.store.snapshot_key}
+
+    def reindex_cancel(self, auth: str) -> Dict:
+        self._authorize(auth)
+        return {"cancelled": self.jobs.cancel(), **self.reindex_status()}
+
+# -----------------------------
+# HTTP katmanı
+# -----------------------------
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive (yük testinde bağlantı yeniden kullanılır)
+    timeout = API_REQUEST_TIMEOUT
+    server_version = "sbe-api"
+    # başlık ve gövde ayrı yazılıyor; Nagle + gecikmeli ACK keep-alive'da her cevaba ~40 ms ekler
+    disable_nagle_algorithm = True
+
+    def log_message(self, fmt, *args):
+        log.debug("%s - " + fmt, self.address_string(), *args)
+
+    def _send(self, status: int, payload: Dict):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_text(self, status: int, text: str, content_type: str):
+        data = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> Dict:
+        n = int(self.headers.get("Content-Length") or 0)
+        if n > API_MAX_BODY:
+            self.close_connection = True  # gövde okunmadı; bağlantı yeniden kullanılamaz
+            raise ApiError(413, "İstek gövdesi çok büyük")
+        if not n:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(n))
+        except ValueError:
+            raise ApiError(400, "Geçersiz JSON")
+        if not isinstance(body, dict):
+            raise ApiError(400, "Gövde bir JSON nesnesi olmalı")
+        return body
+
+    def _dispatch(self, fn, bounded: bool = True):
+        try:
+            if bounded:
+                # sorgu/indeksleme: en fazla `workers` istek aynı anda işlenir, fazlası burada sırasını bekler
+                with self.server.slots:
+                    payload = fn()
+            else:
+                payload = fn()
+            self._send(200, payload)
+        except ApiError as e:
+            self._send(e.status, {"error": str(e)})
+        except Exception as e:
+            log.exception("İstek işlenemedi")
+            self._send(500, {"error": f"Sunucu hatası: {e}"})
+
+    def do_GET(self):
+        svc = self.server.service
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path == "/health":
+            self._dispatch(svc.health, bounded=False)
+        elif path == "/stats":
+            self._dispatch(svc.stats, bounded=False)
+        elif path == "/reindex":
+            self._dispatch(svc.reindex_status, bounded=False)
+        elif path == "/metrics":
+            # --processes > 1: cevap veren sürecin metrikleri (süreç başına dosya için SBE_METRICS_FILE="...{pid}")
+            self._send_text(200, metrics.REGISTRY.render(), "text/plain; version=0.0.4; charset=utf-8")
+        else:
+            self._send(404, {"error": "Bulunamadı"})
+
+    def do_POST(self):
+        svc = self.server.service
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path == "/query":
+            self._dispatch(lambda: svc.query(self._body()))
+        elif path == "/reindex":
+            # iş arka planda çalışır; "wait" ile beklense bile sorgu slotu tutulmaz
+            self._dispatch(lambda: svc.reindex(self._body(), self.headers.get("Authorization", "")), bounded=False)
+        elif path == "/reindex/cancel":
+            self._dispatch(lambda: svc.reindex_cancel(self.headers.get("Authorization", "")), bounded=False)
+        else:
+            self._send(404, {"error": "Bulunamadı"})
+
+class BoundedHTTPServer(ThreadingHTTPServer):
+    """Bağlantı başına thread (boşta bekleyen keep-alive bağlantısı diğerlerini bekletmez);
+    aynı anda işlenen sorgu sayısı ise `workers` ile sınırlıdır."""
+
+    daemon_threads = True
+
+    def __init__(self, addr, handler, workers: int = API_WORKERS):
+        super().__init__(addr, handler)
+        self.workers = max(1, workers)
+        self.slots = threading.BoundedSemaphore(self.workers)
+        self.service = None  # QueryService; fork sonrası her süreçte ayrı kurulur
+
+def _serve(httpd: BoundedHTTPServer, args, build: bool):
+    # model + indeks süreç başına yüklenir (fork'tan sonra; torch thread'leri fork'u sevmez)
+    httpd.service = QueryService(args.docs, args.cache_dir, args.threshold, args.audit_db,
+                                 token=os.getenv("SBE_API_TOKEN"), build=build)
+    startup.mark("ready")
+    log.info(f"[{os.getpid()}] hazır: {len(httpd.service.store.passages)} passage, {httpd.workers} worker")
+    try:
+        httpd.serve_forever()
+    finally:
+        httpd.service.close()
+        httpd.server_close()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="SBE Chatbot JSON HTTP API")
+    ap.add_argument("--host", default=API_HOST)
+    ap.add_argument("--port", type=int, default=API_PORT)
+    ap.add_argument("--workers", type=int, default=API_WORKERS, help="süreç başına eşzamanlı istek")
+    ap.add_argument("--processes", type=int, default=API_PROCESSES, help="aynı portu dinleyen süreç sayısı (Unix)")
+    ap.add_argument("--docs", default=LOCAL_DOCS_PATH, help="/reindex ve --build için doküman klasörü")
+    ap.add_argument("--cache-dir", default=INDEX_CACHE_DIR, help="snapshot klasörü (arayüzle ortak)")
+    ap.add_argument("--threshold", type=float, default=DEFAULT_SIM_THRESHOLD)
+    ap.add_argument("--audit-db", default=DB_PATH)
+    ap.add_argument("--build", action="store_true", help="snapshot yoksa açılışta docs klasörünü indeksle")
+    ap.add_argument("--log-level", default="INFO")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(name)s %(message)s")
+
+    httpd = BoundedHTTPServer((args.host, args.port), Handler, args.workers)
+    log.info(f"http://{args.host}:{httpd.server_address[1]} ({args.processes} süreç x {httpd.workers} worker)")
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    if args.processes <= 1 or not hasattr(os, "fork"):
+        _serve(httpd, args, args.build)
+        return
+    # önceden fork: soket bir kez bağlanır, her çocuk aynı soketten accept eder.
+    # Engellemesiz soket: aynı bağlantıya uyanan diğer süreçler accept'te takılmaz.
+    httpd.socket.setblocking(False)
+    children = []
+    for i in range(args.processes):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                # sadece ilk süreç indeksler; diğerleri LATEST değişince snapshot'a geçer
+                _serve(httpd, args, args.build and i == 0)
+            finally:
+                os._exit(0)
+        children.append(pid)
+    httpd.socket.close()
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except (KeyboardInterrupt, SystemExit):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in children:
+            os.waitpid(pid, 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# startup.py
+# Açılış süresi ölçümü ve ağır modüllerin ilk kullanımda içe aktarılması.
+# Ağır bağımlılıklar (faiss, docx, sentence_transformers/torch) modül başında değil,
+# ilk erişimde yüklenir; her aşamanın süresi kaydedilir ve report() ile okunur
+# (arayüzde "Açılış süreleri", API'de /stats, benchmark.py çıktısında).
+
+import time
+import importlib
+import threading
+from contextlib import contextmanager
+from typing import Dict, List
+
+T0 = time.perf_counter()  # bu modülün ilk içe aktarıldığı an (uygulamalar en başta içe aktarır)
+
+_lock = threading.Lock()
+_events = []  # {"stage", "start_s", "seconds", "thread"}
+
+def record(stage: str, start: float, seconds: float):
+    with _lock:
+        _events.append({"stage": stage, "start_s": start - T0, "seconds": seconds,
+                        "thread": threading.current_thread().name})
+
+@contextmanager
+def timed(stage: str):
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, t, time.perf_counter() - t)
+
+def mark(stage: str) -> bool:
+    """T0'dan bu ana kadar geçen süreyi bir kez kaydeder (ör. "first render"); tekrar çağrılar yok sayılır."""
+    now = time.perf_counter()
+    with _lock:
+        if any(e["stage"] == stage for e in _events):
+            return False
+    record(stage, T0, now - T0)
+    return True
+
+def report() -> Dict:
+    """{"since_start_s", "stages": [...]}; aşamalar başlangıç sırasına göre."""
+    with _lock:
+        stages = sorted(_events, key=lambda e: e["start_s"])
+    return {"since_start_s": time.perf_counter() - T0, "stages": [dict(e) for e in stages]}
+
+def stage_seconds(stages: List[Dict] = None) -> Dict[str, float]:
+    # aşama adı -> toplam sn (karşılaştırma için düz sözlük)
+    out = {}
+    for e in stages if stages is not None else report()["stages"]:
+        out[e["stage"]] = out.get(e["stage"], 0.0) + e["seconds"]
+    return out
+
+class LazyModule:
+    """İlk öznitelik erişiminde modülü içe aktarır ("import <name>" aşaması olarak kaydedilir)."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._mod = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._mod is None:
+            with self._lock:
+                if self._mod is None:
+                    with timed(f"import {self._name}"):
+                        self._mod = importlib.import_module(self._name)
+        return self._mod
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+_lazy = {}
+
+def lazy_import(name: str) -> LazyModule:
+    # modül başına tek vekil: içe aktarma süresi bir kez kaydedilir
+    with _lock:
+        return _lazy.setdefault(name, LazyModule(name))
@@ -0,0 +1,311 @@
+# text_extract.py
+# PDF metin çıkarma - sayfa sayfa, istenirse process pool ile paralel.
+# app_pro.py (pdfplumber) ve app.py (PyPDF2) aynı yolu kullanır.
+#
+# Worker fonksiyonları modül seviyesinde olmalı (spawn ile pickle edilebilsin diye),
+# bu yüzden Streamlit script'lerinin içinde değil burada duruyorlar.
+
+import os
+import time
+import zlib
+import atexit
+import sqlite3
+import hashlib
+import logging
+import pathlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from typing import Iterator, List, Tuple, Optional, Callable
+
+log = logging.getLogger(__name__)
+
+# 0 veya 1: seri (tek çekirdek), >1: o kadar işlemli pool
+EXTRACT_WORKERS = int(os.getenv("SBE_EXTRACT_WORKERS", "0"))
+# bir worker görevine düşen sayfa sayısı (PDF'i her görevde bir kez açarız)
+PAGES_PER_TASK = 8
+
+ENGINES = ("pdfplumber", "pypdf2")
+# çıkarım mantığı değişirse artırın -> sayfa metni önbelleği geçersizleşir
+EXTRACTOR_REV = 1
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+def _default_warn(msg: str):
+    log.warning(msg)
+
+def _page_count(path: str, engine: str) -> int:
+    if engine == "pdfplumber":
+        import pdfplumber
+        with pdfplumber.open(path) as pdf:
+            return len(pdf.pages)
+    from PyPDF2 import PdfReader
+    with open(path, "rb") as f:
+        return len(PdfReader(f).pages)
+
+def _iter_range(path: str, engine: str, start: int, end: int) -> Iterator[Tuple[int, str, Optional[str]]]:
+    """[start, end) sayfalarını sırayla üretir -> (sayfa no, metin, hata mesajı).
+    Sayfa hatası tüm görevi düşürmez; o sayfa boş metin + hata ile döner.
+    pdfplumber sayfa önbellekleri (layout, karakterler) her sayfadan sonra bırakılır."""
+    if engine == "pdfplumber":
+        import pdfplumber
+        with pdfplumber.open(path, pages=range(start + 1, end + 1)) as pdf:
+            for i, page in zip(range(start, end), pdf.pages):
+                try:
+                    yield i, page.extract_text() or "", None
+                except Exception as e:
+                    yield i, "", str(e)
+                finally:
+                    page.close()
+    else:
+        from PyPDF2 import PdfReader
+        with open(path, "rb") as f:
+            pdf = PdfReader(f)
+            for i in range(start, end):
+                try:
+                    yield i, pdf.pages[i].extract_text() or "", None
+                except Exception as e:
+                    yield i, "", str(e)
+
+def _extract_range(path: str, engine: str, start: int, end: int) -> List[Tuple[int, str, Optional[str]]]:
+    # process pool görevi: bloğu liste olarak döndürür (generator pickle edilemez)
+    return list(_iter_range(path, engine, start, end))
+
+def extractor_id(engine: str) -> str:
+    # önbellek anahtarı: motor adı + kütüphane sürümü + bizim revizyon
+    if engine == "pdfplumber":
+        import pdfplumber
+        ver = pdfplumber.__version__
+    else:
+        import PyPDF2
+        ver = PyPDF2.__version__
+    return f"{engine}-{ver}-r{EXTRACTOR_REV}"
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def decompress_page(data: bytes) -> str:
+    return zlib.decompress(data).decode("utf-8")
+
+class PageTextCache:
+    """Sayfa metni önbelleği: (dosya sha256, extractor, sayfa no) -> metin.
+    Metinler zlib ile sıkıştırılıp SQLite'ta tutulur; toplam boyut max_bytes'ı aşınca
+    en uzun süredir kullanılmayan sayfalar silinir."""
+
+    def __init__(self, path: str, max_bytes: int = 256 << 20):
+        pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    sha256 TEXT,
+                    extractor TEXT,
+                    page INTEGER,
+                    data BLOB,
+                    nbytes INTEGER,
+                    used REAL,
+                    PRIMARY KEY (sha256, extractor, page)
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS docs (
+                    sha256 TEXT,
+                    extractor TEXT,
+                    n_pages INTEGER,
+                    PRIMARY KEY (sha256, extractor)
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS pages_used ON pages (used)")
+            self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def count(self, hits: int, misses: int):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def stats(self) -> dict:
+        with self._lock:
+            n, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM pages").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "pages": n, "bytes": size, "max_bytes": self.max_bytes}
+
+    def lookup(self, sha256: str, extractor: str, raw: bool = False):
+        """(sayfa sayısı veya None, {sayfa no: metin}) döner; bulunan sayfaların kullanım zamanı güncellenir.
+        raw=True: metinler sıkıştırılmış haliyle döner (decompress_page ile sayfa sayfa açılır)."""
+        with self._lock:
+            row = self.conn.execute("SELECT n_pages FROM docs WHERE sha256=? AND extractor=?",
+                                    (sha256, extractor)).fetchone()
+            if row is None:
+                return None, {}
+            rows = self.conn.execute("SELECT page, data FROM pages WHERE sha256=? AND extractor=?",
+                                     (sha256, extractor)).fetchall()
+            self.conn.execute("UPDATE pages SET used=? WHERE sha256=? AND extractor=?",
+                              (time.time(), sha256, extractor))
+            self.conn.commit()
+        if raw:
+            return row[0], dict(rows)
+        return row[0], {p: decompress_page(d) for p, d in rows}
+
+    def store(self, sha256: str, extractor: str, n_pages: int, pages: dict):
+        now = time.time()
+        recs = []
+        for p, text in pages.items():
+            data = zlib.compress(text.encode("utf-8"))
+            recs.append((sha256, extractor, p, data, len(data), now))
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO docs (sha256, extractor, n_pages) VALUES (?, ?, ?)",
+                              (sha256, extractor, n_pages))
+            self.conn.executemany("INSERT OR REPLACE INTO pages (sha256, extractor, page, data, nbytes, used) "
+                                  "VALUES (?, ?, ?, ?, ?, ?)", recs)
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        # kilit altında çağrılır
+        total = self.conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for rowid, nbytes in self.conn.execute("SELECT rowid, nbytes FROM pages ORDER BY used ASC"):
+            victims.append((rowid,))
+            total -= nbytes
+            if total <= self.max_bytes:
+                break
+        self.conn.executemany("DELETE FROM pages WHERE rowid=?", victims)
+        self.conn.execute("DELETE FROM docs WHERE NOT EXISTS (SELECT 1 FROM pages "
+                          "WHERE pages.sha256=docs.sha256 AND pages.extractor=docs.extractor)")
+
+    def clear(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM pages")
+            self.conn.execute("DELETE FROM docs")
+            self.conn.commit()
+        self.reset_stats()
+
+def _page_blocks(pages: List[int], max_len: Optional[int] = PAGES_PER_TASK) -> List[Tuple[int, int]]:
+    # ardışık sayfaları en fazla max_len'lik [start, end) bloklarına ayır (None -> sınırsız)
+    blocks = []
+    for i in pages:
+        if blocks and blocks[-1][1] == i and (max_len is None or i - blocks[-1][0] < max_len):
+            blocks[-1] = (blocks[-1][0], i + 1)
+        else:
+            blocks.append((i, i + 1))
+    return blocks
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    # süreç başına tek pool; worker sayısı değişirse yeniden kurulur
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # spawn: Streamlit/torch thread'leri varken fork güvenli değil
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+@atexit.register
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+def _pool_rows(path: str, engine: str, blocks: List[Tuple[int, int]], workers: int):
+    # blokları pool'a dağıtır, sonuçları blok sırasıyla üretir; bellekte en fazla 2 * workers blok bekler
+    pool = get_pool(workers)
+    window = deque()
+    nxt = 0
+    try:
+        while nxt < len(blocks) or window:
+            while nxt < len(blocks) and len(window) < 2 * workers:
+                s, e = blocks[nxt]
+                window.append((s, e, pool.submit(_extract_range, path, engine, s, e)))
+                nxt += 1
+            s, e, fut = window.popleft()
+            try:
+                rows = fut.result()
+            except Exception as ex:
+                # worker tamamen düştüyse bu bloğun sayfalarını hatalı say
+                rows = [(i, "", str(ex)) for i in range(s, e)]
+            yield from rows
+    finally:
+        for _, _, fut in window:
+            fut.cancel()
+
+def iter_pdf_pages(path: str, engine: str = "pdfplumber", workers: int = EXTRACT_WORKERS,
+                   warn: Callable[[str], None] = _default_warn,
+                   cache: Optional[PageTextCache] = None) -> Iterator[Tuple[int, str]]:
+    """(sayfa no, metin) çiftlerini sayfa sırasıyla üretir (okunamayan sayfa -> "").
+    Sayfalar tüketildikçe çıkarılır: seri modda PDF bir kez açılır ve sayfa sayfa okunur,
+    workers > 1 ise sınırlı sayıda blok önden pool'a verilir. Belge ne kadar büyük olursa olsun
+    bellekte sadece birkaç sayfa tutulur. cache verilirse önbellekteki sayfalar tekrar parse edilmez."""
+    if engine not in ENGINES:
+        raise ValueError(f"Bilinmeyen PDF motoru: {engine}")
+    n, cached, sha, ext = None, {}, None, None
+    if cache is not None:
+        sha, ext = _file_sha256(path), extractor_id(engine)
+        n, cached = cache.lookup(sha, ext, raw=True)
+    try:
+        if n is None:
+            n = _page_count(path, engine)
+    except Exception as e:
+        warn(f"PDF okuma hatası ({path}): {e}")
+        return
+    missing = [i for i in range(n) if i not in cached]
+    if workers > 1 and len(_page_blocks(missing)) > 1:
+        rows = _pool_rows(path, engine, _page_blocks(missing), workers)
+    else:
+        rows = (r for s, e in _page_blocks(missing, max_len=None) for r in _iter_range(path, engine, s, e))
+    fresh = {}
+    try:
+        for i in range(n):
+            if i in cached:
+                yield i, decompress_page(cached.pop(i))
+                continue
+            text = ""
+            if rows is not None:
+                try:
+                    _, text, err = next(rows)
+                    if err:
+                        warn(f"PDF okuma hatası ({path}, sayfa {i + 1}): {err}")
+                    else:
+                        fresh[i] = text
+                except Exception as e:
+                    # dosya açılamadı vb. -> kalan sayfalar boş
+                    warn(f"PDF okuma hatası ({path}): {e}")
+                    rows = None
+            if cache is not None and len(fresh) >= PAGES_PER_TASK:
+                cache.store(sha, ext, n, fresh)
+                fresh = {}
+            yield i, text
+    finally:
+        if rows is not None:
+            rows.close()
+        if cache is not None:
+            cache.count(n - len(missing), len(missing))
+            if fresh:
+                cache.store(sha, ext, n, fresh)
+
+def extract_pdf_pages(path: str, engine: str = "pdfplumber", workers: int = EXTRACT_WORKERS,
+                      warn: Callable[[str], None] = _default_warn,
+                      cache: Optional[PageTextCache] = None) -> List[str]:
+    """PDF'in sayfa metinlerini sayfa sırasıyla liste olarak döner (okunamayan sayfa -> "").
+    Büyük belgelerde iter_pdf_pages tercih edilmeli."""
+    return [text for _, text in iter_pdf_pages(path, engine, workers, warn, cache)]